@@ -3,26 +3,115 @@
 课程提醒助手 - Flask主应用
 """
 
-from flask import Flask, render_template, request, jsonify, send_file, flash, redirect
+from flask import (
+    Flask,
+    Response,
+    render_template,
+    request,
+    jsonify,
+    send_file,
+    flash,
+    redirect,
+    g,
+    session,
+)
 import os
+import hmac
 import io
+import json
+import uuid
+import base64
+import hashlib
+import sqlite3
+from urllib.parse import quote
 from datetime import datetime, timedelta
 
-from config import BASE_DIR, DATABASE_PATH, HOST, PORT, SECRET_KEY, DEBUG
+from config import (
+    BASE_DIR,
+    DATABASE_PATH,
+    HOST,
+    PORT,
+    SECRET_KEY,
+    DEBUG,
+    OWNER_API_KEY,
+    CALENDAR_REFRESH_SECONDS,
+)
+from utils import clock
 from utils.database import (
+    DEFAULT_USER_ID,
     init_database,
+    add_user,
+    get_user,
+    get_user_api_key,
+    get_user_by_api_key,
+    get_users,
+    reset_user_api_key,
     add_course,
     get_all_courses,
     get_courses_by_day,
+    get_active_courses_by_day,
+    get_course_by_id,
+    get_courses_page,
+    search_courses,
+    count_courses,
+    count_courses_by_day,
     delete_course,
+    delete_all_courses,
     update_course,
     get_setting,
     set_setting,
+    get_data_version,
+    add_course_exception,
+    get_course_exception,
+    get_course_exceptions,
+    update_course_exception,
+    delete_course_exception,
+    delete_pending_reminders,
 )
-from utils.excel_parser import parse_excel, generate_template
+from utils.excel_parser import build_template_bytes
+from utils.artifact_cache import get_artifact
+from utils.course_export import EXPORT_FORMATS
+from utils.calendar_feed import iter_calendar_ics
+from utils.import_jobs import submit_import_job, get_job, shutdown_import_jobs
 from utils.scheduler import init_scheduler, shutdown_scheduler
 from utils.wechat_push import test_connection
-from utils.holiday_checker import is_holiday, should_send_reminder
+from utils.message_templates import parse_message_format
+from utils.metrics import render_metrics
+from utils.request_profiler import (
+    PROFILING_MODES,
+    finish_request,
+    get_mode,
+    get_profiles,
+    get_slow_endpoints,
+    get_slow_requests,
+    parse_profiling_mode,
+    reset_stats,
+    start_request,
+)
+from utils.notify_channels import (
+    CHANNEL_SETTING_KEYS,
+    configured_channels,
+    get_breaker_states,
+    get_channel_config,
+    parse_channels,
+)
+from utils.holiday_checker import (
+    is_holiday,
+    should_send_reminder,
+    get_effective_weekday,
+)
+from utils.week_utils import MAX_WEEKS
+from utils.schedule import build_week_schedule
+from utils.teaching_calendar import (
+    get_current_week,
+    get_derived_week,
+    get_week_mode,
+    is_in_semester,
+    refresh_calendars,
+)
+from utils.conflicts import find_conflicts, format_conflict, redact_conflicts
+from utils.course_exceptions import check_course_session, validate_course_exception
+from utils.occupancy import get_room_free_slots, get_all_free_slots
 
 app = Flask(__name__)
 app.secret_key = SECRET_KEY
@@ -38,22 +127,165 @@ def initialize():
         app._initialized = True
 
 
+@app.before_request
+def refresh_teaching_calendar():
+    """发现其他进程（如 set_week.py）修改的教学周配置（静态文件请求跳过，最多每隔几秒检查一次）"""
+    if request.endpoint == "static":
+        return
+    refresh_calendars(min_interval=CALENDAR_REFRESH_SECONDS)
+
+
+@app.before_request
+def start_request_profiling():
+    """请求性能分析（配置 request_profiling 开启时）"""
+    start_request()
+
+
+@app.after_request
+def record_response_status(response):
+    """记录响应状态码（供请求性能分析使用）"""
+    g.response_status = response.status_code
+    return response
+
+
+@app.teardown_request
+def finish_request_profiling(exception):
+    """记录请求耗时和SQL查询"""
+    rule = request.url_rule.rule if request.url_rule else request.path
+    finish_request(
+        f"{request.method} {rule}", 500 if exception else g.get("response_status")
+    )
+
+
+def authenticate_api_key(api_key):
+    """
+    验证API Key
+
+    返回:
+        int 或 None: Key所属的用户ID，无效时返回None
+    """
+    if OWNER_API_KEY and hmac.compare_digest(api_key, OWNER_API_KEY):
+        return DEFAULT_USER_ID
+    user = get_user_by_api_key(api_key)
+    return user["id"] if user else None
+
+
+@app.before_request
+def load_current_user():
+    """
+    解析当前用户
+
+    带API Key（请求头 X-Api-Key 或查询参数 api_key）时为Key所属用户，并记录在会话中；
+    否则使用会话中已验证的用户；都没有时为默认用户（设置了 OWNER_API_KEY 时拒绝）。
+    请求头 X-User-Id 或查询参数 user_id 只能指定当前用户自己
+    """
+    if request.endpoint == "static":
+        return None
+
+    api_key = request.headers.get("X-Api-Key") or request.args.get("api_key")
+    if api_key:
+        user_id = authenticate_api_key(api_key)
+        if user_id is None:
+            return jsonify({"success": False, "error": "API Key无效"}), 401
+        session["user_id"] = user_id
+    elif session.get("user_id") is not None:
+        user_id = session["user_id"]
+        if user_id != DEFAULT_USER_ID and get_user(user_id) is None:
+            session.pop("user_id", None)
+            return jsonify({"success": False, "error": "用户不存在，请重新提供API Key"}), 401
+    elif OWNER_API_KEY:
+        return jsonify({"success": False, "error": "请提供API Key"}), 401
+    else:
+        user_id = DEFAULT_USER_ID
+
+    g.user_id = user_id
+
+    raw = request.headers.get("X-User-Id") or request.args.get("user_id")
+    if raw is None:
+        return None
+
+    try:
+        requested = int(raw)
+    except ValueError:
+        return jsonify({"success": False, "error": "用户ID不正确"}), 400
+
+    if requested != user_id:
+        return jsonify({"success": False, "error": "无权访问其他用户的数据"}), 403
+    return None
+
+
+def is_owner():
+    """当前用户是否为默认用户（管理员）"""
+    return g.user_id == DEFAULT_USER_ID
+
+
+def require_owner():
+    """只有默认用户（管理员）可以执行管理操作，其他用户返回403响应"""
+    if not is_owner():
+        return jsonify({"success": False, "error": "只有管理员可以执行此操作"}), 403
+    return None
+
+
+def user_cache_key(key):
+    """生成按用户区分的响应缓存名称"""
+    return f"{key}-u{g.user_id}"
+
+
 @app.teardown_appcontext
 def cleanup(exception):
     """应用关闭时清理资源"""
     pass
 
 
+def cached_json_response(key, version, builder=None):
+    """
+    按数据版本返回JSON响应，支持If-None-Match条件请求
+
+    参数:
+        key: 响应缓存名称（同时作为ETag前缀）
+        version: 数据版本，变化后ETag和缓存失效
+        builder: 生成响应数据的函数；为None时不缓存响应内容
+
+    返回:
+        tuple: (Response或None, ETag)，客户端缓存有效时返回304响应；
+               builder为None且未命中时返回(None, ETag)，由调用方自行生成响应
+    """
+    etag = f"{key}-{version}"
+
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    elif builder is None:
+        return None, etag
+    else:
+        artifact = get_artifact(
+            f"api:{key}", lambda: app.json.dumps(builder()).encode("utf-8"), version
+        )
+        response = app.response_class(artifact["data"], mimetype="application/json")
+
+    return with_cache_headers(response, etag), etag
+
+
+def with_cache_headers(response, etag):
+    """设置弱ETag和Cache-Control（每次使用前需向服务器确认）"""
+    response.set_etag(etag, weak=True)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
 # 页面路由
 @app.route("/")
 def index():
-    """首页 - 课程列表"""
-    courses = get_all_courses()
+    """首页 - 课程列表（全部课程由前端分页加载）"""
 
-    # 获取今日课程
-    today = datetime.now()
+    # 获取今日课程（调休日按指定的星期、教学周上课）
+    today = clock.now()
     day_of_week = today.isoweekday()
-    today_courses = get_courses_by_day(day_of_week)
+    effective_day, effective_week = get_effective_weekday(today)
+    current_week = get_current_week(today, g.user_id)
+    today_courses = get_active_courses_by_day(
+        effective_day or day_of_week, effective_week or current_week, g.user_id
+    )
 
     # 星期映射
     week_days = {
@@ -71,13 +303,16 @@ def index():
     )
     if is_holiday(today):
         today_weekday += "（节假日）"
+    elif effective_day and effective_day != day_of_week:
+        today_weekday += f"（调休，按{week_days.get(effective_day)}课表上课）"
 
     return render_template(
         "index.html",
-        courses=courses,
+        course_count=count_courses(g.user_id),
         today_courses=today_courses,
         week_days=week_days,
         today_weekday=today_weekday,
+        current_week=current_week,
     )
 
 
@@ -90,40 +325,136 @@ def upload_page():
 @app.route("/settings")
 def settings_page():
     """设置页面"""
-    settings = {
-        "pushplus_token": get_setting("pushplus_token", ""),
-        "skip_holidays": get_setting("skip_holidays", "true"),
-    }
+    settings = get_channel_config(g.user_id)
+    settings["notify_channels"] = ",".join(
+        parse_channels(settings["notify_channels"])
+    )
+    settings["message_format"] = parse_message_format(settings["message_format"])
+    settings["skip_holidays"] = get_setting("skip_holidays", "true")
 
     # 统计信息
-    courses = get_all_courses()
-    today_count = len(get_courses_by_day(datetime.now().isoweekday()))
+    today_count = count_courses_by_day(clock.now().isoweekday(), g.user_id)
 
     return render_template(
         "settings.html",
         settings=settings,
-        course_count=len(courses),
+        is_owner=is_owner(),
+        course_count=count_courses(g.user_id),
         today_count=today_count,
-        current_date=datetime.now().strftime("%Y年%m月%d日"),
+        current_date=clock.now().strftime("%Y年%m月%d日"),
     )
 
 
 # API路由 - 课程管理
 @app.route("/api/courses", methods=["GET"])
 def get_courses_api():
-    """获取所有课程"""
-    courses = get_all_courses()
+    """获取课程列表（带分页或筛选参数时按页返回，否则返回全部课程）"""
+    paging_args = {"limit", "cursor", "day", "week", "location", "q"}
+    if paging_args & set(request.args):
+        return get_courses_page_api()
+
+    def build():
+        courses = get_all_courses(g.user_id)
+        return {"success": True, "courses": courses, "count": len(courses)}
+
+    response, _ = cached_json_response(
+        user_cache_key("courses"), get_data_version(), build
+    )
+    return response
+
+
+def get_courses_page_api():
+    """分页获取课程"""
+    try:
+        limit = min(max(request.args.get("limit", 50, type=int), 1), 200)
+        day = request.args.get("day", type=int)
+        week = request.args.get("week", type=int)
+        location = request.args.get("location", "").strip()
+        name_prefix = request.args.get("q", "").strip()
+        after = decode_cursor(request.args.get("cursor"))
+    except ValueError:
+        return jsonify({"success": False, "error": "分页参数不正确"}), 400
+
+    if day is not None and not 1 <= day <= 7:
+        return jsonify({"success": False, "error": "星期必须在1-7之间"}), 400
+    if week is not None and not 1 <= week <= MAX_WEEKS:
+        return jsonify({"success": False, "error": f"周次应在1-{MAX_WEEKS}之间"}), 400
+
+    # 按查询参数区分ETag，数据未变化时返回304
+    query_key = hashlib.md5(request.query_string).hexdigest()[:12]
+    response, etag = cached_json_response(
+        user_cache_key(f"courses-{query_key}"), get_data_version()
+    )
+    if response is not None:
+        return response
+
+    courses, next_after = get_courses_page(
+        limit=limit,
+        after=after,
+        day=day,
+        week=week,
+        location=location,
+        name_prefix=name_prefix,
+        user_id=g.user_id,
+    )
+
+    return with_cache_headers(
+        jsonify(
+            {
+                "success": True,
+                "courses": courses,
+                "count": len(courses),
+                "next_cursor": encode_cursor(next_after) if next_after else None,
+            }
+        ),
+        etag,
+    )
+
+
+def encode_cursor(after):
+    """将分页位置编码为游标字符串"""
+    return base64.urlsafe_b64encode(json.dumps(after).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """解析游标字符串，格式不正确时抛出ValueError"""
+    if not cursor:
+        return None
+
+    try:
+        day_of_week, start_time, course_id = json.loads(
+            base64.urlsafe_b64decode(cursor.encode("ascii"))
+        )
+        return int(day_of_week), str(start_time), int(course_id)
+    except Exception:
+        raise ValueError("游标格式不正确")
+
+
+@app.route("/api/courses/search")
+def search_courses_api():
+    """按课程名称、地点、备注搜索课程"""
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({"success": False, "error": "请输入搜索关键词"}), 400
+
+    limit = min(max(request.args.get("limit", 20, type=int), 1), 100)
+    courses = search_courses(query, limit=limit, user_id=g.user_id)
     return jsonify({"success": True, "courses": courses, "count": len(courses)})
 
 
 @app.route("/api/courses/<int:course_id>", methods=["GET"])
 def get_course_api(course_id):
     """获取单个课程"""
-    courses = get_all_courses()
-    course = next((c for c in courses if c["id"] == course_id), None)
+    response, etag = cached_json_response(
+        user_cache_key(f"course-{course_id}"), get_data_version()
+    )
+    if response is not None:
+        return response
+
+    course = get_course_by_id(course_id, g.user_id)
 
     if course:
-        return jsonify({"success": True, "course": course})
+        return with_cache_headers(jsonify({"success": True, "course": course}), etag)
     else:
         return jsonify({"success": False, "error": "课程不存在"}), 404
 
@@ -143,6 +474,21 @@ def add_course_api():
         if not is_valid:
             return jsonify({"success": False, "error": error_msg}), 400
 
+        # 检查时间冲突，确认后可带 force=true 强制添加
+        candidate = {
+            "name": data["name"],
+            "day_of_week": data["day_of_week"],
+            "start_time": data["start_time"],
+            "end_time": data["end_time"],
+            "location": data.get("location", ""),
+            "week_pattern": week_pattern,
+        }
+        conflicts = find_conflicts(
+            get_courses_by_day(data["day_of_week"], g.user_id), candidates=[candidate]
+        )
+        if conflicts and not data.get("force"):
+            return conflict_response(conflicts)
+
         course_id = add_course(
             name=data["name"],
             day_of_week=data["day_of_week"],
@@ -151,6 +497,7 @@ def add_course_api():
             location=data.get("location", ""),
             remark=data.get("remark", ""),
             week_pattern=week_pattern,
+            user_id=g.user_id,
         )
 
         return jsonify(
@@ -166,16 +513,74 @@ def update_course_api(course_id):
     data = request.get_json()
 
     try:
+        course = get_course_by_id(course_id, g.user_id)
+        if not course:
+            return jsonify({"success": False, "error": "课程不存在"}), 404
+
+        # 用修改后的课程检查时间冲突（排除课程自身）
+        candidate = dict(course, **data)
+        if "week_pattern" in data:
+            candidate.pop("week_mask", None)
+
+        others = [
+            c
+            for c in get_courses_by_day(candidate["day_of_week"], g.user_id)
+            if c["id"] != course_id
+        ]
+        conflicts = find_conflicts(others, candidates=[candidate])
+        if conflicts and not data.get("force"):
+            return conflict_response(conflicts)
+
         update_course(course_id, **data)
         return jsonify({"success": True, "message": "课程更新成功"})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 400
 
 
+def conflict_response(conflicts):
+    """返回课程时间冲突（409）"""
+    return jsonify(
+        {
+            "success": False,
+            "error": "；".join(format_conflict(c) for c in conflicts),
+            "conflicts": conflicts,
+        }
+    ), 409
+
+
+@app.route("/api/conflicts")
+def get_conflicts_api():
+    """
+    检测时间冲突：scope=time 检测当前用户课表内的冲突，
+    scope=location 检测全部用户在同一地点的冲突（教室共用）；
+    非管理员只能看到其他用户课程的地点和时间
+    """
+    scope = request.args.get("scope", "time")
+    if scope not in ("time", "location"):
+        return jsonify({"success": False, "error": "scope只支持time或location"}), 400
+
+    by_location = scope == "location"
+
+    def build():
+        courses = get_all_courses(None if by_location else g.user_id)
+        conflicts = find_conflicts(courses, by_location=by_location)
+        if by_location and not is_owner():
+            own_ids = {c["id"] for c in courses if c["user_id"] == g.user_id}
+            conflicts = redact_conflicts(conflicts, own_ids)
+        return {"success": True, "conflicts": conflicts, "count": len(conflicts)}
+
+    key = user_cache_key(f"conflicts-{scope}")
+    response, _ = cached_json_response(key, get_data_version(), build)
+    return response
+
+
 @app.route("/api/courses/<int:course_id>", methods=["DELETE"])
 def delete_course_api(course_id):
     """删除课程"""
     try:
+        if get_course_by_id(course_id, g.user_id) is None:
+            return jsonify({"success": False, "error": "课程不存在"}), 404
+
         delete_course(course_id)
         return jsonify({"success": True, "message": "课程删除成功"})
     except Exception as e:
@@ -184,17 +589,140 @@ def delete_course_api(course_id):
 
 @app.route("/api/courses/clear", methods=["DELETE"])
 def clear_courses_api():
-    """清空所有课程"""
+    """清空当前用户的所有课程"""
     try:
-        courses = get_all_courses()
-        for course in courses:
-            delete_course(course["id"])
+        deleted = delete_all_courses(g.user_id)
 
-        return jsonify({"success": True, "message": "已清空所有课程"})
+        return jsonify({"success": True, "message": "已清空所有课程", "count": deleted})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 400
 
 
+# API路由 - 课程例外（停课/调课）
+@app.route("/api/exceptions", methods=["GET"])
+def get_exceptions_api():
+    """查询课程例外（可按课程、日期范围筛选）"""
+    exceptions = get_course_exceptions(
+        user_id=g.user_id,
+        course_id=request.args.get("course_id", type=int),
+        start_date=request.args.get("from"),
+        end_date=request.args.get("to"),
+    )
+    return jsonify({"success": True, "exceptions": exceptions, "count": len(exceptions)})
+
+
+@app.route("/api/exceptions/<int:exception_id>", methods=["GET"])
+def get_exception_api(exception_id):
+    """获取单个课程例外"""
+    exception = get_course_exception(exception_id, g.user_id)
+
+    if exception:
+        return jsonify({"success": True, "exception": exception})
+    else:
+        return jsonify({"success": False, "error": "例外不存在"}), 404
+
+
+@app.route("/api/exceptions", methods=["POST"])
+def add_exception_api():
+    """添加停课/调课"""
+    data = request.get_json() or {}
+
+    course = get_course_by_id(data.get("course_id"), g.user_id)
+    if not course:
+        return jsonify({"success": False, "error": "课程不存在"}), 404
+
+    fields, error = validate_course_exception(data)
+    if not error:
+        error = check_reschedule_fields(fields)
+    if not error:
+        error = check_course_session(course, fields["date"])
+    if error:
+        return jsonify({"success": False, "error": error}), 400
+
+    try:
+        exception_id = add_course_exception(
+            course["id"],
+            fields.pop("date"),
+            fields.pop("action"),
+            user_id=g.user_id,
+            **fields,
+        )
+    except sqlite3.IntegrityError:
+        return jsonify({"success": False, "error": "该课程当天已有停课/调课记录"}), 409
+
+    exception = get_course_exception(exception_id)
+    refresh_exception_reminders(exception)
+
+    return jsonify(
+        {"success": True, "exception_id": exception_id, "message": "停课/调课添加成功"}
+    )
+
+
+@app.route("/api/exceptions/<int:exception_id>", methods=["PUT"])
+def update_exception_api(exception_id):
+    """更新停课/调课"""
+    data = request.get_json() or {}
+
+    old = get_course_exception(exception_id, g.user_id)
+    if not old:
+        return jsonify({"success": False, "error": "例外不存在"}), 404
+
+    fields, error = validate_course_exception(data, partial=True)
+    if not error:
+        error = check_reschedule_fields(dict(old, **fields))
+    if not error and "date" in fields:
+        error = check_course_session(
+            get_course_by_id(old["course_id"]), fields["date"]
+        )
+    if error:
+        return jsonify({"success": False, "error": error}), 400
+
+    try:
+        update_course_exception(exception_id, **fields)
+    except sqlite3.IntegrityError:
+        return jsonify({"success": False, "error": "该课程当天已有停课/调课记录"}), 409
+
+    refresh_exception_reminders(old, get_course_exception(exception_id))
+    return jsonify({"success": True, "message": "停课/调课更新成功"})
+
+
+@app.route("/api/exceptions/<int:exception_id>", methods=["DELETE"])
+def delete_exception_api(exception_id):
+    """删除停课/调课（恢复按课表上课）"""
+    exception = get_course_exception(exception_id, g.user_id)
+    if not exception:
+        return jsonify({"success": False, "error": "例外不存在"}), 404
+
+    delete_course_exception(exception_id)
+    refresh_exception_reminders(exception)
+    return jsonify({"success": True, "message": "停课/调课删除成功"})
+
+
+def check_reschedule_fields(exception):
+    """调课至少需要修改日期、时间或地点之一"""
+    if exception["action"] != "reschedule":
+        return None
+
+    changed = ("new_date", "new_start_time", "new_end_time", "new_location")
+    if not any(exception.get(key) for key in changed):
+        return "调课需要指定新的日期、时间或地点"
+    return None
+
+
+def refresh_exception_reminders(*exceptions):
+    """停课/调课涉及今天时，重新生成该课程今天的提醒"""
+    from utils.scheduler import scan_daily_courses
+
+    today = clock.today().strftime("%Y-%m-%d")
+    for exception in exceptions:
+        if today in (exception["date"], exception["new_date"]):
+            delete_pending_reminders(exception["course_id"])
+            scan_daily_courses(
+                course_ids=[exception["course_id"]], user_id=exception["user_id"]
+            )
+            return
+
+
 # API路由 - 文件上传
 @app.route("/api/upload", methods=["POST"])
 def upload_file_api():
@@ -207,78 +735,140 @@ def upload_file_api():
     if file.filename == "":
         return jsonify({"success": False, "error": "未选择文件"}), 400
 
-    if not file.filename.endswith((".xlsx", ".xls")):
+    if not file.filename.endswith((".xlsx", ".xls", ".csv")):
         return jsonify(
-            {"success": False, "error": "请上传Excel文件（.xlsx或.xls格式）"}
+            {"success": False, "error": "请上传Excel文件（.xlsx或.xls格式）或CSV文件"}
         ), 400
 
-    try:
-        # 保存临时文件
-        temp_path = os.path.join(BASE_DIR, "temp_upload.xlsx")
-        file.save(temp_path)
+    # 导入模式：append（追加）或 sync（同步，按差异更新）
+    mode = request.form.get("mode", "append")
+    dry_run = request.form.get("dry_run", "false").lower() == "true"
 
-        # 解析Excel
-        result = parse_excel(temp_path)
+    if mode not in ("append", "sync"):
+        return jsonify({"success": False, "error": "导入模式不正确"}), 400
 
-        # 删除临时文件
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
-
-        if not result["success"]:
-            return jsonify(result), 400
+    try:
+        # 保存临时文件（每个任务独立文件，由后台任务负责删除）
+        ext = ".csv" if file.filename.endswith(".csv") else ".xlsx"
+        temp_path = os.path.join(BASE_DIR, f"temp_upload_{uuid.uuid4().hex}{ext}")
+        file.save(temp_path)
 
-        # 添加到数据库
-        added_count = 0
-        for course_data in result["courses"]:
-            try:
-                add_course(**course_data)
-                added_count += 1
-            except Exception as e:
-                result["errors"].append(f"添加课程失败 {course_data['name']}: {str(e)}")
+        # 提交后台导入任务，立即返回任务ID
+        job_id = submit_import_job(
+            temp_path, mode=mode, dry_run=dry_run, user_id=g.user_id
+        )
 
-        result["count"] = added_count
+        return jsonify(
+            {"success": True, "job_id": job_id, "status_url": f"/api/jobs/{job_id}"}
+        ), 202
 
-        # 刷新今日课程提醒
-        from utils.scheduler import scan_daily_courses
+    except Exception as e:
+        return jsonify({"success": False, "error": f"处理文件失败: {str(e)}"}), 500
 
-        scan_daily_courses()
 
-        return jsonify(result)
+@app.route("/api/jobs/<job_id>")
+def get_job_api(job_id):
+    """获取导入任务进度"""
+    job = get_job(job_id)
 
-    except Exception as e:
-        return jsonify({"success": False, "error": f"处理文件失败: {str(e)}"}), 500
+    if job and job["user_id"] == g.user_id:
+        return jsonify({"success": True, "job": job})
+    else:
+        return jsonify({"success": False, "error": "任务不存在"}), 404
 
 
 @app.route("/api/template")
 def download_template():
-    """下载Excel模板"""
+    """下载Excel模板（首次请求时生成并缓存，支持If-None-Match）"""
     try:
-        wb = generate_template()
-
-        # 保存到内存
-        output = io.BytesIO()
-        wb.save(output)
-        output.seek(0)
+        artifact = get_artifact("template.xlsx", build_template_bytes)
 
         return send_file(
-            output,
+            io.BytesIO(artifact["data"]),
             mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             as_attachment=True,
             download_name="课程表模板.xlsx",
+            etag=artifact["etag"],
+            max_age=3600,
         )
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+@app.route("/api/export")
+def export_courses_api():
+    """导出当前用户的全部课程（xlsx/csv），边读边写流式返回"""
+    export_format = request.args.get("format", "xlsx").lower()
+
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"success": False, "error": "导出格式只支持xlsx或csv"}), 400
+
+    mimetype, generate = EXPORT_FORMATS[export_format]
+    filename = f"课程表_{clock.now().strftime('%Y%m%d')}.{export_format}"
+
+    return Response(
+        generate(user_id=g.user_id),
+        mimetype=mimetype,
+        headers={
+            "Content-Disposition": f"attachment; filename=courses.{export_format}; "
+            f"filename*=UTF-8''{quote(filename)}"
+        },
+    )
+
+
+@app.route("/api/calendar.ics")
+def calendar_feed_api():
+    """
+    课程表日历订阅（iCalendar）
+
+    内容按数据版本缓存，日历客户端重复拉取时只比较ETag；
+    订阅地址无法带请求头，多用户时通过 ?api_key= 参数认证
+    """
+    artifact = get_artifact(
+        user_cache_key("calendar.ics"),
+        lambda: b"".join(iter_calendar_ics(g.user_id)),
+        get_data_version(),
+    )
+
+    response = Response(artifact["data"], mimetype="text/calendar")
+    response.charset = "utf-8"
+    response.headers["Content-Disposition"] = "inline; filename=courses.ics"
+    response.set_etag(artifact["etag"])
+    response.cache_control.public = True
+    response.cache_control.max_age = 300
+    return response.make_conditional(request)
+
+
 # API路由 - 设置管理
 @app.route("/api/settings", methods=["POST"])
 def save_settings_api():
     """保存设置"""
     data = request.get_json()
 
+    # 节假日跳过是全局设置，只有管理员可以修改
+    if "skip_holidays" in data:
+        denied = require_owner()
+        if denied:
+            return denied
+
     try:
-        if "pushplus_token" in data:
-            set_setting("pushplus_token", data["pushplus_token"])
+        for key in CHANNEL_SETTING_KEYS.values():
+            if key in data:
+                set_setting(key, str(data[key] or "").strip(), user_id=g.user_id)
+
+        if "message_format" in data:
+            set_setting(
+                "message_format",
+                parse_message_format(data["message_format"]),
+                user_id=g.user_id,
+            )
+
+        if "notify_channels" in data:
+            set_setting(
+                "notify_channels",
+                ",".join(parse_channels(data["notify_channels"])),
+                user_id=g.user_id,
+            )
 
         if "skip_holidays" in data:
             set_setting("skip_holidays", str(data["skip_holidays"]).lower())
@@ -291,7 +881,7 @@ def save_settings_api():
 @app.route("/api/test-push", methods=["POST"])
 def test_push_api():
     """测试推送连接"""
-    result = test_connection()
+    result = test_connection(user_id=g.user_id)
 
     if result["success"]:
         return jsonify(result)
@@ -300,48 +890,191 @@ def test_push_api():
 
 
 # API路由 - 系统状态
+@app.route("/metrics")
+def metrics():
+    """
+    运行指标（Prometheus文本格式，仅管理员）
+
+    设置了 OWNER_API_KEY 时，抓取配置通过 params 传入 api_key
+    """
+    denied = require_owner()
+    if denied:
+        return denied
+
+    return Response(
+        render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@app.route("/api/profiling", methods=["GET"])
+def get_profiling_api():
+    """请求性能分析结果：最慢的接口、最近的慢请求和抽样分析报告（仅管理员）"""
+    denied = require_owner()
+    if denied:
+        return denied
+
+    limit = request.args.get("limit", 10, type=int)
+    return jsonify(
+        {
+            "success": True,
+            "mode": get_mode(),
+            "slow_endpoints": get_slow_endpoints(limit),
+            "slow_requests": get_slow_requests(),
+            "profiles": get_profiles(),
+        }
+    )
+
+
+@app.route("/api/profiling", methods=["POST"])
+def set_profiling_api():
+    """切换请求性能分析模式（off/timing/cprofile/pyinstrument），reset为true时清空统计（仅管理员）"""
+    denied = require_owner()
+    if denied:
+        return denied
+
+    data = request.get_json() or {}
+
+    if "mode" in data:
+        if data["mode"] not in PROFILING_MODES:
+            return jsonify(
+                {
+                    "success": False,
+                    "error": f"模式只支持: {', '.join(PROFILING_MODES)}",
+                }
+            ), 400
+        set_setting("request_profiling", parse_profiling_mode(data["mode"]))
+
+    if data.get("reset"):
+        reset_stats()
+
+    return jsonify({"success": True, "mode": get_mode()})
+
+
 @app.route("/api/status")
 def system_status():
     """获取系统状态"""
-    courses = get_all_courses()
-    today_count = len(get_courses_by_day(datetime.now().isoweekday()))
+    today = clock.now().strftime("%Y-%m-%d")
+    circuits = get_breaker_states()
 
-    return jsonify(
-        {
+    def build():
+        return {
             "success": True,
             "data": {
-                "course_count": len(courses),
-                "today_count": today_count,
-                "current_date": datetime.now().strftime("%Y-%m-%d"),
+                "course_count": count_courses(g.user_id),
+                "today_count": count_courses_by_day(
+                    clock.now().isoweekday(), g.user_id
+                ),
+                "current_date": today,
                 "is_holiday": is_holiday(),
-                "scheduler_running": True,
+                "push_circuits": circuits,
+                "push_available": any(
+                    circuits[channel] != "open"
+                    for channel in configured_channels(get_channel_config(g.user_id))
+                ),
             },
         }
+
+    # 状态与日期、推送渠道熔断状态相关，版本中加入当天日期和熔断状态
+    circuit_version = ".".join(state[0] for state in circuits.values())
+    response, _ = cached_json_response(
+        user_cache_key("status"),
+        f"{get_data_version()}-{today}-{circuit_version}",
+        build,
+    )
+    return response
+
+
+@app.route("/api/schedule")
+def get_schedule_api():
+    """获取指定教学周的7天课表（默认当前周）"""
+    week = request.args.get("week", type=int)
+    if week is None:
+        week = get_current_week(user_id=g.user_id)
+
+    if not 1 <= week <= MAX_WEEKS:
+        return jsonify({"success": False, "error": f"周次应在1-{MAX_WEEKS}之间"}), 400
+
+    def build():
+        return {"success": True, "data": build_week_schedule(week, g.user_id)}
+
+    response, _ = cached_json_response(
+        user_cache_key(f"schedule-{week}"), get_data_version(), build
+    )
+    return response
+
+
+def parse_week_day_args():
+    """
+    解析 week、day 查询参数（默认当前教学周、今天）
+
+    返回:
+        tuple: (week, day, 错误信息)
+    """
+    week = request.args.get("week", type=int)
+    day = request.args.get("day", type=int)
+
+    if week is None:
+        week = get_current_week(user_id=g.user_id)
+    if day is None:
+        day = clock.now().isoweekday()
+
+    if not 1 <= week <= MAX_WEEKS:
+        return week, day, f"周次应在1-{MAX_WEEKS}之间"
+    if not 1 <= day <= 7:
+        return week, day, "星期必须在1-7之间"
+    return week, day, None
+
+
+@app.route("/api/rooms/<path:location>/free")
+def get_room_free_api(location):
+    """查询指定教室的空闲时段"""
+    week, day, error = parse_week_day_args()
+    if error:
+        return jsonify({"success": False, "error": error}), 400
+
+    min_minutes = max(request.args.get("min_minutes", 0, type=int), 0)
+    data = get_room_free_slots(location, day, week, min_minutes)
+    return jsonify({"success": True, "data": data})
+
+
+@app.route("/api/free-slots")
+def get_free_slots_api():
+    """查询所有教室的空闲时段"""
+    week, day, error = parse_week_day_args()
+    if error:
+        return jsonify({"success": False, "error": error}), 400
+
+    min_minutes = max(request.args.get("min_minutes", 0, type=int), 0)
+    rooms = get_all_free_slots(day, week, min_minutes)
+    return jsonify(
+        {
+            "success": True,
+            "data": {"week": week, "day_of_week": day, "rooms": rooms},
+            "count": len(rooms),
+        }
     )
 
 
 # API路由 - 教学周管理
 @app.route("/api/teaching-week", methods=["GET"])
 def get_teaching_week():
-    """获取当前教学周设置"""
+    """获取当前教学周设置（当前周由开学日期推算，手动设置时以手动为准）"""
     try:
-        current_week = get_setting("current_week", "1")
-        total_weeks = get_setting("total_weeks", "20")
-        semester_start = get_setting("semester_start", "")
-
-        # 获取当前周次的中文描述
-        from utils.week_utils import get_week_description
+        current_week = get_current_week(user_id=g.user_id)
+        total_weeks = get_setting("total_weeks", "20", user_id=g.user_id)
+        semester_start = get_setting("semester_start", "", user_id=g.user_id)
 
         return jsonify(
             {
                 "success": True,
                 "data": {
-                    "current_week": int(current_week) if current_week else 1,
+                    "current_week": current_week,
+                    "derived_week": get_derived_week(user_id=g.user_id),
+                    "in_semester": is_in_semester(user_id=g.user_id),
+                    "mode": get_week_mode(g.user_id),
                     "total_weeks": int(total_weeks) if total_weeks else 20,
                     "semester_start": semester_start,
-                    "week_description": f"第{current_week}周"
-                    if current_week
-                    else "未设置",
+                    "week_description": f"第{current_week}周",
                 },
             }
         )
@@ -351,29 +1084,44 @@ def get_teaching_week():
 
 @app.route("/api/teaching-week", methods=["POST"])
 def set_teaching_week():
-    """设置当前教学周"""
+    """
+    设置教学周
+
+    设置了开学日期时，current_week 与推算结果不同才保存为手动周次，相同则恢复自动推算；
+    未设置开学日期时直接保存当前周
+    """
     data = request.get_json()
 
     try:
-        if "current_week" in data:
-            current_week = data["current_week"]
-            if not isinstance(current_week, int) or current_week < 1:
-                return jsonify({"success": False, "error": "当前周次必须为正整数"}), 400
-            set_setting("current_week", str(current_week))
+        current_week = data.get("current_week")
+        if current_week is not None and (
+            not isinstance(current_week, int) or not 1 <= current_week <= MAX_WEEKS
+        ):
+            return jsonify({"success": False, "error": "当前周次必须为正整数"}), 400
 
         if "total_weeks" in data:
             total_weeks = data["total_weeks"]
             if not isinstance(total_weeks, int) or total_weeks < 1 or total_weeks > 25:
                 return jsonify({"success": False, "error": "总周数必须在1-25之间"}), 400
-            set_setting("total_weeks", str(total_weeks))
+            set_setting("total_weeks", str(total_weeks), user_id=g.user_id)
 
         if "semester_start" in data:
-            set_setting("semester_start", data["semester_start"])
-
-        # 重新扫描今日课程
+            set_setting("semester_start", data["semester_start"], user_id=g.user_id)
+
+        if current_week is not None:
+            derived_week = get_derived_week(user_id=g.user_id)
+            if not get_setting("semester_start", "", user_id=g.user_id):
+                set_setting("current_week", str(current_week), user_id=g.user_id)
+                set_setting("week_override", "", user_id=g.user_id)
+            elif current_week == derived_week:
+                set_setting("week_override", "", user_id=g.user_id)
+            else:
+                set_setting("week_override", str(current_week), user_id=g.user_id)
+
+        # 重新扫描当前用户的今日课程
         from utils.scheduler import scan_daily_courses
 
-        scan_daily_courses()
+        scan_daily_courses(user_id=g.user_id)
 
         return jsonify({"success": True, "message": "教学周设置成功"})
     except Exception as e:
@@ -382,30 +1130,22 @@ def set_teaching_week():
 
 @app.route("/api/teaching-week/auto", methods=["POST"])
 def auto_calc_teaching_week():
-    """根据开学日期自动计算当前教学周"""
+    """清除手动设置的周次，恢复根据开学日期自动推算"""
     try:
-        semester_start = get_setting("semester_start")
+        semester_start = get_setting("semester_start", user_id=g.user_id)
 
         if not semester_start:
             return jsonify({"success": False, "error": "未设置开学日期"}), 400
 
-        start_date = datetime.strptime(semester_start, "%Y-%m-%d")
-        today = datetime.now()
-
-        days_passed = (today - start_date).days
-        current_week = (days_passed // 7) + 1
+        datetime.strptime(semester_start, "%Y-%m-%d")
 
-        if current_week < 1:
-            current_week = 1
-        elif current_week > 25:
-            current_week = 25
+        set_setting("week_override", "", user_id=g.user_id)
+        current_week = get_current_week(user_id=g.user_id)
 
-        set_setting("current_week", str(current_week))
-
-        # 重新扫描今日课程
+        # 重新扫描当前用户的今日课程
         from utils.scheduler import scan_daily_courses
 
-        scan_daily_courses()
+        scan_daily_courses(user_id=g.user_id)
 
         return jsonify(
             {
@@ -423,8 +1163,7 @@ def auto_calc_teaching_week():
 @app.route("/api/courses/week-pattern/<int:course_id>", methods=["GET"])
 def get_course_week_pattern(course_id):
     """获取课程的周次安排详情"""
-    courses = get_all_courses()
-    course = next((c for c in courses if c["id"] == course_id), None)
+    course = get_course_by_id(course_id, g.user_id)
 
     if not course:
         return jsonify({"success": False, "error": "课程不存在"}), 404
@@ -449,6 +1188,111 @@ def get_course_week_pattern(course_id):
     )
 
 
+# API路由 - 用户管理
+# 每个用户有独立的课程、推送渠道和教学周配置
+USER_SETTING_KEYS = [
+    "pushplus_token",
+    "serverchan_key",
+    "wecom_webhook_key",
+    "smtp_to",
+    "notify_channels",
+    "message_format",
+    "current_week",
+    "total_weeks",
+    "semester_start",
+]
+# 只返回是否已配置的密钥类配置
+SECRET_SETTING_KEYS = {"pushplus_token", "serverchan_key", "wecom_webhook_key"}
+
+
+@app.route("/api/users", methods=["GET"])
+def get_users_api():
+    """获取所有用户（仅管理员）"""
+    denied = require_owner()
+    if denied:
+        return denied
+
+    users = get_users()
+    return jsonify({"success": True, "users": users, "count": len(users)})
+
+
+@app.route("/api/users", methods=["POST"])
+def add_user_api():
+    """添加用户（仅管理员；可同时设置该用户的Token和教学周），返回该用户的API Key"""
+    denied = require_owner()
+    if denied:
+        return denied
+
+    data = request.get_json() or {}
+    name = str(data.get("name", "")).strip()
+
+    if not name:
+        return jsonify({"success": False, "error": "用户名不能为空"}), 400
+
+    try:
+        user_id = add_user(name)
+        for key in USER_SETTING_KEYS:
+            if key in data:
+                set_setting(key, str(data[key]), user_id=user_id)
+
+        return jsonify(
+            {
+                "success": True,
+                "user_id": user_id,
+                "api_key": get_user_api_key(user_id),
+                "message": "用户添加成功",
+            }
+        )
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+
+@app.route("/api/users/<int:user_id>", methods=["GET"])
+def get_user_api(user_id):
+    """获取单个用户及其配置（管理员或用户本人；Token等密钥只返回是否已配置）"""
+    if user_id != g.user_id:
+        denied = require_owner()
+        if denied:
+            return denied
+
+    user = get_user(user_id)
+    if not user:
+        return jsonify({"success": False, "error": "用户不存在"}), 404
+
+    settings = {
+        key: get_setting(key, user_id=user_id)
+        for key in USER_SETTING_KEYS
+        if key not in SECRET_SETTING_KEYS
+    }
+    settings["has_token"] = bool(get_setting("pushplus_token", user_id=user_id))
+    settings["configured_channels"] = configured_channels(get_channel_config(user_id))
+
+    return jsonify(
+        {
+            "success": True,
+            "user": dict(user, settings=settings),
+            "course_count": count_courses(user_id),
+        }
+    )
+
+
+@app.route("/api/users/<int:user_id>/api-key", methods=["POST"])
+def reset_user_api_key_api(user_id):
+    """重新生成用户的API Key（管理员或用户本人），原Key立即失效"""
+    if user_id != g.user_id:
+        denied = require_owner()
+        if denied:
+            return denied
+
+    if user_id == DEFAULT_USER_ID:
+        return jsonify({"success": False, "error": "默认用户使用 OWNER_API_KEY 配置"}), 400
+
+    api_key = reset_user_api_key(user_id)
+    if api_key is None:
+        return jsonify({"success": False, "error": "用户不存在"}), 404
+    return jsonify({"success": True, "user_id": user_id, "api_key": api_key})
+
+
 if __name__ == "__main__":
     # 避免Flask重载器导致重复初始化
     # WERKZEUG_RUN_MAIN只在实际运行进程（非监控进程）中设置
@@ -481,4 +1325,5 @@ if __name__ == "__main__":
         print("\n正在关闭服务...")
     finally:
         shutdown_scheduler()
+        shutdown_import_jobs()
         print("服务已停止")
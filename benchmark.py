@@ -0,0 +1,464 @@
+# -*- coding: utf-8 -*-
+"""
+性能基准测试
+用固定随机种子生成课程数据，在临时数据库中测量Excel解析、周次规则、节假日判断、
+每日扫描、提醒发送（替身推送渠道，不发送真实消息）和主要接口的耗时，结果输出为JSON便于前后对比
+
+用法:
+    python benchmark.py                          # 全部基准（Excel含10万行，约需数分钟）
+    python benchmark.py --quick                  # 缩小数据规模
+    python benchmark.py --output bench.json      # 保存结果
+    python benchmark.py --compare bench.json     # 与之前的结果对比
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from unittest import mock
+
+# 添加项目路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import config
+
+WEEK_PATTERNS = ["all", "all", "all", "odd", "even", "1-8", "9-16", "1-16", "1,3,5,7", "1-4,9-12"]
+TIME_SLOTS = [
+    ("08:00", "09:40"),
+    ("10:00", "11:40"),
+    ("14:00", "15:40"),
+    ("16:00", "17:40"),
+    ("19:00", "20:40"),
+]
+DAY_NAMES = ["周一", "周二", "周三", "周四", "周五", "周六", "周日"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="性能基准测试")
+    parser.add_argument("--quick", action="store_true", help="缩小数据规模（Excel最多1万行）")
+    parser.add_argument("--repeat", type=int, default=5, help="每项重复次数")
+    parser.add_argument("--seed", type=int, default=20240901, help="数据生成随机种子")
+    parser.add_argument("--only", help="只运行名称包含该字符串的基准")
+    parser.add_argument("--output", help="结果保存路径（JSON）")
+    parser.add_argument("--compare", help="与之前保存的结果对比")
+    return parser.parse_args()
+
+
+# 数据生成
+def generate_courses(count, seed, day_of_week=None):
+    """
+    生成课程数据
+
+    参数:
+        count: 课程数量
+        seed: 随机种子（相同种子生成相同数据）
+        day_of_week: 指定星期几，默认随机
+    """
+    rng = random.Random(seed)
+    courses = []
+    for index in range(count):
+        start_time, end_time = rng.choice(TIME_SLOTS)
+        courses.append(
+            {
+                "name": f"课程{index:06d}",
+                "day_of_week": day_of_week or rng.randint(1, 7),
+                "start_time": start_time,
+                "end_time": end_time,
+                "location": f"{rng.choice('ABCDE')}{rng.randint(101, 520)}",
+                "remark": rng.choice(["", "", "带教材", "实验课"]),
+                "week_pattern": rng.choice(WEEK_PATTERNS),
+            }
+        )
+    return courses
+
+
+def write_excel(path, courses):
+    """将课程写入Excel（只写模式，10万行也能较快生成）"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(["课程名称", "星期", "开始时间", "结束时间", "地点", "备注", "周次"])
+    for course in courses:
+        sheet.append(
+            [
+                course["name"],
+                DAY_NAMES[course["day_of_week"] - 1],
+                course["start_time"],
+                course["end_time"],
+                course["location"],
+                course["remark"],
+                course["week_pattern"],
+            ]
+        )
+    workbook.save(path)
+
+
+# 计时
+def measure(name, func, repeat, setup=None, items=None, params=None):
+    """
+    重复执行func并统计耗时
+
+    参数:
+        name: 基准名称
+        func: 被测函数
+        repeat: 重复次数
+        setup: 每次执行前调用（不计入耗时）
+        items: 每次处理的条目数，用于计算单条耗时
+        params: 记录到结果中的参数
+
+    返回:
+        dict: 基准结果
+    """
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+
+    median = statistics.median(timings)
+    result = {
+        "name": name,
+        "params": params or {},
+        "repeat": repeat,
+        "min": round(min(timings), 6),
+        "median": round(median, 6),
+        "mean": round(statistics.mean(timings), 6),
+        "max": round(max(timings), 6),
+        "unit": "s",
+    }
+    if items:
+        result["items"] = items
+        result["per_item_us"] = round(median / items * 1e6, 3)
+    print(
+        f"{name:<40} median {median * 1000:10.3f} ms"
+        + (f"  ({result['per_item_us']} us/条)" if items else "")
+    )
+    return result
+
+
+def teaching_day():
+    """
+    选取一个确定的上课日（下一个非节假日的周三 06:00），保证扫描结果不随运行时间变化
+    """
+    from utils.holiday_checker import should_send_reminder
+
+    day = datetime.now().replace(hour=6, minute=0, second=0, microsecond=0)
+    day += timedelta(days=(2 - day.weekday()) % 7)
+    while not should_send_reminder(day):
+        day += timedelta(days=7)
+    return day
+
+
+# 基准
+def bench_parse_excel(args, results, workdir):
+    from utils.excel_parser import parse_excel
+
+    sizes = [1000, 10000] if args.quick else [1000, 10000, 100000]
+    for size in sizes:
+        path = os.path.join(workdir, f"courses_{size}.xlsx")
+        write_excel(path, generate_courses(size, args.seed))
+
+        def run():
+            result = parse_excel(path)
+            assert result["success"], result
+
+        repeat = max(1, args.repeat if size <= 10000 else 1)
+        results.append(
+            measure(f"parse_excel[{size}]", run, repeat, items=size, params={"rows": size})
+        )
+
+
+def bench_week_patterns(args, results, workdir):
+    from utils.week_utils import is_course_active, parse_week_pattern
+
+    rng = random.Random(args.seed)
+    patterns = [rng.choice(WEEK_PATTERNS) for _ in range(10000)]
+
+    def parse_all():
+        for pattern in patterns:
+            parse_week_pattern(pattern)
+
+    def check_all():
+        for pattern in patterns:
+            for week in range(1, 21):
+                is_course_active(pattern, week)
+
+    results.append(
+        measure("parse_week_pattern[10k]", parse_all, args.repeat, items=len(patterns))
+    )
+    results.append(
+        measure(
+            "is_course_active[10k x 20周]",
+            check_all,
+            args.repeat,
+            items=len(patterns) * 20,
+        )
+    )
+
+
+def bench_holidays(args, results, workdir):
+    from utils.holiday_checker import is_holiday, load_holidays
+
+    year = datetime.now().year
+    start = datetime(year, 1, 1)
+    dates = [(start + timedelta(days=offset)).strftime("%Y-%m-%d") for offset in range(365)]
+    holidays_data = load_holidays()
+
+    def check_loaded():
+        for date in dates:
+            is_holiday(date, holidays_data)
+
+    def check_default():
+        for date in dates:
+            is_holiday(date)
+
+    results.append(
+        measure("is_holiday[365天,已加载]", check_loaded, args.repeat, items=len(dates))
+    )
+    results.append(
+        measure("is_holiday[365天]", check_default, args.repeat, items=len(dates))
+    )
+
+
+def bench_scan(args, results, workdir):
+    from utils import clock
+    from utils import database as db
+    from utils import scheduler
+
+    moment = teaching_day()
+    count = 2000 if args.quick else 10000
+    db.delete_all_courses()
+    db.add_courses(generate_courses(count, args.seed, day_of_week=moment.isoweekday()))
+
+    def clear_reminders():
+        conn = db.get_db_connection()
+        conn.execute("DELETE FROM reminders")
+        conn.commit()
+        conn.close()
+
+    previous = clock.set_clock(clock.VirtualClock(moment).now)
+    try:
+        result = measure(
+            f"scan_daily_courses[{count}]",
+            scheduler.scan_daily_courses,
+            args.repeat,
+            setup=clear_reminders,
+            items=count,
+            params={"courses": count, "date": moment.strftime("%Y-%m-%d")},
+        )
+    finally:
+        clock.set_clock(previous)
+    # 记录生成的提醒数，确认扫描确实生成了提醒
+    result["params"]["reminders"] = sum(db.count_reminders_by_status().values())
+    results.append(result)
+    clear_reminders()
+
+
+def bench_dispatch(args, results, workdir):
+    from utils import database as db
+    from utils import notify_channels
+    from utils.scheduler import check_and_send_reminders
+
+    count = 500 if args.quick else 2000
+    db.set_setting("pushplus_token", "benchmark-token")
+    course_ids = [course["id"] for course in db.get_all_courses()][:count]
+    if len(course_ids) < count:
+        new_ids, _ = db.add_courses(generate_courses(count - len(course_ids), args.seed))
+        course_ids += new_ids
+    due = datetime.now().replace(microsecond=0) - timedelta(minutes=1)
+
+    def seed_reminders():
+        conn = db.get_db_connection()
+        conn.execute("DELETE FROM reminders")
+        conn.commit()
+        conn.close()
+        db.add_reminders(
+            [(db.DEFAULT_USER_ID, course_id, due, None) for course_id in course_ids]
+        )
+
+    def stub_push(channel_config, message):
+        return {"success": True, "message": "发送成功"}
+
+    with mock.patch.dict(notify_channels.CHANNELS, {"pushplus": stub_push}):
+        results.append(
+            measure(
+                f"check_and_send_reminders[{len(course_ids)}]",
+                lambda: check_and_send_reminders("benchmark"),
+                args.repeat,
+                setup=seed_reminders,
+                items=len(course_ids),
+                params={"reminders": len(course_ids)},
+            )
+        )
+
+
+def bench_routes(args, results, workdir):
+    import app as app_module
+    from utils import database as db
+    from utils.artifact_cache import invalidate_artifact
+
+    # 接口按单个用户的常见规模测试
+    user_id = db.add_user("基准测试用户")
+    db.add_courses(generate_courses(300, args.seed), user_id=user_id)
+    db.set_setting("semester_start", datetime.now().strftime("%Y-%m-%d"), user_id=user_id)
+
+    app = app_module.app
+    app._initialized = True
+    client = app.test_client()
+    headers = {"X-Api-Key": db.get_user_api_key(user_id)}
+    routes = [
+        "/",
+        "/settings",
+        "/api/courses",
+        "/api/courses?limit=50",
+        "/api/courses/search?q=课程0001",
+        "/api/schedule",
+        "/api/status",
+        "/api/conflicts",
+        "/api/free-slots?day=1",
+        "/api/calendar.ics",
+        "/api/export",
+    ]
+    routes = [(route, route) for route in routes]
+
+    # 按游标取第2页，测量键集分页
+    first_page = client.get("/api/courses?limit=50", headers=headers).get_json()
+    if first_page.get("next_cursor"):
+        routes.insert(
+            4,
+            (
+                "/api/courses?limit=50&cursor=<第2页>",
+                f"/api/courses?limit=50&cursor={first_page['next_cursor']}",
+            ),
+        )
+    requests_per_run = 20
+
+    def clear_caches():
+        # 更新数据版本并清空生成内容缓存，测量接口实际生成响应的耗时
+        db.bump_data_version()
+        invalidate_artifact()
+
+    for name, route in routes:
+        response = client.get(route, headers=headers)
+        if response.status_code >= 400:
+            print(f"{name} 返回 {response.status_code}，跳过")
+            continue
+
+        def run_uncached():
+            for _ in range(requests_per_run):
+                clear_caches()
+                client.get(route, headers=headers).get_data()
+
+        def run_cached():
+            for _ in range(requests_per_run):
+                client.get(route, headers=headers).get_data()
+
+        for cache, run in (("miss", run_uncached), ("hit", run_cached)):
+            results.append(
+                measure(
+                    f"GET {name}" + (" [缓存命中]" if cache == "hit" else ""),
+                    run,
+                    args.repeat,
+                    items=requests_per_run,
+                    params={"courses": 300, "cache": cache},
+                )
+            )
+
+
+BENCHMARKS = [
+    ("parse_excel", bench_parse_excel),
+    ("week_pattern", bench_week_patterns),
+    ("holiday", bench_holidays),
+    ("scan", bench_scan),
+    ("dispatch", bench_dispatch),
+    ("routes", bench_routes),
+]
+
+
+def environment_info():
+    """记录运行环境，便于判断结果是否可比"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+
+    return {
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+    }
+
+
+def compare(previous_path, results):
+    """输出与之前结果的对比（中位数变化）"""
+    with open(previous_path, encoding="utf-8") as f:
+        previous = {item["name"]: item for item in json.load(f)["results"]}
+
+    print(f"\n与 {previous_path} 对比（中位数）:")
+    for result in results:
+        old = previous.get(result["name"])
+        if not old:
+            print(f"{result['name']:<40} 新增")
+            continue
+        change = (result["median"] - old["median"]) / old["median"] * 100 if old["median"] else 0
+        print(
+            f"{result['name']:<40} {old['median'] * 1000:10.3f} -> "
+            f"{result['median'] * 1000:10.3f} ms  {change:+6.1f}%"
+        )
+
+
+def main():
+    args = parse_args()
+
+    workdir = tempfile.mkdtemp()
+    config.DATABASE_PATH = os.path.join(workdir, "benchmark.db")
+
+    from utils.database import init_database
+
+    init_database()
+    # 逐条的INFO日志会淹没输出，也会让耗时受终端影响
+    logging.getLogger("utils.scheduler").setLevel(logging.WARNING)
+    logging.getLogger("utils.notify_channels").setLevel(logging.WARNING)
+
+    results = []
+    for name, bench in BENCHMARKS:
+        if args.only and args.only not in name:
+            continue
+        bench(args, results, workdir)
+
+    report = {"meta": environment_info(), "results": results}
+    report["meta"].update(quick=args.quick, repeat=args.repeat, seed=args.seed)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到 {args.output}")
+    else:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -14,8 +14,17 @@ DATABASE_PATH = os.path.join(BASE_DIR, "database.db")
 # 节假日文件路径
 HOLIDAYS_PATH = os.path.join(BASE_DIR, "holidays.json")
 
-# Flask配置
-SECRET_KEY = "schedule-reminder-secret-key-2024"
+# 提醒消息模板：自定义目录中的同名文件优先于内置模板（templates/messages）
+MESSAGE_TEMPLATE_DIR = os.path.join(BASE_DIR, "message_templates")
+MESSAGE_CACHE_SIZE = 4096  # 渲染结果缓存条数
+
+# Flask配置（会话用于记住已验证的用户，密钥需保密；未设置时每次启动随机生成）
+SECRET_KEY = os.environ.get("SECRET_KEY") or os.urandom(32).hex()
+
+# 多用户访问控制：其他用户通过各自的API Key（请求头 X-Api-Key 或查询参数 api_key）访问，
+# 验证后记录在会话中；设置 OWNER_API_KEY 后默认用户也必须提供该Key，
+# 未设置时不带Key的请求按默认用户处理（单机使用）
+OWNER_API_KEY = os.environ.get("OWNER_API_KEY", "")
 DEBUG = True
 
 # 服务器配置
@@ -25,8 +34,50 @@ PORT = 5000
 # 提醒时间配置（分钟）
 REMINDER_TIMES = [15, 5]  # 提前15分钟和5分钟提醒
 
-# PushPlus配置
-PUSHPLUS_API = "http://www.pushplus.plus/send"
+# 提醒发送队列配置
+REMINDER_CLAIM_BATCH = 50  # 每次领取的提醒数量
+REMINDER_LEASE_SECONDS = 120  # 领取后的租约时长，超时未完成可被重新领取
+REMINDER_MAX_ATTEMPTS = 3  # 最大发送次数
+REMINDER_RETRY_SECONDS = 60  # 发送失败后的重试间隔
+
+# 教室空闲查询的时间范围
+ROOM_DAY_START = "08:00"
+ROOM_DAY_END = "22:00"
+
+# 日历订阅（ICS）使用的时区
+CALENDAR_TIMEZONE = "Asia/Shanghai"
+# 请求时检查其他进程（如 set_week.py）修改教学周配置的最短间隔（秒）
+CALENDAR_REFRESH_SECONDS = 5
+
+# PushPlus配置（压测时可通过环境变量指向本地模拟服务，见 mock_pushplus.py）
+PUSHPLUS_API = os.environ.get("PUSHPLUS_API", "http://www.pushplus.plus/send")
+
+# 其他推送渠道配置
+SERVERCHAN_API = "https://sctapi.ftqq.com/{key}.send"
+WECOM_WEBHOOK_API = "https://qyapi.weixin.qq.com/cgi-bin/webhook/send"
+SMTP_HOST = "localhost"  # 本地邮件中继
+SMTP_PORT = 25
+SMTP_FROM = "reminder@localhost"
+CHANNEL_TIMEOUT = 10  # 单个渠道的请求超时（秒）
+
+# 渠道健康度：最近若干次发送的p95耗时或失败率超过阈值时，该渠道排到最后
+CHANNEL_STATS_WINDOW = 50
+CHANNEL_STATS_MAX_AGE = 600  # 超过该时间（秒）的记录不再计入，降级的渠道随之恢复
+CHANNEL_MIN_SAMPLES = 5
+CHANNEL_P95_THRESHOLD = 3.0  # 秒
+CHANNEL_ERROR_RATE_THRESHOLD = 0.5
+
+# 渠道熔断：连续失败或连续超时达到阈值后熔断，熔断期间直接失败，提醒留在队列中
+CIRCUIT_FAILURE_THRESHOLD = 5  # 连续失败次数
+CIRCUIT_TIMEOUT_THRESHOLD = 2  # 连续超时次数
+CIRCUIT_RESET_SECONDS = 30  # 熔断后多久允许探测
+CIRCUIT_PROBE_TIMEOUT = 3  # 探测请求超时（秒）
+
+# 请求性能分析（由配置 request_profiling 开启）
+SLOW_REQUEST_SECONDS = 0.5  # 超过该耗时的请求记录SQL列表
+SLOW_REQUEST_KEEP = 50  # 保留最近的慢请求数
+PROFILE_SAMPLE_RATE = 0.1  # cProfile/pyinstrument模式的抽样比例
+PROFILE_KEEP = 20  # 保留最近的分析结果数
 
 # 日志配置
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
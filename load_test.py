@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+"""
+提醒发送压测脚本
+在临时数据库中生成N门课程和到期提醒，用多个发送进程（线程）运行 check_and_send_reminders，
+统计吞吐量、送达延迟分位数以及重复/漏发情况。默认启动本地PushPlus模拟服务，不会发送真实消息
+
+用法:
+    python load_test.py --courses 1000 --users 5 --workers 4 --latency 0.05 --error-rate 0.02
+    python load_test.py --pushplus-url http://127.0.0.1:5055/send   # 使用已启动的模拟服务
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+import requests
+
+# 添加项目路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from mock_pushplus import MockPushPlus, start_server
+
+COURSE_PREFIX = "压测课程-"
+NAME_PATTERN = re.compile(re.escape(COURSE_PREFIX) + r"\d+")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="提醒发送压测")
+    parser.add_argument("--courses", type=int, default=1000, help="课程（提醒）数量")
+    parser.add_argument("--users", type=int, default=5, help="用户数量")
+    parser.add_argument("--workers", type=int, default=4, help="并发发送进程数")
+    parser.add_argument("--latency", type=float, default=0.02, help="模拟服务固定延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.03, help="模拟服务随机延迟上限（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="模拟服务返回500的比例")
+    parser.add_argument("--rate-limit", type=int, default=0, help="每个Token每秒最多请求数")
+    parser.add_argument("--pushplus-url", help="使用已启动的模拟服务（不启动内置服务）")
+    parser.add_argument("--retry-seconds", type=int, default=1, help="发送失败后的重试间隔")
+    parser.add_argument("--circuit-reset", type=int, default=2, help="熔断后的探测间隔")
+    parser.add_argument("--timeout", type=float, default=300, help="最长运行时间（秒）")
+    parser.add_argument("--verbose", action="store_true", help="输出发送日志")
+    return parser.parse_args()
+
+
+def percentile(values, pct):
+    """计算分位数（最近秩）"""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def configure(args):
+    """在导入业务模块前设置临时数据库、模拟服务地址和重试间隔"""
+    mock = None
+    url = args.pushplus_url
+    if not url:
+        mock = MockPushPlus(args.latency, args.jitter, args.error_rate, args.rate_limit)
+        _, url = start_server(mock)
+
+    config.DATABASE_PATH = os.path.join(tempfile.mkdtemp(), "load_test.db")
+    config.PUSHPLUS_API = url
+    config.REMINDER_RETRY_SECONDS = args.retry_seconds
+    config.CIRCUIT_RESET_SECONDS = args.circuit_reset
+    return mock, url
+
+
+def seed(args, db):
+    """
+    生成用户、课程和到期提醒
+
+    返回:
+        tuple: (提醒到期时间戳, 课程名称集合)
+    """
+    user_ids = [db.DEFAULT_USER_ID]
+    db.set_setting("pushplus_token", "load-test-token-1")
+    for index in range(2, args.users + 1):
+        user_id = db.add_user(f"压测用户{index}")
+        db.set_setting("pushplus_token", f"load-test-token-{index}", user_id=user_id)
+        user_ids.append(user_id)
+
+    # 课程在 REMINDER_TIMES[0] 分钟后开始，提醒时间为当前分钟，立即到期
+    minutes_before = config.REMINDER_TIMES[0]
+    due = datetime.now().replace(second=0, microsecond=0)
+    start = due + timedelta(minutes=minutes_before)
+    end = start + timedelta(minutes=45)
+
+    names = set()
+    reminders = []
+    for user_index, user_id in enumerate(user_ids):
+        courses = []
+        for index in range(user_index, args.courses, len(user_ids)):
+            name = f"{COURSE_PREFIX}{index:06d}"
+            names.add(name)
+            courses.append(
+                {
+                    "name": name,
+                    "day_of_week": due.isoweekday(),
+                    "start_time": start.strftime("%H:%M"),
+                    "end_time": end.strftime("%H:%M"),
+                    "location": f"A{index % 500}",
+                    "remark": "",
+                    "week_pattern": "all",
+                }
+            )
+        course_ids, errors = db.add_courses(courses, user_id=user_id)
+        if errors:
+            raise RuntimeError(f"生成课程失败: {errors[:3]}")
+        reminders += [(user_id, course_id, due, None) for course_id in course_ids]
+
+    db.add_reminders(reminders)
+    return due.timestamp(), names
+
+
+def count_open_reminders(db):
+    """统计尚未完成（待发送、已领取或发送中）的提醒"""
+    conn = db.get_db_connection()
+    row = conn.execute(
+        "SELECT COUNT(*) FROM reminders WHERE status IN (?, ?, ?)",
+        (db.REMINDER_PENDING, db.REMINDER_CLAIMED, db.REMINDER_SENDING),
+    ).fetchone()
+    conn.close()
+    return row[0]
+
+
+def count_by_status(db):
+    """按状态统计提醒"""
+    conn = db.get_db_connection()
+    rows = conn.execute("SELECT status, COUNT(*) FROM reminders GROUP BY status")
+    result = {status: count for status, count in rows}
+    conn.close()
+    return result
+
+
+def fetch_messages(mock, url):
+    """获取模拟服务已成功接收的消息"""
+    if mock is not None:
+        with mock.lock:
+            messages = list(mock.messages)
+        return messages, mock.stats()
+
+    base = url.rsplit("/", 1)[0]
+    messages = requests.get(f"{base}/messages", timeout=30).json()
+    stats = requests.get(f"{base}/stats", timeout=30).json()
+    return messages, stats
+
+
+def main():
+    args = parse_args()
+    mock, url = configure(args)
+
+    # 业务模块在配置完成后导入
+    import logging
+
+    from utils import database as db
+    from utils.scheduler import check_and_send_reminders
+    from utils.notify_channels import get_breaker_states
+
+    if not args.verbose:
+        logging.getLogger("utils.scheduler").setLevel(logging.CRITICAL)
+        logging.getLogger("utils.notify_channels").setLevel(logging.CRITICAL)
+
+    db.init_database()
+    due_ts, names = seed(args, db)
+    print(f"模拟服务: {url}")
+    print(f"已生成 {args.users} 个用户、{len(names)} 门课程的到期提醒，{args.workers} 个发送进程")
+
+    done = threading.Event()
+
+    def worker(index):
+        worker_id = f"load-{index}"
+        while not done.is_set():
+            try:
+                check_and_send_reminders(worker_id)
+            except Exception as e:
+                print(f"[{worker_id}] 发送出错: {e}")
+            done.wait(0.05)
+
+    started = time.time()
+    threads = [
+        threading.Thread(target=worker, args=(index,), daemon=True)
+        for index in range(args.workers)
+    ]
+    for thread in threads:
+        thread.start()
+
+    while count_open_reminders(db) and time.time() - started < args.timeout:
+        time.sleep(0.1)
+    elapsed = time.time() - started
+    done.set()
+    for thread in threads:
+        thread.join()
+
+    messages, mock_stats = fetch_messages(mock, url)
+    received = Counter()
+    lags = []
+    for message in messages:
+        match = NAME_PATTERN.search(message["content"])
+        if not match:
+            continue
+        name = match.group(0)
+        if name in names and not received[name]:
+            lags.append(message["received_at"] - max(due_ts, started))
+        received[name] += 1
+
+    statuses = count_by_status(db)
+    duplicates = sum(count - 1 for count in received.values() if count > 1)
+    missed = [name for name in names if not received[name]]
+    delivered = len(names) - len(missed)
+
+    report = {
+        "reminders": len(names),
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_per_second": round(delivered / elapsed, 1) if elapsed else 0,
+        "lag_seconds": {
+            "p50": round(percentile(lags, 50), 3),
+            "p95": round(percentile(lags, 95), 3),
+            "p99": round(percentile(lags, 99), 3),
+            "max": round(max(lags), 3) if lags else 0.0,
+        },
+        "delivered": delivered,
+        "duplicates": duplicates,
+        "missed": len(missed),
+        "reminder_status": statuses,
+        "mock": mock_stats,
+        "circuits": get_breaker_states(),
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if missed:
+        print(f"漏发示例: {missed[:5]}")
+
+    return 1 if duplicates or statuses.get(db.REMINDER_SENT, 0) != delivered else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
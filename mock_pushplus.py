@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+本地PushPlus模拟服务
+实现PushPlus的 /send 接口，可配置延迟、错误率和限流，用于压测提醒发送而不打扰真实用户
+
+用法:
+    python mock_pushplus.py --port 5055 --latency 0.2 --error-rate 0.05 --rate-limit 20
+    PUSHPLUS_API=http://127.0.0.1:5055/send python app.py
+
+辅助接口:
+    GET  /stats     统计信息
+    GET  /messages  已成功接收的消息
+    POST /reset     清空记录
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+class MockPushPlus:
+    """模拟服务的状态（延迟、错误率、限流配置和接收记录）"""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, rate_limit=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit  # 每个Token每秒最多请求数，0为不限
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """清空接收记录和统计"""
+        with self.lock:
+            self.messages = []
+            self.counts = Counter()
+            self.recent = {}  # {token: deque[请求时间]}
+
+    def _throttled(self, token, now):
+        """按Token的滑动1秒窗口限流"""
+        if not self.rate_limit:
+            return False
+        window = self.recent.setdefault(token, deque())
+        while window and now - window[0] >= 1:
+            window.popleft()
+        if len(window) >= self.rate_limit:
+            return True
+        window.append(now)
+        return False
+
+    def handle_send(self, fields):
+        """
+        处理一次发送请求
+
+        返回:
+            tuple: (HTTP状态码, 响应JSON)
+        """
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        token = fields.get("token", "")
+        now = time.time()
+        with self.lock:
+            self.counts["requests"] += 1
+            if not token:
+                self.counts["invalid"] += 1
+                return 200, {"code": 903, "msg": "无效的用户token", "data": None}
+            if self._throttled(token, now):
+                self.counts["throttled"] += 1
+                return 200, {"code": 900, "msg": "请求过于频繁", "data": None}
+            if random.random() < self.error_rate:
+                self.counts["errors"] += 1
+                return 500, {"code": 500, "msg": "服务器内部错误", "data": None}
+
+            self.counts["delivered"] += 1
+            self.messages.append(
+                {
+                    "received_at": now,
+                    "token": token,
+                    "title": fields.get("title", ""),
+                    "content": fields.get("content", ""),
+                    "template": fields.get("template", "html"),
+                }
+            )
+
+        return 200, {"code": 200, "msg": "请求成功", "data": uuid.uuid4().hex}
+
+    def stats(self):
+        """统计信息"""
+        with self.lock:
+            return dict(self.counts, messages=len(self.messages))
+
+
+def make_handler(mock):
+    """生成绑定到模拟服务状态的请求处理类"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status, data):
+            body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _fields(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length).decode("utf-8")
+            if "json" in (self.headers.get("Content-Type") or ""):
+                return json.loads(raw or "{}")
+            return {key: values[0] for key, values in parse_qs(raw).items()}
+
+        def do_POST(self):
+            if self.path.startswith("/send"):
+                self._reply(*mock.handle_send(self._fields()))
+            elif self.path == "/reset":
+                mock.reset()
+                self._reply(200, {"code": 200})
+            else:
+                self._reply(404, {"code": 404, "msg": "not found"})
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self._reply(200, mock.stats())
+            elif self.path == "/messages":
+                with mock.lock:
+                    self._reply(200, list(mock.messages))
+            else:
+                # 熔断探测请求
+                self._reply(200, {"code": 200})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start_server(mock, host="127.0.0.1", port=0):
+    """
+    在后台线程启动模拟服务
+
+    返回:
+        tuple: (服务对象, /send 接口地址)
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(mock))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/send"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地PushPlus模拟服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--latency", type=float, default=0.0, help="固定延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="额外随机延迟上限（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回500的比例")
+    parser.add_argument("--rate-limit", type=int, default=0, help="每个Token每秒最多请求数")
+    args = parser.parse_args()
+
+    mock = MockPushPlus(args.latency, args.jitter, args.error_rate, args.rate_limit)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(mock))
+    print(f"PushPlus模拟服务: http://{args.host}:{args.port}/send")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(mock.stats())
+
+
+if __name__ == "__main__":
+    main()
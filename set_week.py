@@ -10,18 +10,37 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from utils.database import set_setting, get_setting
+from utils.teaching_calendar import get_current_week, get_week_mode
+
+WEEK_MODE_NAMES = {
+    "manual": "手动设置",
+    "auto": "按开学日期推算",
+    "stored": "未设置开学日期",
+}
+
+
+def print_settings():
+    """显示当前教学周设置"""
+    print("当前设置:")
+    print(f"  当前周: 第{get_current_week()}周（{WEEK_MODE_NAMES[get_week_mode()]}）")
+    print(f"  总周数: {get_setting('total_weeks', '20')}周")
+    print(f"  开学日期: {get_setting('semester_start', '') or '未设置'}")
 
 
 def main():
     if len(sys.argv) < 2:
         print("用法: python set_week.py <周次>")
-        print("示例: python set_week.py 5   # 设置为第5周")
+        print("示例: python set_week.py 5     # 手动设置为第5周")
+        print("      python set_week.py auto  # 恢复根据开学日期自动推算")
+        print()
+        print_settings()
+        return
+
+    if sys.argv[1] == "auto":
+        set_setting("week_override", "")
+        print("✅ 已恢复自动推算教学周")
         print()
-        print("当前设置:")
-        current = get_setting("current_week", "未设置")
-        total = get_setting("total_weeks", "20")
-        print(f"  当前周: 第{current}周")
-        print(f"  总周数: {total}周")
+        print_settings()
         return
 
     try:
@@ -30,15 +49,16 @@ def main():
             print("错误: 周次必须在1-25之间")
             return
 
-        set_setting("current_week", str(week))
+        # 设置了开学日期时保存为手动周次，否则直接保存当前周
+        if get_setting("semester_start", ""):
+            set_setting("week_override", str(week))
+        else:
+            set_setting("current_week", str(week))
         print(f"✅ 已设置为第{week}周")
 
         # 显示当前所有设置
         print()
-        print("当前设置:")
-        print(f"  当前周: 第{get_setting('current_week', '1')}周")
-        print(f"  总周数: {get_setting('total_weeks', '20')}周")
-        print(f"  开学日期: {get_setting('semester_start', '未设置')}")
+        print_settings()
 
     except ValueError:
         print("错误: 请输入有效的数字")
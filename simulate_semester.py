@@ -0,0 +1,428 @@
+# -*- coding: utf-8 -*-
+"""
+学期快进模拟
+用虚拟时钟逐日回放整个学期：每天00:05扫描课程、按提醒时间领取发送、每周一清理旧数据，
+节假日、调休和教学周变化都按真实逻辑处理。推送渠道替换为替身，不发送真实消息。
+输出推送总数、每天/每周的推送数、峰值以及异常（节假日推送、重复、漏发、延迟、数量不符、教学周跳变）
+
+用法:
+    python simulate_semester.py                              # 生成1个用户、30门课程
+    python simulate_semester.py --users 50 --courses 40      # 容量评估
+    python simulate_semester.py --database database.db       # 回放现有数据库（复制后使用）
+    python simulate_semester.py --error-rate 0.05 --output semester.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from unittest import mock
+
+# 添加项目路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from benchmark import generate_courses
+
+SCAN_TIME = (0, 5)  # 每日扫描 00:05
+CLEANUP_TIME = (2, 0)  # 每周一清理 02:00
+SIMULATOR_TOKEN = "simulator-token"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="学期快进模拟")
+    parser.add_argument("--database", help="回放现有数据库（复制到临时目录，不修改原文件）")
+    parser.add_argument("--users", type=int, default=1, help="生成的用户数量")
+    parser.add_argument("--courses", type=int, default=30, help="每个用户生成的课程数量")
+    parser.add_argument("--seed", type=int, default=20240901, help="课程生成随机种子")
+    parser.add_argument("--start", help="开学日期 YYYY-MM-DD，默认使用数据库配置或节假日数据最近的秋季学期")
+    parser.add_argument("--weeks", type=int, help="学期周数，默认使用数据库配置")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="替身渠道返回失败的比例")
+    parser.add_argument("--late-seconds", type=int, default=60, help="送达延迟超过该值视为异常")
+    parser.add_argument("--output", help="完整报告保存路径（JSON）")
+    parser.add_argument("--verbose", action="store_true", help="输出扫描和发送日志")
+    return parser.parse_args()
+
+
+def configure(args):
+    """在导入业务模块前设置临时数据库（回放时复制现有数据库）"""
+    path = os.path.join(tempfile.mkdtemp(), "simulate.db")
+    if args.database:
+        shutil.copyfile(args.database, path)
+    config.DATABASE_PATH = path
+    return path
+
+
+def default_semester_start():
+    """节假日数据中最近一个完整秋季学期的开学日期（9月1日）"""
+    from utils.holiday_checker import load_holidays
+
+    years = [int(year) for year in load_holidays() if year.isdigit()]
+    year = max(years) - 1 if len(years) > 1 else datetime.now().year
+    return f"{year}-09-01"
+
+
+def seed(args, db):
+    """
+    准备模拟数据：生成用户和课程，或清空回放数据库中的历史提醒
+
+    返回:
+        list: 用户ID列表
+    """
+    if args.database:
+        conn = db.get_db_connection()
+        conn.execute("DELETE FROM reminders")
+        conn.commit()
+        conn.close()
+        return [user["id"] for user in db.get_users()]
+
+    db.set_setting("pushplus_token", SIMULATOR_TOKEN)
+    user_ids = [db.DEFAULT_USER_ID]
+    for index in range(2, args.users + 1):
+        user_id = db.add_user(f"模拟用户{index}")
+        db.set_setting("pushplus_token", f"{SIMULATOR_TOKEN}-{index}", user_id=user_id)
+        user_ids.append(user_id)
+
+    for index, user_id in enumerate(user_ids):
+        _, errors = db.add_courses(
+            generate_courses(args.courses, args.seed + index), user_id=user_id
+        )
+        if errors:
+            raise RuntimeError(f"生成课程失败: {errors[:3]}")
+    return user_ids
+
+
+def make_stub(name, rng, error_rate, pushes, clock):
+    """生成记录每次推送的替身渠道"""
+
+    def stub(channel_config, message):
+        success = rng.random() >= error_rate
+        pushes.append(
+            {
+                "at": clock.now(),
+                "channel": name,
+                "title": message["title"],
+                "content": message["content"],
+                "success": success,
+            }
+        )
+        if success:
+            return {"success": True, "message": "发送成功"}
+        return {"success": False, "error": "模拟发送失败"}
+
+    return stub
+
+
+def at(day, hour_minute):
+    """指定日期的某个时刻"""
+    return datetime.combine(day, datetime.min.time()).replace(
+        hour=hour_minute[0], minute=hour_minute[1]
+    )
+
+
+def next_due_time(db):
+    """队列中最早可领取的时间（考虑失败重试和租约），队列为空时返回None"""
+    conn = db.get_db_connection()
+    row = conn.execute(
+        """
+        SELECT MIN(CASE WHEN lease_until > remind_time THEN lease_until ELSE remind_time END)
+        FROM reminders WHERE status IN (?, ?, ?)
+    """,
+        (db.REMINDER_PENDING, db.REMINDER_CLAIMED, db.REMINDER_SENDING),
+    ).fetchone()
+    conn.close()
+    return datetime.fromisoformat(row[0]) if row[0] else None
+
+
+def day_reminders(db, day):
+    """当天的全部提醒记录"""
+    start = at(day, (0, 0))
+    conn = db.get_db_connection()
+    rows = conn.execute(
+        """
+        SELECT user_id, course_id, remind_time, status, sent_at, attempts
+        FROM reminders WHERE remind_time >= ? AND remind_time < ?
+    """,
+        (start, start + timedelta(days=1)),
+    ).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+
+def expected_reminders(day, scan_time, user_ids, weeks):
+    """
+    按课表独立推算当天应生成的提醒数（节假日为0）
+
+    参数:
+        weeks: {用户ID: 当天教学周}
+    """
+    from utils.course_exceptions import apply_course_exceptions
+    from utils.database import get_courses_by_day, get_exceptions_for_date
+    from utils.holiday_checker import get_effective_weekday, should_send_reminder
+    from utils.teaching_calendar import is_in_semester
+    from utils.week_utils import is_course_active
+
+    if not should_send_reminder(scan_time):
+        return 0
+
+    effective_day, effective_week = get_effective_weekday(scan_time)
+    date = day.strftime("%Y-%m-%d")
+    exceptions = get_exceptions_for_date(date)
+    expected = 0
+    for user_id in user_ids:
+        if effective_week is None and not is_in_semester(day, user_id):
+            continue
+        week = effective_week or weeks[user_id]
+        courses = [
+            course
+            for course in get_courses_by_day(effective_day or day.isoweekday(), user_id)
+            if is_course_active(course.get("week_pattern", "all"), week)
+        ]
+        courses = apply_course_exceptions(
+            courses, [e for e in exceptions if e["user_id"] == user_id], date
+        )
+        for course in courses:
+            start = datetime.strptime(f"{date} {course['start_time']}", "%Y-%m-%d %H:%M")
+            expected += sum(
+                1
+                for minutes in config.REMINDER_TIMES
+                if start - timedelta(minutes=minutes) > scan_time
+            )
+    return expected
+
+
+def run_day(day, db, scheduler, clock, pushes):
+    """
+    回放一天：扫描、按到期时间逐分钟发送、周一清理
+
+    返回:
+        Counter: 各分钟的推送次数 {时间: 次数}
+    """
+    per_minute = Counter()
+    clock.set(at(day, SCAN_TIME))
+    scheduler.scan_daily_courses()
+
+    cleanup_at = at(day, CLEANUP_TIME) if day.weekday() == 0 else None
+    day_end = at(day, (0, 0)) + timedelta(days=1)
+
+    while True:
+        due = next_due_time(db)
+        if due is None or due >= day_end:
+            break
+
+        # 提醒检查任务每分钟执行一次
+        tick = due.replace(second=0, microsecond=0)
+        if tick < due:
+            tick += timedelta(minutes=1)
+        tick = max(tick, clock.now() + timedelta(minutes=1))
+        if tick >= day_end:
+            break
+
+        if cleanup_at is not None and tick >= cleanup_at:
+            clock.set(cleanup_at)
+            scheduler.cleanup_old_data()
+            cleanup_at = None
+
+        clock.set(tick)
+        before = len(pushes)
+        scheduler.check_and_send_reminders("simulator")
+        if len(pushes) > before:
+            per_minute[tick] += len(pushes) - before
+
+    if cleanup_at is not None:
+        clock.set(cleanup_at)
+        scheduler.cleanup_old_data()
+
+    return per_minute
+
+
+def check_day(day, rows, day_pushes, expected, args, anomalies):
+    """检查一天的推送结果，异常追加到anomalies"""
+    date = day.strftime("%Y-%m-%d")
+
+    def report(kind, detail):
+        anomalies.append({"date": date, "type": kind, "detail": detail})
+
+    sent = [row for row in rows if row["status"] == "sent"]
+    successes = [push for push in day_pushes if push["success"]]
+
+    if expected == 0 and successes:
+        report("holiday_push", f"非上课日推送了 {len(successes)} 条")
+
+    duplicates = sum(
+        count - 1
+        for count in Counter((p["title"], p["content"]) for p in successes).values()
+        if count > 1
+    )
+    if len(successes) > len(sent) or duplicates:
+        report("duplicate", f"推送成功 {len(successes)} 次，已发送提醒 {len(sent)} 条")
+
+    unsent = [row for row in rows if row["status"] != "sent"]
+    if unsent:
+        statuses = Counter(row["status"] for row in unsent)
+        report("unsent", f"未发送的提醒: {dict(statuses)}")
+
+    for row in sent:
+        lag = (
+            datetime.fromisoformat(row["sent_at"]) - datetime.fromisoformat(row["remind_time"])
+        ).total_seconds()
+        if lag > args.late_seconds:
+            report(
+                "late",
+                f"课程 {row['course_id']} 的提醒 {row['remind_time']} 延迟{lag:.0f}秒送达",
+            )
+
+    if len(rows) != expected:
+        report("count_mismatch", f"应生成 {expected} 条提醒，实际 {len(rows)} 条")
+
+
+def main():
+    args = parse_args()
+    configure(args)
+
+    import logging
+    import random
+
+    from utils import clock as clock_module
+    from utils import database as db
+    from utils import notify_channels
+    from utils import scheduler
+    from utils.holiday_checker import get_effective_weekday
+    from utils.teaching_calendar import get_current_week, get_week_start_date
+
+    if not args.verbose:
+        logging.getLogger("utils").setLevel(logging.CRITICAL)
+
+    db.init_database()
+    user_ids = seed(args, db)
+
+    if args.start or not db.get_setting("semester_start", ""):
+        db.set_setting("semester_start", args.start or default_semester_start())
+    if args.weeks:
+        db.set_setting("total_weeks", str(args.weeks))
+
+    first_day = get_week_start_date(1)
+    total_weeks = int(db.get_setting("total_weeks", "") or 0) or args.weeks or 20
+    days = [first_day + timedelta(days=offset) for offset in range(total_weeks * 7)]
+    course_count = sum(len(db.get_all_courses(user_id)) for user_id in user_ids)
+    print(
+        f"模拟学期 {days[0]} ~ {days[-1]}（{total_weeks}周），"
+        f"{len(user_ids)} 个用户、{course_count} 门课程"
+    )
+
+    clock = clock_module.VirtualClock(at(days[0], (0, 0)))
+    previous_clock = clock_module.set_clock(clock.now)
+    rng = random.Random(args.seed)
+    pushes = []
+    stubs = {
+        name: make_stub(name, rng, args.error_rate, pushes, clock)
+        for name in notify_channels.CHANNELS
+    }
+
+    per_day = []
+    per_week = Counter()
+    per_minute = Counter()
+    anomalies = []
+    last_weeks = {}
+    started = time.perf_counter()
+
+    try:
+        with mock.patch.dict(notify_channels.CHANNELS, stubs):
+            for day in days:
+                scan_time = at(day, SCAN_TIME)
+                clock.set(scan_time)
+                weeks = {user_id: get_current_week(day, user_id) for user_id in user_ids}
+                for user_id, week in weeks.items():
+                    last = last_weeks.get(user_id)
+                    if last is not None and week not in (last, last + 1):
+                        anomalies.append(
+                            {
+                                "date": day.strftime("%Y-%m-%d"),
+                                "type": "week_jump",
+                                "detail": f"用户 {user_id} 的教学周从 {last} 变为 {week}",
+                            }
+                        )
+                last_weeks = weeks
+
+                expected = expected_reminders(day, scan_time, user_ids, weeks)
+                pushed_before = len(pushes)
+                per_minute.update(run_day(day, db, scheduler, clock, pushes))
+                day_pushes = pushes[pushed_before:]
+                rows = day_reminders(db, day)
+                check_day(day, rows, day_pushes, expected, args, anomalies)
+
+                successes = sum(1 for push in day_pushes if push["success"])
+                effective_day, _ = get_effective_weekday(day.strftime("%Y-%m-%d"))
+                week = weeks[user_ids[0]] if user_ids else None
+                per_week[week] += successes
+                per_day.append(
+                    {
+                        "date": day.strftime("%Y-%m-%d"),
+                        "weekday": day.isoweekday(),
+                        "schedule_weekday": effective_day,
+                        "week": week,
+                        "holiday": effective_day is None,
+                        "expected": expected,
+                        "pushes": successes,
+                        "failed_attempts": len(day_pushes) - successes,
+                    }
+                )
+    finally:
+        clock_module.set_clock(previous_clock)
+
+    elapsed = time.perf_counter() - started
+    total = sum(day["pushes"] for day in per_day)
+    busiest_day = max(per_day, key=lambda day: day["pushes"])
+    peak_minute, peak_count = per_minute.most_common(1)[0] if per_minute else (None, 0)
+
+    report = {
+        "semester": {
+            "start": days[0].strftime("%Y-%m-%d"),
+            "end": days[-1].strftime("%Y-%m-%d"),
+            "weeks": total_weeks,
+            "users": len(user_ids),
+            "courses": course_count,
+        },
+        "elapsed_seconds": round(elapsed, 3),
+        "total_pushes": total,
+        "failed_attempts": sum(day["failed_attempts"] for day in per_day),
+        "teaching_days": sum(1 for day in per_day if not day["holiday"]),
+        "busiest_day": {"date": busiest_day["date"], "pushes": busiest_day["pushes"]},
+        "peak_minute": {
+            "time": peak_minute.strftime("%Y-%m-%d %H:%M") if peak_minute else None,
+            "pushes": peak_count,
+        },
+        "per_week": {str(week): count for week, count in sorted(per_week.items())},
+        "anomaly_counts": dict(Counter(item["type"] for item in anomalies)),
+        "anomalies": anomalies,
+        "per_day": per_day,
+    }
+
+    print(f"耗时 {elapsed:.1f}s，推送 {total} 条，失败尝试 {report['failed_attempts']} 次")
+    print(
+        f"最忙的一天 {busiest_day['date']}（{busiest_day['pushes']}条），"
+        f"峰值分钟 {report['peak_minute']['time']}（{peak_count}条）"
+    )
+    print("每周推送: " + "  ".join(f"第{week}周 {count}" for week, count in report["per_week"].items()))
+    holidays = [day["date"] for day in per_day if day["holiday"] and day["weekday"] < 6]
+    if holidays:
+        print(f"工作日放假: {', '.join(holidays)}")
+    print(f"异常: {report['anomaly_counts'] or '无'}")
+    for item in anomalies[:10]:
+        print(f"  {item['date']} [{item['type']}] {item['detail']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"完整报告已保存: {args.output}")
+
+    return 1 if anomalies else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
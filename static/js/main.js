@@ -4,8 +4,192 @@
 document.addEventListener('DOMContentLoaded', function() {
     loadTeachingWeek();
     initWeekTypeSelectors();
+    initCourseList();
+    initSchedule();
 });
 
+// 周课表（已加载的周次缓存在前端，切换时无需重新请求）
+const MAX_WEEKS = 25;
+const scheduleCache = {};
+let scheduleWeek = 1;
+
+function initSchedule() {
+    const grid = document.getElementById('scheduleGrid');
+    if (!grid) {
+        return;
+    }
+    scheduleWeek = parseInt(grid.dataset.week) || 1;
+    loadSchedule(scheduleWeek);
+}
+
+function changeScheduleWeek(delta) {
+    const week = scheduleWeek + delta;
+    if (week < 1 || week > MAX_WEEKS) {
+        return;
+    }
+    scheduleWeek = week;
+    loadSchedule(week);
+}
+
+function loadSchedule(week) {
+    document.getElementById('scheduleWeekLabel').textContent = `第${week}周`;
+    
+    if (scheduleCache[week]) {
+        renderSchedule(scheduleCache[week]);
+        return;
+    }
+    
+    fetch(`/api/schedule?week=${week}`)
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                scheduleCache[week] = data.data;
+                if (week === scheduleWeek) {
+                    renderSchedule(data.data);
+                }
+            }
+        })
+        .catch(error => {
+            console.error('加载周课表失败:', error);
+        });
+}
+
+function renderSchedule(schedule) {
+    const grid = document.getElementById('scheduleGrid');
+    grid.innerHTML = schedule.days.map(day => {
+        const courses = day.courses.map(course => `
+            <div class="border rounded p-1 mb-1 bg-light">
+                <div class="fw-bold">${escapeHtml(course.name)}</div>
+                <div class="text-muted">${escapeHtml(course.start_time)}-${escapeHtml(course.end_time)}</div>
+                ${course.location ? `<div class="text-muted">${escapeHtml(course.location)}</div>` : ''}
+            </div>`).join('');
+        const date = day.date ? `<div class="text-muted">${day.date.slice(5)}</div>` : '';
+        const holiday = day.is_holiday ? '<span class="badge bg-warning text-dark">休</span>' : '';
+        return `
+            <div class="col">
+                <div class="text-center border-bottom mb-1">${day.name} ${holiday}${date}</div>
+                ${courses}
+            </div>`;
+    }).join('');
+}
+
+// 全部课程列表（分页加载）
+const WEEK_DAY_NAMES = { 1: '周一', 2: '周二', 3: '周三', 4: '周四', 5: '周五', 6: '周六', 7: '周日' };
+const COURSE_PAGE_SIZE = 50;
+let courseListCursor = null;
+let courseListFilters = {};
+
+// 转义HTML特殊字符
+function escapeHtml(value) {
+    return String(value == null ? '' : value)
+        .replace(/&/g, '&amp;')
+        .replace(/</g, '&lt;')
+        .replace(/>/g, '&gt;')
+        .replace(/"/g, '&quot;')
+        .replace(/'/g, '&#39;');
+}
+
+// 初始化课程列表和筛选表单
+function initCourseList() {
+    const tbody = document.getElementById('courseTableBody');
+    if (!tbody) {
+        return;
+    }
+    
+    const filterForm = document.getElementById('courseFilterForm');
+    filterForm.addEventListener('submit', function(e) {
+        e.preventDefault();
+        courseListFilters = {};
+        new FormData(filterForm).forEach((value, key) => {
+            if (String(value).trim()) {
+                courseListFilters[key] = String(value).trim();
+            }
+        });
+        tbody.innerHTML = '';
+        courseListCursor = null;
+        loadCoursePage();
+    });
+    
+    tbody.addEventListener('click', function(e) {
+        const btn = e.target.closest('button[data-action]');
+        if (!btn) {
+            return;
+        }
+        if (btn.dataset.action === 'edit') {
+            editCourse(btn.dataset.id);
+        } else if (btn.dataset.action === 'delete') {
+            deleteCourse(btn.dataset.id, btn.dataset.name);
+        }
+    });
+    
+    loadCoursePage();
+}
+
+// 渲染周次标签
+function renderWeekBadge(pattern) {
+    if (!pattern || pattern === 'all') {
+        return '<span class="badge bg-success">每周</span>';
+    } else if (pattern === 'odd') {
+        return '<span class="badge bg-primary">单周</span>';
+    } else if (pattern === 'even') {
+        return '<span class="badge bg-info">双周</span>';
+    }
+    return `<span class="badge bg-secondary">${escapeHtml(pattern)}周</span>`;
+}
+
+// 加载下一页课程
+function loadCoursePage() {
+    const tbody = document.getElementById('courseTableBody');
+    const loadMoreBtn = document.getElementById('loadMoreCourses');
+    const emptyHint = document.getElementById('courseListEmpty');
+    
+    const params = new URLSearchParams(courseListFilters);
+    params.set('limit', COURSE_PAGE_SIZE);
+    if (courseListCursor) {
+        params.set('cursor', courseListCursor);
+    }
+    
+    loadMoreBtn.disabled = true;
+    
+    fetch(`/api/courses?${params.toString()}`)
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) {
+                alert('加载课程失败：' + data.error);
+                return;
+            }
+            
+            const rows = data.courses.map(course => `
+                <tr>
+                    <td>${WEEK_DAY_NAMES[course.day_of_week] || ''}</td>
+                    <td>${escapeHtml(course.start_time)} - ${escapeHtml(course.end_time)}</td>
+                    <td><strong>${escapeHtml(course.name)}</strong></td>
+                    <td>${renderWeekBadge(course.week_pattern)}</td>
+                    <td>${escapeHtml(course.location || '-')}</td>
+                    <td><small class="text-muted">${escapeHtml(course.remark || '-')}</small></td>
+                    <td>
+                        <button class="btn btn-sm btn-outline-primary" data-action="edit" data-id="${course.id}">
+                            <i class="bi bi-pencil"></i>
+                        </button>
+                        <button class="btn btn-sm btn-outline-danger" data-action="delete" data-id="${course.id}" data-name="${escapeHtml(course.name)}">
+                            <i class="bi bi-trash"></i>
+                        </button>
+                    </td>
+                </tr>`);
+            tbody.insertAdjacentHTML('beforeend', rows.join(''));
+            
+            courseListCursor = data.next_cursor;
+            loadMoreBtn.style.display = courseListCursor ? 'inline-block' : 'none';
+            emptyHint.style.display = tbody.children.length ? 'none' : 'block';
+        })
+        .catch(error => {
+            console.error('加载课程失败:', error);
+        })
+        .finally(() => {
+            loadMoreBtn.disabled = false;
+        });
+}
+
 // 加载教学周设置
 function loadTeachingWeek() {
     fetch('/api/teaching-week')
@@ -114,6 +298,25 @@ function initWeekTypeSelectors() {
     });
 }
 
+// 保存课程，遇到时间冲突时询问是否仍然保存
+function saveCourse(url, method, courseData) {
+    return fetch(url, {
+        method: method,
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(courseData)
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success || !data.conflicts || courseData.force) {
+            return data;
+        }
+        if (!confirm(`检测到时间冲突：\n${data.error}\n\n仍然保存吗？`)) {
+            return { success: false, cancelled: true };
+        }
+        return saveCourse(url, method, Object.assign({}, courseData, { force: true }));
+    });
+}
+
 // 添加课程
 function submitAddCourse() {
     const form = document.getElementById('addCourseForm');
@@ -153,18 +356,13 @@ function submitAddCourse() {
         week_pattern: weekPattern
     };
     
-    fetch('/api/courses', {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify(courseData)
-    })
-    .then(response => response.json())
+    saveCourse('/api/courses', 'POST', courseData)
     .then(data => {
         if (data.success) {
             const modal = bootstrap.Modal.getInstance(document.getElementById('addCourseModal'));
             modal.hide();
             window.location.reload();
-        } else {
+        } else if (!data.cancelled) {
             alert('添加失败：' + data.error);
         }
     })
@@ -246,18 +444,13 @@ function submitEditCourse() {
         week_pattern: weekPattern
     };
     
-    fetch(`/api/courses/${courseId}`, {
-        method: 'PUT',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify(courseData)
-    })
-    .then(response => response.json())
+    saveCourse(`/api/courses/${courseId}`, 'PUT', courseData)
     .then(data => {
         if (data.success) {
             const modal = bootstrap.Modal.getInstance(document.getElementById('editCourseModal'));
             modal.hide();
             window.location.reload();
-        } else {
+        } else if (!data.cancelled) {
             alert('修改失败：' + data.error);
         }
     })
@@ -306,6 +499,75 @@ function clearAllCourses() {
     }
 }
 
+// 导入结果中的时间冲突提示
+function renderConflictWarning(conflicts) {
+    if (!conflicts || !conflicts.length) {
+        return '';
+    }
+    const items = conflicts.slice(0, 10).map(c => {
+        const [a, b] = c.courses;
+        return `<li>${escapeHtml(a.name)}（${escapeHtml(a.start_time)}-${escapeHtml(a.end_time)}）与 ${escapeHtml(b.name)}（${escapeHtml(b.start_time)}-${escapeHtml(b.end_time)}），${WEEK_DAY_NAMES[c.day_of_week] || ''}</li>`;
+    });
+    const more = conflicts.length > 10 ? `<li>……共 ${conflicts.length} 处冲突</li>` : '';
+    return `<div class="text-warning mt-2"><i class="bi bi-exclamation-triangle"></i> 检测到 ${conflicts.length} 处时间冲突：<ul class="small mb-0">${items.join('')}${more}</ul></div>`;
+}
+
+// 提交导入任务并轮询进度，返回任务结果
+function submitImportJob(formData) {
+    return fetch('/api/upload', {
+        method: 'POST',
+        body: formData
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (!data.success) {
+            return data;
+        }
+        return pollImportJob(data.job_id);
+    });
+}
+
+// 轮询导入任务进度
+function pollImportJob(jobId) {
+    const stageNames = {
+        queued: '排队中',
+        parsing: '解析中',
+        importing: '导入中',
+        scanning: '刷新提醒'
+    };
+    
+    return new Promise((resolve, reject) => {
+        const poll = () => {
+            fetch(`/api/jobs/${jobId}`)
+            .then(response => response.json())
+            .then(data => {
+                if (!data.success) {
+                    resolve(data);
+                    return;
+                }
+                
+                const job = data.job;
+                if (job.status === 'succeeded') {
+                    resolve(job.result);
+                } else if (job.status === 'failed') {
+                    resolve({ success: false, error: job.error });
+                } else {
+                    const resultDiv = document.getElementById('uploadResult');
+                    const messageDiv = document.getElementById('uploadMessage');
+                    if (resultDiv && messageDiv) {
+                        resultDiv.style.display = 'block';
+                        resultDiv.querySelector('.alert').className = 'alert alert-info';
+                        messageDiv.innerHTML = `<span class="spinner-border spinner-border-sm" role="status"></span> ${stageNames[job.stage] || job.stage}：已解析 ${job.parsed}/${job.total} 行，已导入 ${job.processed} 行（${job.rows_per_second} 行/秒）`;
+                    }
+                    setTimeout(poll, 500);
+                }
+            })
+            .catch(reject);
+        };
+        poll();
+    });
+}
+
 // Excel上传
 document.addEventListener('DOMContentLoaded', function() {
     const uploadForm = document.getElementById('uploadForm');
@@ -323,29 +585,31 @@ document.addEventListener('DOMContentLoaded', function() {
             
             const formData = new FormData();
             formData.append('file', file);
+            formData.append('mode', document.querySelector('input[name="import_mode"]:checked').value);
             
             const uploadBtn = document.getElementById('uploadBtn');
             const originalText = uploadBtn.innerHTML;
             uploadBtn.disabled = true;
             uploadBtn.innerHTML = '<span class="spinner-border spinner-border-sm" role="status"></span> 上传中...';
             
-            fetch('/api/upload', {
-                method: 'POST',
-                body: formData
-            })
-            .then(response => response.json())
+            submitImportJob(formData)
             .then(data => {
                 const resultDiv = document.getElementById('uploadResult');
                 const messageDiv = document.getElementById('uploadMessage');
                 resultDiv.style.display = 'block';
                 
-                if (data.success) {
+                if (data.success && data.summary) {
+                    const s = data.summary;
                     resultDiv.querySelector('.alert').className = 'alert alert-success';
-                    messageDiv.innerHTML = `<strong><i class="bi bi-check-circle"></i> 导入成功！</strong><br>成功导入 ${data.count} 门课程`;
+                    messageDiv.innerHTML = `<strong><i class="bi bi-check-circle"></i> 同步成功！</strong><br>新增 ${s.added} 门，修改 ${s.changed} 门，删除 ${s.removed} 门，未变化 ${s.unchanged} 门` + renderConflictWarning(data.conflicts);
+                    setTimeout(() => { window.location.href = '/'; }, 2000);
+                } else if (data.success) {
+                    resultDiv.querySelector('.alert').className = 'alert alert-success';
+                    messageDiv.innerHTML = `<strong><i class="bi bi-check-circle"></i> 导入成功！</strong><br>成功导入 ${data.count} 门课程` + renderConflictWarning(data.conflicts);
                     setTimeout(() => { window.location.href = '/'; }, 2000);
                 } else {
                     resultDiv.querySelector('.alert').className = 'alert alert-danger';
-                    messageDiv.innerHTML = `<strong><i class="bi bi-x-circle"></i> 导入失败</strong><br>${data.error}`;
+                    messageDiv.innerHTML = `<strong><i class="bi bi-x-circle"></i> 导入失败</strong><br>${escapeHtml(data.error)}`;
                 }
             })
             .catch(error => {
@@ -372,8 +636,17 @@ document.addEventListener('DOMContentLoaded', function() {
             const formData = new FormData(settingsForm);
             const settings = {
                 pushplus_token: formData.get('pushplus_token'),
-                skip_holidays: document.getElementById('skip_holidays').checked
+                serverchan_key: formData.get('serverchan_key'),
+                wecom_webhook_key: formData.get('wecom_webhook_key'),
+                smtp_to: formData.get('smtp_to'),
+                notify_channels: formData.get('notify_channels'),
+                message_format: formData.get('message_format')
             };
+            // 节假日设置为全局设置，只有管理员可以修改
+            const skipHolidays = document.getElementById('skip_holidays');
+            if (!skipHolidays.disabled) {
+                settings.skip_holidays = skipHolidays.checked;
+            }
             
             fetch('/api/settings', {
                 method: 'POST',
@@ -406,12 +679,65 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 });
 
-// 测试Token连接
+// 预览同步导入的差异
+function previewSyncImport() {
+    const file = document.getElementById('excelFile').files[0];
+    
+    if (!file) {
+        alert('请选择Excel文件');
+        return;
+    }
+    
+    const formData = new FormData();
+    formData.append('file', file);
+    formData.append('mode', 'sync');
+    formData.append('dry_run', 'true');
+    
+    submitImportJob(formData)
+    .then(data => {
+        const resultDiv = document.getElementById('uploadResult');
+        const messageDiv = document.getElementById('uploadMessage');
+        resultDiv.style.display = 'block';
+        
+        if (!data.success) {
+            resultDiv.querySelector('.alert').className = 'alert alert-danger';
+            messageDiv.innerHTML = `<strong><i class="bi bi-x-circle"></i> 预览失败</strong><br>${escapeHtml(data.error)}`;
+            return;
+        }
+        
+        const diff = data.diff;
+        const s = data.summary;
+        let html = `<strong><i class="bi bi-eye"></i> 同步预览</strong><br>新增 ${s.added} 门，修改 ${s.changed} 门，删除 ${s.removed} 门，未变化 ${s.unchanged} 门`;
+        
+        const items = [];
+        diff.added.forEach(c => items.push(`<li class="text-success">+ ${escapeHtml(c.name)}（周${escapeHtml(c.day_of_week)} ${escapeHtml(c.start_time)}）</li>`));
+        diff.changed.forEach(item => {
+            const fields = Object.keys(item.changes).map(k => `${escapeHtml(k)}: ${escapeHtml(item.changes[k].old || '-')} → ${escapeHtml(item.changes[k].new || '-')}`).join('，');
+            items.push(`<li class="text-primary">~ ${escapeHtml(item.course.name)}（${fields}）</li>`);
+        });
+        diff.removed.forEach(c => items.push(`<li class="text-danger">- ${escapeHtml(c.name)}（周${escapeHtml(c.day_of_week)} ${escapeHtml(c.start_time)}）</li>`));
+        
+        if (items.length) {
+            html += `<ul class="mt-2 mb-0 small">${items.join('')}</ul>`;
+        }
+        html += renderConflictWarning(data.conflicts);
+        
+        resultDiv.querySelector('.alert').className = 'alert alert-info';
+        messageDiv.innerHTML = html;
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert('预览失败，请重试');
+    });
+}
+
+// 测试推送连接
 function testToken() {
-    const token = document.getElementById('pushplus_token').value;
+    const configured = ['pushplus_token', 'serverchan_key', 'wecom_webhook_key', 'smtp_to']
+        .some(id => document.getElementById(id).value);
     
-    if (!token) {
-        alert('请先输入Token');
+    if (!configured) {
+        alert('请先输入Token或配置备用推送渠道');
         return;
     }
     
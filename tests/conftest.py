@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""测试公共夹具：每个测试使用独立的临时数据库"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import database, teaching_calendar  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """初始化临时数据库，清空教学日历缓存"""
+    monkeypatch.setattr(database, "DATABASE_PATH", str(tmp_path / "test.db"))
+    monkeypatch.setattr(teaching_calendar, "_signature", None)
+    monkeypatch.setattr(teaching_calendar, "_checked_at", None)
+    teaching_calendar._calendars.clear()
+    database.init_database()
+    return database
+
+
+@pytest.fixture
+def client(db, monkeypatch):
+    """Flask测试客户端（不启动定时任务）"""
+    import app as app_module
+
+    monkeypatch.setattr(app_module.app, "_initialized", True, raising=False)
+    return app_module.app.test_client()
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""推送渠道熔断器：熔断、半开探测、恢复"""
+
+from unittest import mock
+
+import pytest
+
+from utils import notify_channels
+from utils.notify_channels import (
+    CIRCUIT_CLOSED,
+    CIRCUIT_HALF_OPEN,
+    CIRCUIT_OPEN,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_SECONDS,
+    CIRCUIT_TIMEOUT_THRESHOLD,
+    allow_request,
+    deliver,
+    probe_open_circuits,
+    record_breaker_result,
+)
+
+
+@pytest.fixture
+def monotonic(monkeypatch):
+    """可拨动的单调时钟，熔断器状态每个测试独立"""
+    now = [1000.0]
+    monkeypatch.setattr(notify_channels, "_breakers", {})
+    monkeypatch.setattr(notify_channels, "_channel_stats", {})
+    monkeypatch.setattr(notify_channels.time, "monotonic", lambda: now[0])
+    return now
+
+
+def state(channel):
+    return notify_channels.get_breaker_states()[channel]
+
+
+def test_opens_after_consecutive_failures(monotonic):
+    for _ in range(CIRCUIT_FAILURE_THRESHOLD - 1):
+        record_breaker_result("pushplus", False)
+    assert state("pushplus") == CIRCUIT_CLOSED
+
+    # 成功后重新计数
+    record_breaker_result("pushplus", True)
+    for _ in range(CIRCUIT_FAILURE_THRESHOLD - 1):
+        record_breaker_result("pushplus", False)
+    assert state("pushplus") == CIRCUIT_CLOSED
+
+    record_breaker_result("pushplus", False)
+    assert state("pushplus") == CIRCUIT_OPEN
+    assert not allow_request("pushplus")
+
+
+def test_opens_after_consecutive_timeouts(monotonic):
+    for _ in range(CIRCUIT_TIMEOUT_THRESHOLD):
+        record_breaker_result("wecom", False, timeout=True)
+    assert state("wecom") == CIRCUIT_OPEN
+
+
+def test_half_open_allows_single_probe(monotonic):
+    for _ in range(CIRCUIT_TIMEOUT_THRESHOLD):
+        record_breaker_result("pushplus", False, timeout=True)
+
+    monotonic[0] += CIRCUIT_RESET_SECONDS
+    assert allow_request("pushplus")
+    assert state("pushplus") == CIRCUIT_HALF_OPEN
+    assert not allow_request("pushplus")
+
+    # 探测失败重新熔断，需再等待恢复时间
+    record_breaker_result("pushplus", False)
+    assert state("pushplus") == CIRCUIT_OPEN
+    assert not allow_request("pushplus")
+
+    monotonic[0] += CIRCUIT_RESET_SECONDS
+    assert allow_request("pushplus")
+    record_breaker_result("pushplus", True)
+    assert state("pushplus") == CIRCUIT_CLOSED
+    assert allow_request("pushplus")
+    assert allow_request("pushplus")
+
+
+def test_probe_closes_recovered_circuit(monotonic):
+    for _ in range(CIRCUIT_TIMEOUT_THRESHOLD):
+        record_breaker_result("smtp", False, timeout=True)
+
+    probe = mock.Mock(return_value=True)
+    with mock.patch.dict(notify_channels.CHANNEL_PROBES, {"smtp": probe}):
+        probe_open_circuits()
+        probe.assert_not_called()
+
+        monotonic[0] += CIRCUIT_RESET_SECONDS
+        probe_open_circuits()
+
+    probe.assert_called_once()
+    assert state("smtp") == CIRCUIT_CLOSED
+
+
+def test_deliver_skips_open_channels(monotonic):
+    config = {
+        "notify_channels": "pushplus,wecom",
+        "pushplus_token": "t",
+        "wecom_webhook_key": "k",
+    }
+    for _ in range(CIRCUIT_TIMEOUT_THRESHOLD):
+        record_breaker_result("pushplus", False, timeout=True)
+
+    pushplus = mock.Mock(return_value={"success": True, "message": "发送成功"})
+    wecom = mock.Mock(return_value={"success": True, "message": "发送成功"})
+    message = {"title": "上课提醒", "content": "<p>高等数学</p>", "template": "html"}
+    channels = {"pushplus": pushplus, "wecom": wecom}
+    with mock.patch.dict(notify_channels.CHANNELS, channels):
+        result = deliver(message, config)
+        assert result["channel"] == "wecom"
+        pushplus.assert_not_called()
+
+        for _ in range(CIRCUIT_TIMEOUT_THRESHOLD):
+            record_breaker_result("wecom", False, timeout=True)
+        result = deliver(message, config)
+
+    assert not result["success"]
+    assert result["circuit_open"]
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""课程时间冲突检测"""
+
+from utils.conflicts import find_conflicts
+
+
+def course(name, day, start, end, pattern="all", location=""):
+    return {
+        "name": name,
+        "day_of_week": day,
+        "start_time": start,
+        "end_time": end,
+        "week_pattern": pattern,
+        "location": location,
+    }
+
+
+def test_overlapping_courses_conflict():
+    conflicts = find_conflicts(
+        [
+            course("高等数学", 1, "08:00", "09:40"),
+            course("大学英语", 1, "09:00", "10:40"),
+            course("线性代数", 2, "09:00", "10:40"),
+        ]
+    )
+
+    assert len(conflicts) == 1
+    assert conflicts[0]["day_of_week"] == 1
+    assert [c["name"] for c in conflicts[0]["courses"]] == ["高等数学", "大学英语"]
+
+
+def test_adjacent_courses_do_not_conflict():
+    assert not find_conflicts(
+        [
+            course("高等数学", 1, "08:00", "09:40"),
+            course("大学英语", 1, "09:40", "11:20"),
+        ]
+    )
+
+
+def test_conflict_requires_common_weeks():
+    assert not find_conflicts(
+        [
+            course("高等数学", 1, "08:00", "09:40", "odd"),
+            course("大学英语", 1, "08:00", "09:40", "even"),
+        ]
+    )
+
+    conflicts = find_conflicts(
+        [
+            course("高等数学", 1, "08:00", "09:40", "odd"),
+            course("大学英语", 1, "08:00", "09:40", "1-4"),
+        ]
+    )
+    assert conflicts[0]["weeks"] == [1, 3]
+
+
+def test_candidates_only_report_new_conflicts():
+    existing = [
+        course("高等数学", 1, "08:00", "09:40"),
+        course("大学英语", 1, "09:00", "10:40"),
+    ]
+
+    assert not find_conflicts(existing, [course("体育", 1, "14:00", "15:40")])
+    conflicts = find_conflicts(existing, [course("体育", 1, "10:00", "11:00")])
+    assert [c["courses"][1]["name"] for c in conflicts] == ["体育"]
+
+
+def test_location_conflicts_only_in_same_room():
+    courses = [
+        course("高等数学", 1, "08:00", "09:40", location="A101"),
+        course("大学英语", 1, "08:00", "09:40", location="B202"),
+        course("线性代数", 1, "09:00", "10:40", location="A101"),
+    ]
+
+    conflicts = find_conflicts(courses, by_location=True)
+    assert len(conflicts) == 1
+    assert [c["name"] for c in conflicts[0]["courses"]] == ["高等数学", "线性代数"]
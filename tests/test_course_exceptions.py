@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""停课/调课只能针对实际要上的一次课"""
+
+import pytest
+
+
+@pytest.fixture
+def course_id(db):
+    db.set_setting("semester_start", "2025-09-01")
+    db.set_setting("total_weeks", "16")
+    db.add_courses(
+        [
+            {
+                "name": "高等数学",
+                "day_of_week": 3,
+                "start_time": "08:00",
+                "end_time": "09:40",
+                "week_pattern": "odd",
+            }
+        ]
+    )
+    return db.get_all_courses()[0]["id"]
+
+
+def add_exception(client, course_id, date):
+    return client.post(
+        "/api/exceptions",
+        json={"course_id": course_id, "date": date, "action": "cancel"},
+    )
+
+
+def test_exception_on_course_session(client, course_id):
+    assert add_exception(client, course_id, "2025-09-03").status_code == 200
+
+
+@pytest.mark.parametrize(
+    "date",
+    [
+        "2025-09-04",  # 星期四没有这门课
+        "2025-09-10",  # 第2周（双周）没有课
+        "2026-03-04",  # 学期已结束
+    ],
+)
+def test_exception_rejects_dates_without_session(client, course_id, date):
+    response = add_exception(client, course_id, date)
+    assert response.status_code == 400
+    assert not response.get_json()["success"]
+
+
+def test_update_checks_new_date(client, course_id):
+    exception_id = add_exception(client, course_id, "2025-09-03").get_json()[
+        "exception_id"
+    ]
+
+    url = f"/api/exceptions/{exception_id}"
+    assert client.put(url, json={"date": "2025-09-10"}).status_code == 400
+    assert client.put(url, json={"date": "2025-09-17"}).status_code == 200
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""按渠道顺序发送消息"""
+
+from unittest import mock
+
+from utils import notify_channels
+from utils.notify_channels import deliver
+
+
+def test_deliver_does_not_modify_message(monkeypatch):
+    monkeypatch.setattr(notify_channels, "_breakers", {})
+    config = {"notify_channels": "serverchan,wecom", "serverchan_key": "k"}
+    config["wecom_webhook_key"] = "k"
+    received = []
+
+    def failing(config, message):
+        notify_channels.message_text(message)
+        received.append(dict(message))
+        return {"success": False, "error": "发送失败"}
+
+    message = {"title": "上课提醒", "content": "<p>高等数学</p>", "template": "html"}
+    channels = {"serverchan": failing, "wecom": failing}
+    with mock.patch.dict(notify_channels.CHANNELS, channels):
+        deliver(message, config, "course-1@2025-09-03 07:45")
+
+    assert message == {
+        "title": "上课提醒",
+        "content": "<p>高等数学</p>",
+        "template": "html",
+    }
+    assert received[0] == received[1]
+    assert "text" not in received[1]
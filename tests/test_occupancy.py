@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""教室占用索引和空闲时段"""
+
+import pytest
+
+from utils import occupancy
+from utils.occupancy import get_all_free_slots, get_room_free_slots
+
+
+@pytest.fixture
+def rooms(db, monkeypatch):
+    """清空占用索引，添加同一教室的两门课"""
+    monkeypatch.setattr(occupancy, "_index", None)
+    monkeypatch.setattr(occupancy, "_course_keys", {})
+    db.add_courses(
+        [
+            {
+                "name": "高等数学",
+                "day_of_week": 1,
+                "start_time": "08:00",
+                "end_time": "09:40",
+                "location": "A101",
+                "week_pattern": "all",
+            },
+            {
+                "name": "大学英语",
+                "day_of_week": 1,
+                "start_time": "09:00",
+                "end_time": "10:40",
+                "location": "A101",
+                "week_pattern": "odd",
+            },
+        ]
+    )
+    return db
+
+
+def spans(slots):
+    return [(slot["start"], slot["end"]) for slot in slots]
+
+
+def test_busy_intervals_merge_per_week(rooms):
+    odd = get_room_free_slots("A101", 1, 1)
+    assert spans(odd["busy"]) == [("08:00", "10:40")]
+    assert spans(odd["free"]) == [("10:40", "22:00")]
+
+    even = get_room_free_slots("A101", 1, 2)
+    assert spans(even["busy"]) == [("08:00", "09:40")]
+
+
+def test_min_minutes_filters_short_gaps(rooms):
+    rooms.add_courses(
+        [
+            {
+                "name": "体育",
+                "day_of_week": 1,
+                "start_time": "11:00",
+                "end_time": "21:30",
+                "location": "A101",
+                "week_pattern": "all",
+            }
+        ]
+    )
+
+    free = get_room_free_slots("A101", 1, 2, min_minutes=60)["free"]
+    assert spans(free) == [("09:40", "11:00")]
+
+
+def test_index_follows_course_changes(rooms):
+    assert get_all_free_slots(1, 2, min_minutes=900) == []
+    courses = {c["name"]: c["id"] for c in rooms.get_all_courses()}
+
+    rooms.update_course(courses["高等数学"], location="B202")
+    assert spans(get_room_free_slots("A101", 1, 2)["busy"]) == []
+    assert spans(get_room_free_slots("B202", 1, 2)["busy"]) == [("08:00", "09:40")]
+
+    rooms.delete_course(courses["高等数学"])
+    assert get_room_free_slots("B202", 1, 2)["busy"] == []
+    assert [room["location"] for room in get_all_free_slots(1, 2)] == ["A101"]
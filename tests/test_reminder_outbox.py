@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""提醒发件箱：领取、租约、重试、推迟和去重"""
+
+from datetime import datetime, timedelta
+from unittest import mock
+
+import pytest
+
+from utils import clock, notify_channels
+
+NOW = datetime(2025, 9, 3, 7, 50)
+
+
+@pytest.fixture
+def virtual_clock():
+    """把时钟固定在 NOW，测试中手动拨动"""
+    moment = clock.VirtualClock(NOW)
+    previous = clock.set_clock(moment.now)
+    yield moment
+    clock.set_clock(previous)
+
+
+@pytest.fixture
+def reminder(db, virtual_clock):
+    """一条已到期的提醒"""
+    db.add_courses(
+        [
+            {
+                "name": "高等数学",
+                "day_of_week": 3,
+                "start_time": "08:00",
+                "end_time": "09:40",
+                "location": "教学楼A101",
+                "week_pattern": "all",
+            }
+        ]
+    )
+    course_id = db.get_all_courses()[0]["id"]
+    return db.add_reminder(course_id, NOW - timedelta(minutes=5))
+
+
+def get_reminder(db, reminder_id):
+    conn = db.get_db_connection()
+    row = conn.execute("SELECT * FROM reminders WHERE id = ?", (reminder_id,))
+    row = dict(row.fetchone())
+    conn.close()
+    return row
+
+
+def test_duplicate_reminders_are_ignored(db, reminder, virtual_clock):
+    course_id = get_reminder(db, reminder)["course_id"]
+
+    assert db.add_reminder(course_id, NOW - timedelta(minutes=5)) is None
+    db.add_reminders(
+        [(db.DEFAULT_USER_ID, course_id, NOW - timedelta(minutes=5), None)]
+    )
+    assert db.count_reminders_by_status() == {db.REMINDER_PENDING: 1}
+
+
+def test_claim_is_exclusive(db, reminder, virtual_clock):
+    claimed = db.claim_reminders("w1", lease_seconds=60)
+    assert [r["id"] for r in claimed] == [reminder]
+    assert claimed[0]["attempts"] == 1
+    assert db.claim_reminders("w2", lease_seconds=60) == []
+
+
+def test_expired_lease_is_reclaimed(db, reminder, virtual_clock):
+    db.claim_reminders("w1", lease_seconds=60)
+    virtual_clock.advance(seconds=61)
+
+    claimed = db.claim_reminders("w2", lease_seconds=60)
+    assert [r["id"] for r in claimed] == [reminder]
+    assert claimed[0]["attempts"] == 2
+
+    # 原进程已失去租约，不能再发送或更新
+    assert not db.mark_reminder_sending(reminder, "w1", 60)
+    assert db.mark_reminder_failed(reminder, "w1", "超时") is None
+    assert db.mark_reminder_sending(reminder, "w2", 60)
+    assert db.mark_reminder_sent(reminder, "w2")
+    assert get_reminder(db, reminder)["status"] == db.REMINDER_SENT
+
+
+def test_send_requires_unexpired_lease(db, reminder, virtual_clock):
+    db.claim_reminders("w1", lease_seconds=60)
+    virtual_clock.advance(seconds=61)
+
+    # 租约过期但尚未被重新领取，也不能继续发送
+    assert not db.mark_reminder_sending(reminder, "w1", 60)
+    assert not db.mark_reminder_sent(reminder, "w1")
+
+
+def test_sending_is_not_reclaimed(db, reminder, virtual_clock):
+    db.claim_reminders("w1", lease_seconds=60)
+    assert db.mark_reminder_sending(reminder, "w1", 300)
+
+    virtual_clock.advance(seconds=120)
+    assert db.claim_reminders("w2", lease_seconds=60) == []
+    assert db.fail_stale_sending_reminders() == []
+
+    # 发送租约过期：结果未知，标记为失败而不是重新发送
+    virtual_clock.advance(seconds=200)
+    assert db.fail_stale_sending_reminders() == [reminder]
+    assert db.claim_reminders("w2", lease_seconds=60) == []
+    assert get_reminder(db, reminder)["status"] == db.REMINDER_FAILED
+
+
+def test_retry_until_max_attempts(db, reminder, virtual_clock):
+    for attempt in range(1, 4):
+        claimed = db.claim_reminders("w1", lease_seconds=60)
+        assert [r["attempts"] for r in claimed] == [attempt]
+        assert db.mark_reminder_sending(reminder, "w1", 60)
+
+        status = db.mark_reminder_failed(
+            reminder, "w1", "发送失败", max_attempts=3, retry_seconds=30
+        )
+        if attempt < 3:
+            assert status == db.REMINDER_PENDING
+            # 退避期间不能领取
+            assert db.claim_reminders("w1", lease_seconds=60) == []
+            virtual_clock.advance(seconds=31)
+        else:
+            assert status == db.REMINDER_FAILED
+
+    virtual_clock.advance(seconds=31)
+    assert db.claim_reminders("w1", lease_seconds=60) == []
+    assert get_reminder(db, reminder)["last_error"] == "发送失败"
+
+
+def test_defer_does_not_count_attempt(db, reminder, virtual_clock):
+    db.claim_reminders("w1", lease_seconds=60)
+    assert db.mark_reminder_sending(reminder, "w1", 60)
+    assert db.defer_reminder(reminder, "w1", "渠道熔断中", 120)
+
+    row = get_reminder(db, reminder)
+    assert row["status"] == db.REMINDER_PENDING
+    assert row["attempts"] == 0
+
+    virtual_clock.advance(seconds=60)
+    assert db.claim_reminders("w1", lease_seconds=60) == []
+    virtual_clock.advance(seconds=61)
+    assert [r["attempts"] for r in db.claim_reminders("w1", lease_seconds=60)] == [1]
+
+
+def test_scheduler_sends_each_reminder_once(db, reminder, virtual_clock, monkeypatch):
+    from utils.scheduler import check_and_send_reminders
+
+    db.set_setting("pushplus_token", "token")
+    monkeypatch.setattr(notify_channels, "_breakers", {})
+    sent = []
+
+    def stub_push(config, message):
+        sent.append(message)
+        return {"success": True, "message": "发送成功"}
+
+    with mock.patch.dict(notify_channels.CHANNELS, {"pushplus": stub_push}):
+        check_and_send_reminders("w1")
+        check_and_send_reminders("w2")
+
+    assert len(sent) == 1
+    key = get_reminder(db, reminder)["idempotency_key"]
+    assert sent[0]["idempotency_key"] == key
+    assert db.count_reminders_by_status() == {db.REMINDER_SENT: 1}
+
+
+def test_scheduler_skips_reminders_with_expired_lease(
+    db, reminder, virtual_clock, monkeypatch
+):
+    from utils.scheduler import send_user_reminders
+
+    monkeypatch.setattr(notify_channels, "_breakers", {})
+    claimed = db.claim_reminders("w1", lease_seconds=60)
+    virtual_clock.advance(seconds=61)
+    db.claim_reminders("w2", lease_seconds=60)
+
+    with mock.patch("utils.scheduler.send_course_reminder") as send:
+        send_user_reminders(claimed, {}, 1, db.DEFAULT_USER_ID, "w1")
+
+    send.assert_not_called()
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""课程搜索"""
+
+
+def add_course(db, name, location):
+    db.add_courses(
+        [
+            {
+                "name": name,
+                "day_of_week": 1,
+                "start_time": "08:00",
+                "end_time": "09:40",
+                "location": location,
+                "week_pattern": "all",
+            }
+        ]
+    )
+
+
+def names(courses):
+    return [course["name"] for course in courses]
+
+
+def test_search_matches_substrings(db):
+    add_course(db, "高等数学", "教学楼A101")
+    add_course(db, "大学英语", "外语楼B202")
+
+    assert names(db.search_courses("数学")) == ["高等数学"]
+    assert names(db.search_courses("等数学")) == ["高等数学"]
+    assert names(db.search_courses("A101")) == ["高等数学"]
+    assert names(db.search_courses("外语楼 英语")) == ["大学英语"]
+    assert db.search_courses("物理") == []
+
+
+def test_search_after_update(db):
+    add_course(db, "高等数学", "教学楼A101")
+    course_id = db.search_courses("高等数学")[0]["id"]
+    db.update_course(course_id, location="实验楼C303")
+
+    assert names(db.search_courses("C303")) == ["高等数学"]
+    assert db.search_courses("A101") == []
+
+
+def test_short_terms_use_bigram_index(db):
+    add_course(db, "高等数学", "教学楼A101")
+    add_course(db, "大学英语", "外语楼B202")
+
+    assert names(db.search_courses("学")) == ["高等数学", "大学英语"]
+    assert names(db.search_courses("英")) == ["大学英语"]
+    assert names(db.search_courses("a1")) == ["高等数学"]
+    assert names(db.search_courses("数学 A101")) == ["高等数学"]
+    assert db.search_courses("学数") == []
+
+    plans = []
+    conn = db.get_db_connection()
+    conditions, params = db._bigram_conditions("数学")
+    for row in conn.execute(
+        f"EXPLAIN QUERY PLAN SELECT c.* FROM courses c WHERE {' AND '.join(conditions)}",
+        params,
+    ):
+        plans.append(row[3])
+    conn.close()
+    assert not any(plan.startswith("SCAN c") for plan in plans)
+
+
+def test_like_wildcards_are_literal(db):
+    add_course(db, "高等数学", "教学楼A101")
+    add_course(db, "C_语言", "实验楼100%")
+
+    assert names(db.search_courses("%")) == ["C_语言"]
+    assert names(db.search_courses("_")) == ["C_语言"]
+    assert names(db.search_courses("0%")) == ["C_语言"]
+    assert db.search_courses("高%") == []
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""多用户配置继承"""
+
+from utils.notify_channels import (
+    configured_channels,
+    get_all_channel_configs,
+    get_channel_config,
+)
+
+
+def test_new_user_does_not_inherit_channels(db):
+    db.set_setting("pushplus_token", "OWNER-SECRET")
+    db.set_setting("smtp_to", "owner@example.com")
+    db.set_setting("notify_channels", "pushplus,smtp")
+    user_id = db.add_user("学生")
+
+    assert configured_channels(get_channel_config(user_id)) == []
+    assert configured_channels(get_all_channel_configs()[user_id]) == []
+    assert db.get_setting("pushplus_token", user_id=user_id) is None
+    assert db.get_user_settings("smtp_to", "")[user_id] == ""
+    assert configured_channels(get_channel_config(db.DEFAULT_USER_ID)) == [
+        "pushplus",
+        "smtp",
+    ]
+
+
+def test_new_user_inherits_calendar(db):
+    db.set_setting("semester_start", "2025-09-01")
+    db.set_setting("message_format", "markdown")
+    user_id = db.add_user("学生")
+
+    assert db.get_setting("semester_start", user_id=user_id) == "2025-09-01"
+    assert db.get_settings(["message_format", "pushplus_token"], "", user_id) == {
+        "message_format": "markdown",
+        "pushplus_token": "",
+    }
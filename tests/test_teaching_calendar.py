@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""教学日历缓存"""
+
+import os
+import subprocess
+import sys
+import textwrap
+
+from utils.teaching_calendar import get_current_week, refresh_calendars
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_refresh_sees_other_process_writes(db):
+    refresh_calendars()
+    assert get_current_week() == 1
+
+    script = textwrap.dedent(
+        f"""
+        import config
+        config.DATABASE_PATH = {db.DATABASE_PATH!r}
+        from utils.database import set_setting
+        set_setting("week_override", "7")
+        """
+    )
+    subprocess.run([sys.executable, "-c", script], check=True, cwd=ROOT)
+
+    version = db.get_data_version()
+    assert refresh_calendars() is True
+    assert get_current_week() == 7
+    assert db.get_data_version() > version
+
+
+def test_request_refresh_is_throttled(db, client, monkeypatch):
+    from unittest import mock
+
+    from utils import teaching_calendar
+
+    signature = mock.Mock(wraps=teaching_calendar.get_settings_signature)
+    monkeypatch.setattr(teaching_calendar, "get_settings_signature", signature)
+
+    client.get("/api/courses")
+    client.get("/api/courses")
+    client.get("/static/js/main.js")
+    assert signature.call_count == 1
+
+    assert refresh_calendars() is False
+    assert signature.call_count == 2
+
+
+def test_no_reminders_outside_semester(db):
+    from datetime import datetime
+
+    from utils import clock
+    from utils.scheduler import scan_daily_courses
+    from utils.teaching_calendar import get_derived_week, is_in_semester
+
+    db.set_setting("semester_start", "2025-09-01")
+    db.set_setting("total_weeks", "2")
+    db.add_courses(
+        [
+            {
+                "name": "高等数学",
+                "day_of_week": 3,
+                "start_time": "08:00",
+                "end_time": "09:40",
+                "week_pattern": "all",
+            }
+        ]
+    )
+
+    assert get_derived_week("2025-09-03") == 1
+    assert get_derived_week("2025-09-17") is None
+    assert not is_in_semester("2025-09-17")
+    assert get_current_week("2025-09-17") == 2
+
+    previous = clock.set_clock(clock.VirtualClock(datetime(2025, 9, 17, 0, 5)).now)
+    try:
+        scan_daily_courses()
+        assert db.count_reminders_by_status() == {}
+        clock.set_clock(clock.VirtualClock(datetime(2025, 9, 10, 0, 5)).now)
+        scan_daily_courses()
+        assert db.count_reminders_by_status() == {db.REMINDER_PENDING: 2}
+    finally:
+        clock.set_clock(previous)
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""多用户访问控制"""
+
+import app as app_module
+
+
+def add_student(client, name="学生"):
+    response = client.post("/api/users", json={"name": name})
+    data = response.get_json()
+    assert data["success"]
+    return data["user_id"], data["api_key"]
+
+
+def test_user_id_cannot_select_other_user(client):
+    user_id, _ = add_student(client)
+
+    assert client.get(f"/api/courses?user_id={user_id}").status_code == 403
+    response = client.get("/api/status", headers={"X-User-Id": str(user_id)})
+    assert response.status_code == 403
+
+
+def test_api_key_selects_user(client, db):
+    user_id, api_key = add_student(client)
+    other_id, other_key = add_student(client, "另一个学生")
+    headers = {"X-Api-Key": api_key}
+
+    assert client.get("/api/courses", headers=headers).status_code == 200
+    assert client.get(f"/api/users/{user_id}", headers=headers).status_code == 200
+    assert client.get(f"/api/users/{other_id}", headers=headers).status_code == 403
+    assert client.get("/api/users", headers=headers).status_code == 403
+    assert (
+        client.get(f"/api/courses?user_id={other_id}", headers=headers).status_code
+        == 403
+    )
+    assert client.get("/api/courses", headers={"X-Api-Key": "wrong"}).status_code == 401
+
+    owner = app_module.app.test_client()
+    assert "api_key" not in owner.get("/api/users").get_json()["users"][0]
+
+
+def test_session_remembers_user(client):
+    user_id, api_key = add_student(client)
+
+    with app_module.app.test_client() as student:
+        assert student.get(f"/api/users/{user_id}?api_key={api_key}").status_code == 200
+        # 之后的请求不带Key，按会话中的用户处理，不能再访问管理接口
+        assert student.get(f"/api/users/{user_id}").status_code == 200
+        assert student.get("/api/users").status_code == 403
+
+
+def test_owner_api_key_required(client, monkeypatch):
+    monkeypatch.setattr(app_module, "OWNER_API_KEY", "owner-key")
+
+    assert client.get("/api/users").status_code == 401
+    assert client.get("/api/users", headers={"X-Api-Key": "owner-key"}).status_code == 200
+
+
+def test_global_settings_owner_only(client, db):
+    _, api_key = add_student(client)
+    headers = {"X-Api-Key": api_key}
+
+    response = client.post(
+        "/api/settings", json={"skip_holidays": False}, headers=headers
+    )
+    assert response.status_code == 403
+    assert db.get_setting("skip_holidays", "true") == "true"
+
+    response = client.post("/api/settings", json={"smtp_to": "a@b"}, headers=headers)
+    assert response.status_code == 200
+    owner = app_module.app.test_client()
+    response = owner.post("/api/settings", json={"skip_holidays": False})
+    assert response.status_code == 200
+    assert db.get_setting("skip_holidays") == "false"
+
+
+def test_location_conflicts_hide_other_users(client, db):
+    user_id, api_key = add_student(client)
+    course = {
+        "name": "高等数学",
+        "day_of_week": 1,
+        "start_time": "08:00",
+        "end_time": "09:40",
+        "location": "A101",
+        "week_pattern": "all",
+    }
+    db.add_courses([course])
+    db.add_courses([dict(course, name="大学英语")], user_id=user_id)
+
+    url = "/api/conflicts?scope=location"
+    data = client.get(url, headers={"X-Api-Key": api_key}).get_json()
+    names = [c["name"] for c in data["conflicts"][0]["courses"]]
+    assert sorted(names) == ["其他用户的课程", "大学英语"]
+    assert data["conflicts"][0]["courses"][0]["location"] == "A101"
+
+    owner = app_module.app.test_client()
+    names = [c["name"] for c in owner.get(url).get_json()["conflicts"][0]["courses"]]
+    assert sorted(names) == ["大学英语", "高等数学"]
+
+
+def test_import_job_owner_only(client, db, monkeypatch):
+    _, api_key = add_student(client)
+    job = {"id": "job", "user_id": db.DEFAULT_USER_ID, "status": "done"}
+    monkeypatch.setattr(app_module, "get_job", lambda job_id: dict(job))
+
+    assert client.get("/api/jobs/job").status_code == 200
+    assert client.get("/api/jobs/job", headers={"X-Api-Key": api_key}).status_code == 404
+
+
+def test_profiling_owner_only(client):
+    _, api_key = add_student(client)
+    headers = {"X-Api-Key": api_key}
+
+    assert client.get("/api/profiling", headers=headers).status_code == 403
+    response = client.post("/api/profiling", json={"reset": True}, headers=headers)
+    assert response.status_code == 403
+
+    owner = app_module.app.test_client()
+    assert owner.get("/api/profiling").status_code == 200
+
+
+def test_metrics_owner_only(client):
+    _, api_key = add_student(client)
+
+    assert client.get("/metrics", headers={"X-Api-Key": api_key}).status_code == 403
+    assert app_module.app.test_client().get("/metrics").status_code == 200
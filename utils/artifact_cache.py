@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+生成文件缓存模块
+模板、示例文件、日历订阅等内容生成代价高但很少变化，首次请求时生成并缓存字节内容和ETag
+"""
+
+import hashlib
+import threading
+
+# 缓存内容 {name: {"version": 版本, "data": 字节内容, "etag": ETag}}
+_artifacts = {}
+_lock = threading.Lock()
+
+
+def make_etag(data):
+    """根据内容计算强ETag（不含引号）"""
+    return hashlib.sha256(data).hexdigest()[:32]
+
+
+def get_artifact(name, builder, version=None):
+    """
+    获取缓存的生成内容，不存在或版本变化时调用builder重新生成
+
+    参数:
+        name: 缓存名称
+        builder: 生成函数，返回bytes
+        version: 内容版本，与缓存版本不同时重新生成（None表示内容固定不变）
+
+    返回:
+        dict: {"data": 字节内容, "etag": ETag, "version": 版本}
+    """
+    artifact = _artifacts.get(name)
+    if artifact is not None and artifact["version"] == version:
+        return artifact
+
+    with _lock:
+        # 加锁后再检查一次，避免并发请求重复生成
+        artifact = _artifacts.get(name)
+        if artifact is None or artifact["version"] != version:
+            data = builder()
+            artifact = {"data": data, "etag": make_etag(data), "version": version}
+            _artifacts[name] = artifact
+
+    return artifact
+
+
+def invalidate_artifact(name=None):
+    """
+    清除缓存
+
+    参数:
+        name: 缓存名称，默认清除全部
+    """
+    with _lock:
+        if name is None:
+            _artifacts.clear()
+        else:
+            _artifacts.pop(name, None)
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+日历订阅模块
+将课程按开学日期和周次规则展开为iCalendar（ICS）事件，供手机日历订阅
+规律的周次（每周、单双周、连续周）生成RRULE，不规律的周次生成RDATE，节假日和停课生成EXDATE
+"""
+
+from datetime import datetime, timedelta
+
+from config import CALENDAR_TIMEZONE
+from utils.conflicts import mask_to_weeks
+from utils.database import get_course_exceptions, iter_courses
+from utils.holiday_checker import load_holidays
+from utils.teaching_calendar import get_calendar
+from utils.week_utils import week_pattern_to_mask
+
+PRODID = "-//class-wechat-reminder//课程提醒助手//CN"
+UID_DOMAIN = "class-wechat-reminder"
+
+
+def escape_text(value):
+    """转义ICS文本值中的特殊字符"""
+    return (
+        str(value or "")
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def fold_line(line):
+    """按RFC 5545将超过75字节的行折行（不拆分多字节字符）"""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line + "\r\n"
+
+    parts = []
+    current = ""
+    size = 0
+    limit = 75
+    for char in line:
+        char_size = len(char.encode("utf-8"))
+        if size + char_size > limit:
+            parts.append(current)
+            current = ""
+            size = 0
+            # 续行以一个空格开头，占用1字节
+            limit = 74
+        current += char
+        size += char_size
+    parts.append(current)
+
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _format_local(date, time_str):
+    """生成本地时间 YYYYMMDDTHHMMSS"""
+    hour, minute = map(int, time_str.split(":")[:2])
+    return f"{date.strftime('%Y%m%d')}T{hour:02d}{minute:02d}00"
+
+
+def _dtstamp(course):
+    """课程创建时间作为DTSTAMP，保证内容不变时输出稳定"""
+    try:
+        created = datetime.strptime(str(course.get("created_at")), "%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        created = datetime(2024, 1, 1)
+    return created.strftime("%Y%m%dT%H%M%SZ")
+
+
+def _holiday_dates(holidays_data):
+    """节假日数据中的全部放假日期（不含普通周末）"""
+    dates = set()
+    for year_data in holidays_data.values():
+        if isinstance(year_data, dict):
+            dates.update(year_data.get("holidays", []))
+    return dates
+
+
+def _event_lines(uid, course, dtstamp, start, end_time, location):
+    """单个事件的公共字段"""
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{uid}",
+        f"DTSTAMP:{dtstamp}",
+        f"DTSTART;TZID={CALENDAR_TIMEZONE}:{start}",
+        f"DTEND;TZID={CALENDAR_TIMEZONE}:{end_time}",
+        f"SUMMARY:{escape_text(course['name'])}",
+    ]
+    if location:
+        lines.append(f"LOCATION:{escape_text(location)}")
+    if course.get("remark"):
+        lines.append(f"DESCRIPTION:{escape_text(course['remark'])}")
+    return lines
+
+
+def course_event_lines(course, first_monday, total_weeks, holidays, exceptions):
+    """
+    将一门课程展开为ICS事件行
+
+    参数:
+        course: 课程信息
+        first_monday: 第1周周一
+        total_weeks: 学期总周数
+        holidays: 放假日期集合（YYYY-MM-DD）
+        exceptions: 该课程的停课/调课列表
+
+    返回:
+        list: ICS行（未折行），课程在学期内没有上课日期时返回空列表
+    """
+    mask = course.get("week_mask")
+    if mask is None:
+        mask = week_pattern_to_mask(course.get("week_pattern") or "all")
+    weeks = [week for week in mask_to_weeks(mask) if 1 <= week <= total_weeks]
+    if not weeks:
+        return []
+
+    def session_date(week):
+        return first_monday + timedelta(
+            weeks=week - 1, days=course["day_of_week"] - 1
+        )
+
+    dates = [session_date(week) for week in weeks]
+    dtstamp = _dtstamp(course)
+    lines = _event_lines(
+        f"course-{course['id']}@{UID_DOMAIN}",
+        course,
+        dtstamp,
+        _format_local(dates[0], course["start_time"]),
+        _format_local(dates[0], course["end_time"]),
+        course.get("location"),
+    )
+
+    # 周次间隔一致时用RRULE，否则逐个列出上课日期
+    steps = {b - a for a, b in zip(weeks, weeks[1:])}
+    if len(steps) == 1:
+        lines.append(f"RRULE:FREQ=WEEKLY;INTERVAL={steps.pop()};COUNT={len(weeks)}")
+    elif steps:
+        rdates = ",".join(_format_local(date, course["start_time"]) for date in dates[1:])
+        lines.append(f"RDATE;TZID={CALENDAR_TIMEZONE}:{rdates}")
+
+    # 节假日、停课、调走的日期从重复规则中排除
+    excluded = {e["date"] for e in exceptions}
+    exdates = [
+        _format_local(date, course["start_time"])
+        for date in dates
+        if date.strftime("%Y-%m-%d") in holidays
+        or date.strftime("%Y-%m-%d") in excluded
+    ]
+    if exdates:
+        lines.append(f"EXDATE;TZID={CALENDAR_TIMEZONE}:{','.join(exdates)}")
+    lines.append("END:VEVENT")
+
+    # 调课生成单独的事件
+    for exception in exceptions:
+        if exception["action"] != "reschedule":
+            continue
+        date = datetime.strptime(
+            exception["new_date"] or exception["date"], "%Y-%m-%d"
+        ).date()
+        lines += _event_lines(
+            f"course-{course['id']}-{exception['date']}@{UID_DOMAIN}",
+            course,
+            dtstamp,
+            _format_local(date, exception["new_start_time"] or course["start_time"]),
+            _format_local(date, exception["new_end_time"] or course["end_time"]),
+            exception["new_location"] or course.get("location"),
+        )
+        lines.append("END:VEVENT")
+
+    return lines
+
+
+def iter_calendar_ics(user_id=None):
+    """
+    逐门课程生成ICS内容
+
+    参数:
+        user_id: 只包含该用户的课程
+
+    返回:
+        generator: UTF-8编码的ICS数据块；未设置开学日期时只包含日历头
+    """
+    header = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{PRODID}",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        "X-WR-CALNAME:课程表",
+        f"X-WR-TIMEZONE:{CALENDAR_TIMEZONE}",
+        "BEGIN:VTIMEZONE",
+        f"TZID:{CALENDAR_TIMEZONE}",
+        "BEGIN:STANDARD",
+        "DTSTART:19700101T000000",
+        "TZOFFSETFROM:+0800",
+        "TZOFFSETTO:+0800",
+        "TZNAME:CST",
+        "END:STANDARD",
+        "END:VTIMEZONE",
+    ]
+    yield "".join(fold_line(line) for line in header).encode("utf-8")
+
+    calendar = get_calendar(user_id)
+    first_monday = calendar["first_monday"]
+    if first_monday is not None:
+        holidays = _holiday_dates(load_holidays())
+
+        exceptions_by_course = {}
+        for exception in get_course_exceptions(user_id=user_id):
+            exceptions_by_course.setdefault(exception["course_id"], []).append(
+                exception
+            )
+
+        for course in iter_courses(user_id=user_id):
+            lines = course_event_lines(
+                course,
+                first_monday,
+                calendar["total_weeks"],
+                holidays,
+                exceptions_by_course.get(course["id"], []),
+            )
+            if lines:
+                yield "".join(fold_line(line) for line in lines).encode("utf-8")
+
+    yield fold_line("END:VCALENDAR").encode("utf-8")
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+时钟模块
+定时任务、数据库操作和节假日检查通过 clock.now() 获取当前时间，
+默认为系统时间；模拟和测试时可用 set_clock() 换成虚拟时钟
+"""
+
+import threading
+from datetime import datetime, timedelta
+
+_now = datetime.now
+_lock = threading.Lock()
+
+
+def now():
+    """当前时间（datetime）"""
+    return _now()
+
+
+def today():
+    """今天的日期（date）"""
+    return _now().date()
+
+
+def set_clock(now_func=None):
+    """
+    替换时间来源
+
+    参数:
+        now_func: 返回datetime的函数（如 VirtualClock 实例的 now），为None时恢复系统时间
+
+    返回:
+        function: 原来的时间来源，便于恢复
+    """
+    global _now
+    with _lock:
+        previous = _now
+        _now = now_func or datetime.now
+    return previous
+
+
+class VirtualClock:
+    """手动拨动的虚拟时钟，时间只在 set/advance 时改变"""
+
+    def __init__(self, moment=None):
+        self._moment = moment or datetime.now()
+        self._lock = threading.Lock()
+
+    def now(self):
+        """虚拟时钟的当前时间"""
+        with self._lock:
+            return self._moment
+
+    def set(self, moment):
+        """拨到指定时间"""
+        with self._lock:
+            self._moment = moment
+
+    def advance(self, **kwargs):
+        """
+        向后拨动时间
+
+        参数:
+            kwargs: 传给timedelta的参数，如 minutes=1、days=1
+
+        返回:
+            datetime: 拨动后的时间
+        """
+        with self._lock:
+            self._moment += timedelta(**kwargs)
+            return self._moment
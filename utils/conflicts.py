@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+课程时间冲突检测模块
+按星期将课程整理为有序时间区间，用扫描线检测重叠，并要求两门课的上课周次有交集
+"""
+
+from utils.week_utils import week_pattern_to_mask
+
+
+def time_to_minutes(time_str):
+    """将 HH:MM 转换为当天的分钟数"""
+    hour, minute = map(int, str(time_str).split(":")[:2])
+    return hour * 60 + minute
+
+
+def mask_to_weeks(mask):
+    """将周次位掩码转换为周次列表"""
+    weeks = []
+    week = 0
+    while mask:
+        if mask & 1:
+            weeks.append(week)
+        mask >>= 1
+        week += 1
+    return weeks
+
+
+def _course_interval(course):
+    """获取课程的 (开始分钟, 结束分钟, 周次掩码)"""
+    mask = course.get("week_mask")
+    if mask is None:
+        mask = week_pattern_to_mask(course.get("week_pattern") or "all")
+    return (
+        time_to_minutes(course["start_time"]),
+        time_to_minutes(course["end_time"]),
+        mask,
+    )
+
+
+def _conflict_summary(course):
+    """冲突结果中的课程摘要"""
+    return {
+        "id": course.get("id"),
+        "name": course["name"],
+        "day_of_week": course["day_of_week"],
+        "start_time": course["start_time"],
+        "end_time": course["end_time"],
+        "location": course.get("location") or "",
+        "week_pattern": course.get("week_pattern") or "all",
+    }
+
+
+def find_conflicts(courses, candidates=None, by_location=False):
+    """
+    检测课程时间冲突
+
+    参数:
+        courses: 课程列表（需包含 day_of_week、start_time、end_time，week_mask 或 week_pattern）
+        candidates: 新增或修改后的课程列表，可选；指定时只返回与新课程相关的冲突，
+                    不返回 courses 内部的冲突（courses 中不应包含正在修改的课程）
+        by_location: 为True时只检测同一地点的冲突（教室占用冲突），适合全院系课表
+
+    返回:
+        list: 冲突列表 [{day_of_week, courses: [课程A, 课程B], weeks: 重叠周次}]
+    """
+    check_all = candidates is None
+    entries = [(course, False) for course in courses]
+    entries += [(course, True) for course in candidates or []]
+
+    # 按星期（或地点+星期）分组为区间列表
+    groups = {}
+    for course, is_candidate in entries:
+        try:
+            start, end, mask = _course_interval(course)
+        except (KeyError, ValueError):
+            continue
+
+        if by_location:
+            if not course.get("location"):
+                continue
+            key = (course["day_of_week"], course["location"])
+        else:
+            key = (course["day_of_week"],)
+        groups.setdefault(key, []).append((start, end, mask, is_candidate, course))
+
+    conflicts = []
+
+    for key in sorted(groups):
+        day_of_week = key[0]
+        intervals = sorted(groups[key], key=lambda item: (item[0], item[1]))
+
+        # 扫描线：active 保存尚未结束的区间
+        active = []
+        for start, end, mask, is_candidate, course in intervals:
+            active = [item for item in active if item[1] > start]
+
+            for _, _, other_mask, other_is_candidate, other in active:
+                if not (check_all or is_candidate or other_is_candidate):
+                    continue
+
+                common = mask & other_mask
+                if common:
+                    conflicts.append(
+                        {
+                            "day_of_week": day_of_week,
+                            "courses": [
+                                _conflict_summary(other),
+                                _conflict_summary(course),
+                            ],
+                            "weeks": mask_to_weeks(common),
+                        }
+                    )
+
+            active.append((start, end, mask, is_candidate, course))
+
+    return conflicts
+
+
+def redact_conflicts(conflicts, visible_ids):
+    """
+    隐藏冲突结果中不属于当前用户的课程，只保留地点和时间
+
+    参数:
+        conflicts: find_conflicts 的结果
+        visible_ids: 当前用户可以查看的课程ID集合
+
+    返回:
+        list: 新的冲突列表（不修改原列表）
+    """
+    redacted = []
+    for conflict in conflicts:
+        courses = []
+        for course in conflict["courses"]:
+            if course["id"] not in visible_ids:
+                course = {
+                    "id": None,
+                    "name": "其他用户的课程",
+                    "day_of_week": course["day_of_week"],
+                    "start_time": course["start_time"],
+                    "end_time": course["end_time"],
+                    "location": course["location"],
+                    "week_pattern": course["week_pattern"],
+                }
+            courses.append(course)
+        redacted.append(dict(conflict, courses=courses))
+    return redacted
+
+
+def format_conflict(conflict):
+    """生成冲突的中文描述"""
+    first, second = conflict["courses"]
+    return (
+        f"{first['name']}（{first['start_time']}-{first['end_time']}）与"
+        f"{second['name']}（{second['start_time']}-{second['end_time']}）"
+        f"在周{conflict['day_of_week']}时间冲突"
+    )
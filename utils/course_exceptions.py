@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+课程例外模块
+处理停课、调课：只影响某一天的一次课，不修改课程本身的每周安排
+"""
+
+import re
+from datetime import datetime
+
+from utils.holiday_checker import get_effective_weekday
+from utils.teaching_calendar import get_current_week, is_in_semester
+from utils.week_utils import is_course_active
+
+# 例外类型
+EXCEPTION_ACTIONS = {
+    "cancel": "停课",
+    "reschedule": "调课",
+}
+
+TIME_PATTERN = re.compile(r"^([01]\d|2[0-3]):[0-5]\d$")
+
+
+def _valid_date(value):
+    """检查日期格式（YYYY-MM-DD）"""
+    try:
+        datetime.strptime(str(value), "%Y-%m-%d")
+        return True
+    except ValueError:
+        return False
+
+
+def validate_course_exception(data, partial=False):
+    """
+    验证课程例外数据
+
+    参数:
+        data: 请求数据
+        partial: 为True时只验证提供的字段（用于更新）
+
+    返回:
+        tuple: (规范化后的字段, 错误信息)
+    """
+    fields = {}
+
+    if "date" in data or not partial:
+        if not _valid_date(data.get("date")):
+            return None, "日期格式应为YYYY-MM-DD"
+        fields["date"] = data["date"]
+
+    if "action" in data or not partial:
+        if data.get("action") not in EXCEPTION_ACTIONS:
+            return None, "类型只支持cancel（停课）或reschedule（调课）"
+        fields["action"] = data["action"]
+
+    if data.get("new_date"):
+        if not _valid_date(data["new_date"]):
+            return None, "调课日期格式应为YYYY-MM-DD"
+        fields["new_date"] = data["new_date"]
+    elif "new_date" in data:
+        fields["new_date"] = None
+
+    for key in ("new_start_time", "new_end_time"):
+        if data.get(key):
+            if not TIME_PATTERN.match(str(data[key])):
+                return None, "时间格式应为HH:MM"
+            fields[key] = data[key]
+        elif key in data:
+            fields[key] = None
+
+    if "new_location" in data:
+        fields["new_location"] = str(data["new_location"] or "").strip() or None
+
+    if "reason" in data:
+        fields["reason"] = str(data["reason"] or "").strip()
+
+    start = fields.get("new_start_time")
+    end = fields.get("new_end_time")
+    if start and end and start >= end:
+        return None, "结束时间必须晚于开始时间"
+
+    return fields, None
+
+
+def check_course_session(course, date):
+    """
+    检查课程在指定日期是否有课（停课、调课只能针对实际要上的一次课）
+
+    与每日扫描一致：按调休后的星期和教学周判断，日期需在该用户的学期内
+
+    参数:
+        course: 课程（需包含 user_id、day_of_week、week_pattern）
+        date: 日期（YYYY-MM-DD）
+
+    返回:
+        str 或 None: 错误信息，有课时返回None
+    """
+    weekday = datetime.strptime(date, "%Y-%m-%d").isoweekday()
+    effective_day, effective_week = get_effective_weekday(date)
+    day_of_week = effective_day or weekday
+
+    if day_of_week != course["day_of_week"]:
+        return f"{date} 按星期{day_of_week}的课表上课，该课程当天没有课"
+
+    if effective_week is None and not is_in_semester(date, course["user_id"]):
+        return f"{date} 不在学期内"
+
+    week = effective_week or get_current_week(date, course["user_id"])
+    if not is_course_active(course.get("week_pattern") or "all", week):
+        return f"该课程第{week}周没有课"
+    return None
+
+
+def apply_course_exceptions(courses, exceptions, date):
+    """
+    将课程例外合并到某天的课程列表
+
+    参数:
+        courses: 该天按每周安排应上的课程
+        exceptions: get_exceptions_for_date 查询到的例外
+        date: 日期（YYYY-MM-DD）
+
+    返回:
+        list: 实际要上的课程，调课后的课程带有新的时间、地点和 exception_id
+    """
+    # 原定该天上课、被停课或调走的课程
+    moved_away = {e["course_id"] for e in exceptions if e["date"] == date}
+    result = [
+        dict(course, exception_id=None)
+        for course in courses
+        if course["id"] not in moved_away
+    ]
+
+    # 调到该天（或同一天换时间、地点）的课程
+    for exception in exceptions:
+        if exception["action"] != "reschedule":
+            continue
+        if (exception["new_date"] or exception["date"]) != date:
+            continue
+
+        result.append(
+            {
+                "id": exception["course_id"],
+                "user_id": exception["user_id"],
+                "name": exception["course_name"],
+                "start_time": exception["new_start_time"]
+                or exception["course_start_time"],
+                "end_time": exception["new_end_time"] or exception["course_end_time"],
+                "location": exception["new_location"]
+                or exception["course_location"],
+                "remark": exception["course_remark"],
+                "week_pattern": exception["course_week_pattern"],
+                "exception_id": exception["id"],
+            }
+        )
+
+    result.sort(key=lambda course: course["start_time"])
+    return result
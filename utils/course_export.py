@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+课程导出模块
+从数据库游标逐行读取课程，以生成器方式输出xlsx/csv，导出大表时不占用大量内存
+"""
+
+import csv
+import io
+import tempfile
+
+from openpyxl import Workbook
+
+from utils.database import iter_courses
+
+# 导出列（与导入模板一致，可直接重新导入）
+EXPORT_HEADERS = ["课程名称", "星期", "开始时间", "结束时间", "地点", "备注", "周次"]
+
+# 每次输出的数据块大小
+CHUNK_SIZE = 64 * 1024
+
+
+def course_to_row(course):
+    """将课程转换为导出行"""
+    return [
+        course["name"],
+        course["day_of_week"],
+        course["start_time"],
+        course["end_time"],
+        course.get("location") or "",
+        course.get("remark") or "",
+        course.get("week_pattern") or "all",
+    ]
+
+
+def iter_csv_export(user_id=None):
+    """
+    逐行生成CSV导出内容
+
+    参数:
+        user_id: 只导出指定用户的课程，为None时导出全部
+
+    返回:
+        generator: 编码后的CSV数据块
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    # 带BOM，Excel打开时不乱码
+    writer.writerow(EXPORT_HEADERS)
+    yield ("\ufeff" + buffer.getvalue()).encode("utf-8")
+
+    buffer.seek(0)
+    buffer.truncate()
+
+    # 攒够一个数据块再输出，减少响应分块数量
+    for course in iter_courses(user_id=user_id):
+        writer.writerow(course_to_row(course))
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def iter_xlsx_export(user_id=None):
+    """
+    使用只写模式工作簿生成xlsx导出内容
+
+    只写模式下行数据直接写入临时文件，保存后按块读取输出
+
+    参数:
+        user_id: 只导出指定用户的课程，为None时导出全部
+
+    返回:
+        generator: xlsx文件数据块
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("课程表")
+    ws.append(EXPORT_HEADERS)
+
+    for course in iter_courses(user_id=user_id):
+        ws.append(course_to_row(course))
+
+    with tempfile.TemporaryFile() as output:
+        wb.save(output)
+        output.seek(0)
+
+        while True:
+            chunk = output.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+# 导出格式 -> (MIME类型, 生成器函数)
+EXPORT_FORMATS = {
+    "xlsx": (
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        iter_xlsx_export,
+    ),
+    "csv": ("text/csv; charset=utf-8", iter_csv_export),
+}
@@ -5,8 +5,130 @@
 
 import sqlite3
 import json
-from datetime import datetime
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta
 from config import DATABASE_PATH
+from utils import clock
+from utils.week_utils import week_pattern_to_mask
+
+# 数据版本号：课程、课程例外、用户和配置写入后递增，用于接口ETag和响应缓存
+# （提醒记录每分钟都在变化，缓存的接口不包含提醒数据，提醒写入不递增）
+# 以启动时间（毫秒）为初始值，保证重启后版本号仍然递增
+_data_version = int(time.time() * 1000)
+_data_version_lock = threading.Lock()
+
+
+def get_data_version():
+    """获取当前数据版本号"""
+    return _data_version
+
+
+def bump_data_version():
+    """数据写入后递增版本号"""
+    global _data_version
+    with _data_version_lock:
+        _data_version += 1
+        return _data_version
+
+
+# 默认用户ID：单用户时的课程都属于该用户，其配置即全局settings表
+DEFAULT_USER_ID = 1
+
+# 是否支持FTS5全文检索（init_database时检测）
+_fts_available = False
+# 全文检索分词器：trigram按3字切分，中文和"A101"等子串都能匹配（SQLite 3.34起支持）；
+# 旧版本使用unicode61，连续的中文或字母数字整体为一个词，只能按前缀匹配
+_fts_tokenizer = "trigram" if sqlite3.sqlite_version_info >= (3, 34, 0) else "unicode61"
+
+# 课程变更监听器：callback(course_ids)，course_ids为None表示课程表整体变化
+_course_listeners = []
+
+
+def register_course_listener(callback):
+    """注册课程变更监听器（用于增量维护内存索引）"""
+    if callback not in _course_listeners:
+        _course_listeners.append(callback)
+
+
+def notify_courses_changed(course_ids=None):
+    """通知课程变更"""
+    for callback in _course_listeners:
+        callback(course_ids)
+
+
+# 配置变更监听器：callback(key, user_id)，user_id为None表示全局配置
+_settings_listeners = []
+
+
+def register_settings_listener(callback):
+    """注册配置变更监听器（用于失效依赖配置的内存缓存）"""
+    if callback not in _settings_listeners:
+        _settings_listeners.append(callback)
+
+
+def notify_settings_changed(key, user_id=None):
+    """通知配置变更"""
+    for callback in _settings_listeners:
+        callback(key, user_id)
+
+
+# SQL执行监听器（用于统计查询耗时），callback(sql, 耗时秒)
+_query_listeners = []
+
+
+def register_query_listener(callback):
+    """注册SQL执行监听器"""
+    if callback not in _query_listeners:
+        _query_listeners.append(callback)
+
+
+def unregister_query_listener(callback):
+    """移除SQL执行监听器"""
+    if callback in _query_listeners:
+        _query_listeners.remove(callback)
+
+
+def _notify_query(sql, elapsed):
+    """通知SQL执行完成"""
+    for callback in _query_listeners:
+        callback(sql, elapsed)
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """有监听器时记录每条SQL耗时的游标，没有监听器时直接执行"""
+
+    def execute(self, sql, parameters=()):
+        if not _query_listeners:
+            return super().execute(sql, parameters)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _notify_query(sql, time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        if not _query_listeners:
+            return super().executemany(sql, seq_of_parameters)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _notify_query(sql, time.perf_counter() - started)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """使用 InstrumentedCursor 的连接"""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
 
 
 def init_database():
@@ -14,10 +136,34 @@ def init_database():
     conn = sqlite3.connect(DATABASE_PATH)
     cursor = conn.cursor()
 
+    # 创建用户表
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            api_key TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # 创建用户配置表（未设置的配置项使用全局settings）
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_settings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            key TEXT NOT NULL,
+            value TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (user_id, key),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    """)
+
     # 创建课程表
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS courses (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL DEFAULT 1 REFERENCES users (id),
             name TEXT NOT NULL,
             day_of_week INTEGER NOT NULL,
             start_time TEXT NOT NULL,
@@ -25,6 +171,7 @@ def init_database():
             location TEXT,
             remark TEXT,
             week_pattern TEXT DEFAULT 'all',
+            week_mask INTEGER,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     """)
@@ -43,10 +190,37 @@ def init_database():
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS reminders (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL DEFAULT 1 REFERENCES users (id),
             course_id INTEGER NOT NULL,
             remind_time TIMESTAMP NOT NULL,
             sent BOOLEAN DEFAULT FALSE,
             sent_at TIMESTAMP,
+            exception_id INTEGER,
+            status TEXT NOT NULL DEFAULT 'pending',
+            idempotency_key TEXT,
+            claimed_by TEXT,
+            lease_until TIMESTAMP,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            FOREIGN KEY (course_id) REFERENCES courses (id)
+        )
+    """)
+
+    # 创建课程例外表（停课/调课，只影响某一天的一次课）
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS course_exceptions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL DEFAULT 1 REFERENCES users (id),
+            course_id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            action TEXT NOT NULL,
+            new_date TEXT,
+            new_start_time TEXT,
+            new_end_time TEXT,
+            new_location TEXT,
+            reason TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (date, course_id),
             FOREIGN KEY (course_id) REFERENCES courses (id)
         )
     """)
@@ -58,6 +232,112 @@ def init_database():
         cursor.execute("ALTER TABLE courses ADD COLUMN week_pattern TEXT DEFAULT 'all'")
         print("[数据库] 已添加 week_pattern 字段")
 
+    # 迁移：添加周次位掩码列，并为已有课程回填
+    if "week_mask" not in columns:
+        cursor.execute("ALTER TABLE courses ADD COLUMN week_mask INTEGER")
+        print("[数据库] 已添加 week_mask 字段")
+
+    # 迁移：课程和提醒归属用户，已有数据属于默认用户
+    if "user_id" not in columns:
+        cursor.execute(
+            "ALTER TABLE courses ADD COLUMN user_id INTEGER NOT NULL DEFAULT 1 REFERENCES users (id)"
+        )
+        print("[数据库] 已添加 courses.user_id 字段")
+
+    cursor.execute("PRAGMA table_info(reminders)")
+    if "user_id" not in [col[1] for col in cursor.fetchall()]:
+        cursor.execute(
+            "ALTER TABLE reminders ADD COLUMN user_id INTEGER NOT NULL DEFAULT 1 REFERENCES users (id)"
+        )
+        print("[数据库] 已添加 reminders.user_id 字段")
+
+    # 迁移：提醒关联课程例外（调课后的时间、地点）
+    cursor.execute("PRAGMA table_info(reminders)")
+    reminder_columns = [col[1] for col in cursor.fetchall()]
+    if "exception_id" not in reminder_columns:
+        cursor.execute("ALTER TABLE reminders ADD COLUMN exception_id INTEGER")
+        print("[数据库] 已添加 reminders.exception_id 字段")
+
+    # 迁移：提醒发件箱状态（pending -> claimed -> sent/failed），已发送的记录直接标记为sent
+    if "status" not in reminder_columns:
+        cursor.execute(
+            "ALTER TABLE reminders ADD COLUMN status TEXT NOT NULL DEFAULT 'pending'"
+        )
+        cursor.execute("ALTER TABLE reminders ADD COLUMN idempotency_key TEXT")
+        cursor.execute("ALTER TABLE reminders ADD COLUMN claimed_by TEXT")
+        cursor.execute("ALTER TABLE reminders ADD COLUMN lease_until TIMESTAMP")
+        cursor.execute(
+            "ALTER TABLE reminders ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0"
+        )
+        cursor.execute("ALTER TABLE reminders ADD COLUMN last_error TEXT")
+        cursor.execute("UPDATE reminders SET status = 'sent' WHERE sent = TRUE")
+        # 旧记录可能因重复扫描而重复，使用记录ID作为幂等键
+        cursor.execute(
+            "UPDATE reminders SET idempotency_key = 'reminder-' || id WHERE idempotency_key IS NULL"
+        )
+        print("[数据库] 已添加提醒发件箱字段")
+
+    cursor.execute(
+        "INSERT OR IGNORE INTO users (id, name) VALUES (?, '默认用户')",
+        (DEFAULT_USER_ID,),
+    )
+
+    # 迁移：用户访问接口的API Key，为已有的其他用户生成
+    cursor.execute("PRAGMA table_info(users)")
+    if "api_key" not in [col[1] for col in cursor.fetchall()]:
+        cursor.execute("ALTER TABLE users ADD COLUMN api_key TEXT")
+        print("[数据库] 已添加 users.api_key 字段")
+    cursor.execute(
+        "SELECT id FROM users WHERE api_key IS NULL AND id != ?", (DEFAULT_USER_ID,)
+    )
+    cursor.executemany(
+        "UPDATE users SET api_key = ? WHERE id = ?",
+        [(generate_api_key(), row[0]) for row in cursor.fetchall()],
+    )
+    cursor.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_users_api_key ON users (api_key)"
+    )
+
+    cursor.execute("SELECT id, week_pattern FROM courses WHERE week_mask IS NULL")
+    cursor.executemany(
+        "UPDATE courses SET week_mask = ? WHERE id = ?",
+        [(week_pattern_to_mask(row[1]), row[0]) for row in cursor.fetchall()],
+    )
+
+    # 索引：按星期/地点/名称/用户查询课程、按课程查询提醒、查询待发送提醒
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_courses_day_start ON courses (day_of_week, start_time)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_courses_location ON courses (location)"
+    )
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_courses_name ON courses (name)")
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_courses_user_day ON courses (user_id, day_of_week, start_time)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_reminders_course ON reminders (course_id)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_reminders_pending ON reminders (sent, remind_time)"
+    )
+    # 发件箱：按状态和提醒时间领取；幂等键保证同一提醒只生成一次
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_reminders_status ON reminders (status, remind_time)"
+    )
+    cursor.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_reminders_idempotency ON reminders (idempotency_key)"
+    )
+    # 课程例外按 (date, course_id) 的唯一索引查询；调入日期单独建索引
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_course_exceptions_new_date ON course_exceptions (new_date)"
+    )
+
+    # 全文检索：FTS5虚拟表镜像课程名称、地点、备注，由触发器保持同步
+    init_course_search(cursor)
+    # 二字索引：trigram无法检索的1-2字关键词（如"高数"）通过索引查找，不扫描全表
+    init_course_bigrams(cursor)
+
     # 初始化教学周设置
     cursor.execute(
         "INSERT OR IGNORE INTO settings (key, value) VALUES ('current_week', '1')"
@@ -74,93 +354,634 @@ def init_database():
     print("[数据库] 初始化完成")
 
 
+def init_course_search(cursor):
+    """创建课程全文检索表和同步触发器（SQLite不支持FTS5时跳过）"""
+    global _fts_available
+
+    cursor.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'courses_fts'"
+    )
+    row = cursor.fetchone()
+    exists = row is not None
+
+    # 旧数据库的检索表使用unicode61分词时，重建为trigram
+    if exists and _fts_tokenizer == "trigram" and "trigram" not in row[0]:
+        cursor.execute("DROP TABLE courses_fts")
+        for trigger in ("insert", "delete", "update"):
+            cursor.execute(f"DROP TRIGGER IF EXISTS courses_fts_{trigger}")
+        exists = False
+
+    if _fts_tokenizer == "trigram":
+        options = "tokenize='trigram'"
+    else:
+        options = "tokenize='unicode61 remove_diacritics 2', prefix='1 2 3'"
+
+    try:
+        cursor.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS courses_fts USING fts5(
+                name, location, remark,
+                content='courses', content_rowid='id',
+                {options}
+            )
+        """)
+    except sqlite3.OperationalError as e:
+        _fts_available = False
+        print(f"[数据库] 当前SQLite不支持FTS5，课程搜索将使用二字索引: {e}")
+        return
+
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS courses_fts_insert AFTER INSERT ON courses BEGIN
+            INSERT INTO courses_fts (rowid, name, location, remark)
+            VALUES (new.id, new.name, new.location, new.remark);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS courses_fts_delete AFTER DELETE ON courses BEGIN
+            INSERT INTO courses_fts (courses_fts, rowid, name, location, remark)
+            VALUES ('delete', old.id, old.name, old.location, old.remark);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS courses_fts_update
+        AFTER UPDATE OF name, location, remark ON courses BEGIN
+            INSERT INTO courses_fts (courses_fts, rowid, name, location, remark)
+            VALUES ('delete', old.id, old.name, old.location, old.remark);
+            INSERT INTO courses_fts (rowid, name, location, remark)
+            VALUES (new.id, new.name, new.location, new.remark);
+        END
+    """)
+
+    # 新建检索表时为已有课程建立索引
+    if not exists:
+        cursor.execute("INSERT INTO courses_fts (courses_fts) VALUES ('rebuild')")
+        print("[数据库] 已创建课程全文检索索引")
+
+    _fts_available = True
+
+
+# 二字索引只覆盖每个字段的前若干个字
+BIGRAM_MAX_LENGTH = 500
+
+# 把课程名称、地点、备注切分为二字片段（每个字段最后一个字单独成为一个片段，用于单字检索）
+# {source} 为提供 id、value 两列的子查询；SQLite只对ASCII字母做lower，与LIKE的大小写规则一致
+COURSE_BIGRAMS_INSERT = """
+    INSERT OR IGNORE INTO course_bigrams (gram, course_id)
+    SELECT substr(lower(t.value), p.n, 2), t.id
+    FROM ({source}) t
+    JOIN search_positions p ON p.n <= length(t.value)
+"""
+
+
+def init_course_bigrams(cursor):
+    """创建课程二字索引表和同步触发器"""
+    cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'course_bigrams'"
+    )
+    exists = cursor.fetchone() is not None
+
+    cursor.execute(
+        "CREATE TABLE IF NOT EXISTS search_positions (n INTEGER PRIMARY KEY)"
+    )
+    cursor.executemany(
+        "INSERT OR IGNORE INTO search_positions (n) VALUES (?)",
+        [(n,) for n in range(1, BIGRAM_MAX_LENGTH + 1)],
+    )
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS course_bigrams (
+            gram TEXT NOT NULL,
+            course_id INTEGER NOT NULL,
+            PRIMARY KEY (gram, course_id)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_course_bigrams_course ON course_bigrams (course_id)"
+    )
+
+    new_source = (
+        "SELECT new.id AS id, new.name AS value "
+        "UNION ALL SELECT new.id, new.location UNION ALL SELECT new.id, new.remark"
+    )
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS course_bigrams_insert AFTER INSERT ON courses BEGIN
+            {COURSE_BIGRAMS_INSERT.format(source=new_source)};
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS course_bigrams_delete AFTER DELETE ON courses BEGIN
+            DELETE FROM course_bigrams WHERE course_id = old.id;
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS course_bigrams_update
+        AFTER UPDATE OF name, location, remark ON courses BEGIN
+            DELETE FROM course_bigrams WHERE course_id = old.id;
+            {COURSE_BIGRAMS_INSERT.format(source=new_source)};
+        END
+    """)
+
+    # 新建索引表时为已有课程建立索引
+    if not exists:
+        cursor.execute(
+            COURSE_BIGRAMS_INSERT.format(
+                source="SELECT id, name AS value FROM courses "
+                "UNION ALL SELECT id, location FROM courses "
+                "UNION ALL SELECT id, remark FROM courses"
+            )
+        )
+
+
+def _escape_like(term):
+    """转义LIKE通配符（配合 ESCAPE '\\' 使用），用户输入的 % 和 _ 按原字符匹配"""
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _bigram_conditions(term):
+    """
+    生成按二字索引筛选候选课程的SQL条件
+
+    单字关键词按前缀范围查找以该字开头的片段，更长的关键词要求其所有二字片段都存在
+
+    返回:
+        tuple: (条件列表, 参数列表)
+    """
+    subquery = "c.id IN (SELECT course_id FROM course_bigrams WHERE {})"
+    if len(term) == 1:
+        return [subquery.format("gram >= lower(?) AND gram < lower(?)")], [
+            term,
+            term + "\U0010ffff",
+        ]
+
+    grams = list(dict.fromkeys(term[i : i + 2] for i in range(len(term) - 1)))
+    return [subquery.format("gram = lower(?)")] * len(grams), grams
+
+
 def get_db_connection():
     """获取数据库连接"""
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = sqlite3.connect(DATABASE_PATH, factory=InstrumentedConnection)
     conn.row_factory = sqlite3.Row
     return conn
 
 
 # 课程相关操作
+def _user_filter(user_id, column="user_id"):
+    """
+    生成按用户筛选的SQL条件
+
+    返回:
+        tuple: (条件列表, 参数列表)，user_id为None时不筛选
+    """
+    if user_id is None:
+        return [], []
+    return [f"{column} = ?"], [user_id]
+
+
 def add_course(
-    name, day_of_week, start_time, end_time, location="", remark="", week_pattern="all"
+    name,
+    day_of_week,
+    start_time,
+    end_time,
+    location="",
+    remark="",
+    week_pattern="all",
+    user_id=DEFAULT_USER_ID,
 ):
     """添加课程"""
     conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute(
         """
-        INSERT INTO courses (name, day_of_week, start_time, end_time, location, remark, week_pattern)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
+        INSERT INTO courses (user_id, name, day_of_week, start_time, end_time, location, remark, week_pattern, week_mask)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
     """,
-        (name, day_of_week, start_time, end_time, location, remark, week_pattern),
+        (
+            user_id,
+            name,
+            day_of_week,
+            start_time,
+            end_time,
+            location,
+            remark,
+            week_pattern,
+            week_pattern_to_mask(week_pattern),
+        ),
     )
     course_id = cursor.lastrowid
     conn.commit()
+    bump_data_version()
+    notify_courses_changed([course_id])
     conn.close()
     return course_id
 
 
-def get_all_courses():
-    """获取所有课程"""
+def add_courses(courses, progress_callback=None, user_id=DEFAULT_USER_ID):
+    """
+    批量添加课程（单个事务）
+
+    参数:
+        courses: 课程信息列表
+        progress_callback: 进度回调函数 callback(已处理数量)，可选
+        user_id: 课程所属用户
+
+    返回:
+        tuple: (新增课程ID列表, 错误信息列表)
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    course_ids = []
+    errors = []
+
+    for idx, course in enumerate(courses, 1):
+        try:
+            cursor.execute(
+                """
+                INSERT INTO courses (user_id, name, day_of_week, start_time, end_time, location, remark, week_pattern, week_mask)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+                (
+                    user_id,
+                    course["name"],
+                    course["day_of_week"],
+                    course["start_time"],
+                    course["end_time"],
+                    course.get("location", ""),
+                    course.get("remark", ""),
+                    course.get("week_pattern") or "all",
+                    week_pattern_to_mask(course.get("week_pattern") or "all"),
+                ),
+            )
+            course_ids.append(cursor.lastrowid)
+        except Exception as e:
+            errors.append(f"添加课程失败 {course.get('name')}: {str(e)}")
+
+        if progress_callback and idx % 500 == 0:
+            progress_callback(idx)
+
+    conn.commit()
+    bump_data_version()
+    notify_courses_changed(course_ids)
+    conn.close()
+
+    if progress_callback:
+        progress_callback(len(courses))
+
+    return course_ids, errors
+
+
+def get_all_courses(user_id=None):
+    """获取所有课程（指定user_id时只返回该用户的课程）"""
+    conditions, params = _user_filter(user_id)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        f"SELECT * FROM courses {where} ORDER BY day_of_week, start_time", params
+    )
+    courses = cursor.fetchall()
+    conn.close()
+    return [dict(course) for course in courses]
+
+
+def get_course_by_id(course_id, user_id=None):
+    """按ID获取课程，不存在（或不属于指定用户）时返回None"""
+    conditions, params = _user_filter(user_id)
+    conditions.insert(0, "id = ?")
+    params.insert(0, course_id)
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT * FROM courses WHERE {' AND '.join(conditions)}", params)
+    course = cursor.fetchone()
+    conn.close()
+    return dict(course) if course else None
+
+
+def get_courses_by_ids(course_ids):
+    """按ID批量获取课程"""
+    course_ids = list(course_ids)
+    if not course_ids:
+        return []
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    courses = []
+
+    # 分批查询，避免超过SQLite参数数量限制
+    for i in range(0, len(course_ids), 500):
+        batch = course_ids[i : i + 500]
+        placeholders = ", ".join("?" * len(batch))
+        cursor.execute(f"SELECT * FROM courses WHERE id IN ({placeholders})", batch)
+        courses.extend(dict(course) for course in cursor.fetchall())
+
+    conn.close()
+    return courses
+
+
+def search_courses(query, limit=20, user_id=None):
+    """
+    全文检索课程名称、地点、备注（每个关键词按子串匹配）
+
+    关键词都在3个字及以上时使用trigram全文检索，按相关度排序；
+    否则（如"高数"，或不支持trigram）通过二字索引找出候选课程，再用LIKE确认子串匹配
+
+    参数:
+        query: 搜索关键词，多个关键词用空格分隔
+        limit: 最多返回数量
+        user_id: 只检索指定用户的课程，为None时检索全部
+
+    返回:
+        list: 课程列表
+    """
+    terms = [term for term in str(query).split() if term]
+    if not terms:
+        return []
+
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("SELECT * FROM courses ORDER BY day_of_week, start_time")
+
+    if (
+        _fts_available
+        and _fts_tokenizer == "trigram"
+        and all(len(term) >= 3 for term in terms)
+    ):
+        # 关键词加引号转义FTS5语法字符
+        match = " ".join('"{}"'.format(term.replace('"', '""')) for term in terms)
+        conditions, params = _user_filter(user_id, "c.user_id")
+        conditions.insert(0, "courses_fts MATCH ?")
+        params.insert(0, match)
+        cursor.execute(
+            f"""
+            SELECT c.* FROM courses_fts
+            JOIN courses c ON c.id = courses_fts.rowid
+            WHERE {" AND ".join(conditions)}
+            ORDER BY bm25(courses_fts, 10.0, 5.0, 1.0)
+            LIMIT ?
+        """,
+            params + [limit],
+        )
+    else:
+        conditions, params = _user_filter(user_id, "c.user_id")
+        for term in terms:
+            term_conditions, term_params = _bigram_conditions(term)
+            conditions.extend(term_conditions)
+            params.extend(term_params)
+            conditions.append(
+                "(c.name LIKE ? ESCAPE '\\' OR c.location LIKE ? ESCAPE '\\' "
+                "OR c.remark LIKE ? ESCAPE '\\')"
+            )
+            params.extend([f"%{_escape_like(term)}%"] * 3)
+        cursor.execute(
+            f"""
+            SELECT c.* FROM courses c
+            WHERE {" AND ".join(conditions)}
+            ORDER BY c.day_of_week, c.start_time
+            LIMIT ?
+        """,
+            params + [limit],
+        )
+
     courses = cursor.fetchall()
     conn.close()
     return [dict(course) for course in courses]
 
 
-def get_courses_by_day(day_of_week):
-    """获取指定星期的课程"""
+def count_courses(user_id=None):
+    """统计课程总数（指定user_id时只统计该用户）"""
+    conditions, params = _user_filter(user_id)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT COUNT(*) FROM courses {where}", params)
+    count = cursor.fetchone()[0]
+    conn.close()
+    return count
+
+
+def count_courses_by_day(day_of_week=None, user_id=None):
+    """
+    按星期统计课程数
+
+    参数:
+        day_of_week: 指定星期（1-7），为None时返回全部星期的统计
+        user_id: 只统计指定用户的课程，为None时统计全部
+
+    返回:
+        int 或 dict: 指定星期的课程数，或 {星期: 课程数}
+    """
+    conditions, params = _user_filter(user_id)
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    if day_of_week is not None:
+        conditions.append("day_of_week = ?")
+        params.append(day_of_week)
+        cursor.execute(
+            f"SELECT COUNT(*) FROM courses WHERE {' AND '.join(conditions)}", params
+        )
+        result = cursor.fetchone()[0]
+    else:
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        cursor.execute(
+            f"SELECT day_of_week, COUNT(*) FROM courses {where} GROUP BY day_of_week",
+            params,
+        )
+        result = {row[0]: row[1] for row in cursor.fetchall()}
+
+    conn.close()
+    return result
+
+
+def get_courses_page(
+    limit=50,
+    after=None,
+    day=None,
+    week=None,
+    location=None,
+    name_prefix=None,
+    user_id=None,
+):
+    """
+    按 (星期, 开始时间, ID) 键集分页查询课程
+
+    参数:
+        limit: 每页数量
+        after: 上一页最后一条的 (day_of_week, start_time, id)，为None时从头开始
+        day: 按星期筛选
+        week: 按教学周筛选（周次位掩码）
+        location: 按地点精确筛选
+        name_prefix: 按课程名称前缀筛选
+        user_id: 按用户筛选
+
+    返回:
+        tuple: (课程列表, 下一页游标 或 None)
+    """
+    conditions, params = _user_filter(user_id)
+
+    if day is not None:
+        conditions.append("day_of_week = ?")
+        params.append(day)
+    if week is not None:
+        conditions.append("(week_mask & ?) != 0")
+        params.append(1 << week)
+    if location:
+        conditions.append("location = ?")
+        params.append(location)
+    if name_prefix:
+        # 用范围条件代替LIKE，可以使用name索引
+        conditions.append("name >= ? AND name < ?")
+        params.extend([name_prefix, name_prefix + "\U0010ffff"])
+    if after is not None:
+        conditions.append("(day_of_week, start_time, id) > (?, ?, ?)")
+        params.extend(after)
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
     conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute(
-        """
+        f"""
+        SELECT * FROM courses
+        {where}
+        ORDER BY day_of_week, start_time, id
+        LIMIT ?
+    """,
+        params + [limit + 1],
+    )
+    courses = [dict(course) for course in cursor.fetchall()]
+    conn.close()
+
+    # 多取一条判断是否还有下一页
+    next_after = None
+    if len(courses) > limit:
+        courses = courses[:limit]
+        last = courses[-1]
+        next_after = (last["day_of_week"], last["start_time"], last["id"])
+
+    return courses, next_after
+
+
+def iter_courses(batch_size=500, user_id=None):
+    """
+    逐批读取所有课程（生成器），避免一次性加载全部课程到内存
+
+    参数:
+        batch_size: 每批读取的行数
+        user_id: 只读取指定用户的课程，为None时读取全部
+    """
+    conditions, params = _user_filter(user_id)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"SELECT * FROM courses {where} ORDER BY day_of_week, start_time, id",
+            params,
+        )
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield dict(row)
+    finally:
+        conn.close()
+
+
+def get_courses_by_day(day_of_week, user_id=None):
+    """获取指定星期的课程（指定user_id时只返回该用户的课程）"""
+    conditions, params = _user_filter(user_id)
+    conditions.append("day_of_week = ?")
+    params.append(day_of_week)
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        f"""
         SELECT * FROM courses
-        WHERE day_of_week = ?
+        WHERE {" AND ".join(conditions)}
         ORDER BY start_time
     """,
-        (day_of_week,),
+        params,
     )
     courses = cursor.fetchall()
     conn.close()
     return [dict(course) for course in courses]
 
 
-def get_active_courses_by_day(day_of_week, current_week):
-    """获取指定星期且在当前周有课的课程"""
-    from utils.week_utils import is_course_active
+def get_courses_by_week(week, user_id=None):
+    """获取指定教学周有课的全部课程（按周次位掩码筛选）"""
+    conditions, params = _user_filter(user_id)
+    conditions.append("(week_mask & ?) != 0")
+    params.append(1 << week)
 
     conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute(
-        """
+        f"""
         SELECT * FROM courses
-        WHERE day_of_week = ?
-        ORDER BY start_time
+        WHERE {" AND ".join(conditions)}
+        ORDER BY day_of_week, start_time, id
     """,
-        (day_of_week,),
+        params,
     )
     courses = cursor.fetchall()
     conn.close()
+    return [dict(course) for course in courses]
+
+
+def get_active_courses_by_day(day_of_week, current_week, user_id=None):
+    """获取指定星期且在当前周有课的课程"""
+    from utils.week_utils import is_course_active
 
     # 过滤出当周有课的课程
     active_courses = [
         course
-        for course in [dict(c) for c in courses]
+        for course in get_courses_by_day(day_of_week, user_id)
         if is_course_active(course.get("week_pattern", "all"), current_week)
     ]
     return active_courses
 
 
 def delete_course(course_id):
-    """删除课程"""
+    """删除课程（同时删除其提醒记录和例外）"""
     conn = get_db_connection()
     cursor = conn.cursor()
+    cursor.execute("DELETE FROM reminders WHERE course_id = ?", (course_id,))
+    cursor.execute("DELETE FROM course_exceptions WHERE course_id = ?", (course_id,))
     cursor.execute("DELETE FROM courses WHERE id = ?", (course_id,))
     conn.commit()
+    bump_data_version()
+    notify_courses_changed([course_id])
+    conn.close()
+
+
+def delete_all_courses(user_id=None):
+    """
+    清空所有课程及提醒记录、课程例外（单个事务）
+
+    参数:
+        user_id: 只清空指定用户的课程，为None时清空全部
+
+    返回:
+        int: 删除的课程数量
+    """
+    conditions, params = _user_filter(user_id)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"DELETE FROM reminders {where}", params)
+    cursor.execute(f"DELETE FROM course_exceptions {where}", params)
+    cursor.execute(f"DELETE FROM courses {where}", params)
+    deleted = cursor.rowcount
+    conn.commit()
+    bump_data_version()
+    notify_courses_changed()
     conn.close()
+    return deleted
 
 
 def update_course(course_id, **kwargs):
@@ -179,94 +1000,786 @@ def update_course(course_id, **kwargs):
     ]
     updates = {k: v for k, v in kwargs.items() if k in allowed_fields}
 
+    # 周次变化时同步更新位掩码
+    if "week_pattern" in updates:
+        updates["week_mask"] = week_pattern_to_mask(updates["week_pattern"])
+
     if updates:
         set_clause = ", ".join([f"{k} = ?" for k in updates.keys()])
         values = list(updates.values()) + [course_id]
         cursor.execute(f"UPDATE courses SET {set_clause} WHERE id = ?", values)
         conn.commit()
+        bump_data_version()
+        notify_courses_changed([course_id])
 
     conn.close()
 
 
-# 配置相关操作
-def get_setting(key, default=None):
-    """获取配置项"""
+# 课程导入同步相关操作
+# 自然键：同一课程名称、星期、开始时间、周次视为同一门课
+COURSE_KEY_FIELDS = ["name", "day_of_week", "start_time", "week_pattern"]
+# 自然键相同时需要比对的字段
+COURSE_SYNC_FIELDS = ["end_time", "location", "remark"]
+
+
+def normalize_course(course):
+    """将课程数据规范化为可比较的字典"""
+    return {
+        "name": str(course.get("name", "")).strip(),
+        "day_of_week": int(course.get("day_of_week")),
+        "start_time": course.get("start_time", ""),
+        "end_time": course.get("end_time", ""),
+        "location": course.get("location") or "",
+        "remark": course.get("remark") or "",
+        "week_pattern": course.get("week_pattern") or "all",
+    }
+
+
+def course_natural_key(course):
+    """获取课程的自然键"""
+    return tuple(course[field] for field in COURSE_KEY_FIELDS)
+
+
+def compute_course_diff(new_courses, user_id=DEFAULT_USER_ID):
+    """
+    计算导入课程与数据库现有课程的差异
+
+    参数:
+        new_courses: 待导入的课程列表
+        user_id: 与该用户的现有课程比对
+
+    返回:
+        dict: {added: 新增课程, changed: 变更课程, removed: 删除课程, unchanged: 未变化数量}
+    """
+    existing_by_key = {}
+    removed = []
+
+    # 数据库中自然键重复的课程（如重复导入产生的）视为多余记录删除
+    for course in get_all_courses(user_id):
+        key = course_natural_key(normalize_course(course))
+        if key in existing_by_key:
+            removed.append(course)
+        else:
+            existing_by_key[key] = course
+
+    added = []
+    changed = []
+    unchanged = 0
+    seen = set()
+
+    for course in new_courses:
+        course = normalize_course(course)
+        key = course_natural_key(course)
+
+        # 文件中重复的行只取第一条
+        if key in seen:
+            continue
+        seen.add(key)
+
+        old = existing_by_key.get(key)
+        if old is None:
+            added.append(course)
+            continue
+
+        changes = {
+            field: {"old": old.get(field) or "", "new": course[field]}
+            for field in COURSE_SYNC_FIELDS
+            if (old.get(field) or "") != course[field]
+        }
+        if changes:
+            changed.append({"id": old["id"], "course": course, "changes": changes})
+        else:
+            unchanged += 1
+
+    removed.extend(
+        course for key, course in existing_by_key.items() if key not in seen
+    )
+
+    return {
+        "user_id": user_id,
+        "added": added,
+        "changed": changed,
+        "removed": removed,
+        "unchanged": unchanged,
+    }
+
+
+def apply_course_diff(diff):
+    """
+    在单个事务中应用课程差异
+
+    参数:
+        diff: compute_course_diff 的返回结果
+
+    返回:
+        list: 新增课程的ID列表
+    """
+    user_id = diff.get("user_id", DEFAULT_USER_ID)
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    added_ids = []
+
+    try:
+        for course in diff["added"]:
+            cursor.execute(
+                """
+                INSERT INTO courses (user_id, name, day_of_week, start_time, end_time, location, remark, week_pattern, week_mask)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+                (
+                    user_id,
+                    course["name"],
+                    course["day_of_week"],
+                    course["start_time"],
+                    course["end_time"],
+                    course["location"],
+                    course["remark"],
+                    course["week_pattern"],
+                    week_pattern_to_mask(course["week_pattern"]),
+                ),
+            )
+            added_ids.append(cursor.lastrowid)
+
+        for item in diff["changed"]:
+            fields = list(item["changes"].keys())
+            set_clause = ", ".join([f"{k} = ?" for k in fields])
+            values = [item["course"][k] for k in fields] + [item["id"]]
+            cursor.execute(f"UPDATE courses SET {set_clause} WHERE id = ?", values)
+
+        removed_ids = [(course["id"],) for course in diff["removed"]]
+        cursor.executemany("DELETE FROM reminders WHERE course_id = ?", removed_ids)
+        cursor.executemany(
+            "DELETE FROM course_exceptions WHERE course_id = ?", removed_ids
+        )
+        cursor.executemany("DELETE FROM courses WHERE id = ?", removed_ids)
+
+        conn.commit()
+        bump_data_version()
+        notify_courses_changed(
+            added_ids
+            + [item["id"] for item in diff["changed"]]
+            + [course["id"] for course in diff["removed"]]
+        )
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    return added_ids
+
+
+# 用户相关操作
+# 用户信息中可以返回的字段（不含API Key）
+USER_COLUMNS = "id, name, created_at"
+
+
+def generate_api_key():
+    """生成用户的API Key"""
+    return secrets.token_urlsafe(24)
+
+
+def add_user(name):
+    """添加用户（同时生成API Key），返回用户ID"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO users (name, api_key) VALUES (?, ?)", (name, generate_api_key())
+    )
+    user_id = cursor.lastrowid
+    conn.commit()
+    bump_data_version()
+    conn.close()
+    return user_id
+
+
+def get_user(user_id):
+    """按ID获取用户，不存在时返回None"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT {USER_COLUMNS} FROM users WHERE id = ?", (user_id,))
+    user = cursor.fetchone()
+    conn.close()
+    return dict(user) if user else None
+
+
+def get_user_by_api_key(api_key):
+    """按API Key获取用户，不存在时返回None"""
+    if not api_key:
+        return None
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT {USER_COLUMNS} FROM users WHERE api_key = ?", (api_key,))
+    user = cursor.fetchone()
+    conn.close()
+    return dict(user) if user else None
+
+
+def get_user_api_key(user_id):
+    """获取用户的API Key（只在添加用户、重置Key时返回给调用方）"""
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("SELECT value FROM settings WHERE key = ?", (key,))
-    result = cursor.fetchone()
+    cursor.execute("SELECT api_key FROM users WHERE id = ?", (user_id,))
+    row = cursor.fetchone()
+    conn.close()
+    return row["api_key"] if row else None
+
+
+def reset_user_api_key(user_id):
+    """
+    重新生成用户的API Key（原Key立即失效）
+
+    返回:
+        str 或 None: 新的API Key，用户不存在时返回None
+    """
+    api_key = generate_api_key()
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("UPDATE users SET api_key = ? WHERE id = ?", (api_key, user_id))
+    updated = cursor.rowcount > 0
+    conn.commit()
+    conn.close()
+    return api_key if updated else None
+
+
+def get_users():
+    """获取所有用户"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT {USER_COLUMNS} FROM users ORDER BY id")
+    users = cursor.fetchall()
+    conn.close()
+    return [dict(user) for user in users]
+
+
+# 配置相关操作
+# 默认用户的配置保存在全局settings表，其他用户保存在user_settings表；
+# 其他用户未设置时只有教学日历和消息格式使用全局配置，推送Token、接收地址等不继承
+INHERITED_SETTING_KEYS = {
+    "semester_start",
+    "total_weeks",
+    "current_week",
+    "week_override",
+    "skip_holidays",
+    "message_format",
+}
+
+
+def _is_other_user(user_id):
+    """是否为默认用户以外的用户"""
+    return user_id is not None and user_id != DEFAULT_USER_ID
+
+
+def get_setting(key, default=None, user_id=None):
+    """获取配置项（指定user_id时优先读取该用户的配置，未设置时只继承允许继承的全局配置）"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    result = None
+    if _is_other_user(user_id):
+        cursor.execute(
+            "SELECT value FROM user_settings WHERE user_id = ? AND key = ?",
+            (user_id, key),
+        )
+        result = cursor.fetchone()
+
+    if result is None and (not _is_other_user(user_id) or key in INHERITED_SETTING_KEYS):
+        cursor.execute("SELECT value FROM settings WHERE key = ?", (key,))
+        result = cursor.fetchone()
+
     conn.close()
     return result["value"] if result else default
 
 
-def set_setting(key, value):
-    """设置配置项"""
+def get_settings(keys, default=None, user_id=None):
+    """
+    一次读取多个配置项（指定user_id时优先使用该用户的配置，未设置时只继承允许继承的全局配置）
+
+    返回:
+        dict: {配置项: 值}，未设置的为default
+    """
+    keys = list(keys)
+    placeholders = ",".join("?" * len(keys))
+    global_keys = (
+        [key for key in keys if key in INHERITED_SETTING_KEYS]
+        if _is_other_user(user_id)
+        else keys
+    )
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    result = {key: default for key in keys}
+    if global_keys:
+        cursor.execute(
+            f"SELECT key, value FROM settings WHERE key IN ({','.join('?' * len(global_keys))})",
+            global_keys,
+        )
+        result.update({row["key"]: row["value"] for row in cursor.fetchall()})
+
+    if _is_other_user(user_id):
+        cursor.execute(
+            f"SELECT key, value FROM user_settings WHERE user_id = ? AND key IN ({placeholders})",
+            [user_id, *keys],
+        )
+        result.update({row["key"]: row["value"] for row in cursor.fetchall()})
+
+    conn.close()
+    return result
+
+
+def get_user_settings(key, default=None):
+    """
+    一次查询所有用户的某个配置项（不允许继承的配置项，未单独设置的用户为default）
+
+    返回:
+        dict: {用户ID: 配置值}
+    """
     conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute(
         """
-        INSERT INTO settings (key, value, updated_at)
-        VALUES (?, ?, ?)
-        ON CONFLICT(key) DO UPDATE SET
-            value = excluded.value,
-            updated_at = excluded.updated_at
+        SELECT u.id, COALESCE(us.value, s.value) AS value
+        FROM users u
+        LEFT JOIN user_settings us ON us.user_id = u.id AND us.key = ? AND u.id != ?
+        LEFT JOIN settings s ON s.key = ? AND (u.id = ? OR ?)
     """,
-        (key, value, datetime.now()),
+        (key, DEFAULT_USER_ID, key, DEFAULT_USER_ID, key in INHERITED_SETTING_KEYS),
     )
+    result = {
+        row["id"]: row["value"] if row["value"] is not None else default
+        for row in cursor.fetchall()
+    }
+    conn.close()
+    return result
+
+
+def get_settings_signature(keys):
+    """
+    配置项的变更标识（所有用户中这些配置的最后修改时间和条数）
+
+    用于发现其他进程（如 set_week.py）写入的配置，标识变化时说明缓存已过期
+
+    返回:
+        tuple: (最后修改时间, 条数)
+    """
+    keys = list(keys)
+    placeholders = ",".join("?" * len(keys))
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        f"""
+        SELECT MAX(updated_at), COUNT(*) FROM (
+            SELECT updated_at FROM settings WHERE key IN ({placeholders})
+            UNION ALL
+            SELECT updated_at FROM user_settings WHERE key IN ({placeholders})
+        )
+    """,
+        keys + keys,
+    )
+    row = cursor.fetchone()
+    conn.close()
+    return tuple(row)
+
+
+def set_setting(key, value, user_id=None):
+    """设置配置项（指定非默认用户时写入该用户的配置）"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    if user_id is not None and user_id != DEFAULT_USER_ID:
+        cursor.execute(
+            """
+            INSERT INTO user_settings (user_id, key, value, updated_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(user_id, key) DO UPDATE SET
+                value = excluded.value,
+                updated_at = excluded.updated_at
+        """,
+            (user_id, key, value, clock.now()),
+        )
+    else:
+        cursor.execute(
+            """
+            INSERT INTO settings (key, value, updated_at)
+            VALUES (?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET
+                value = excluded.value,
+                updated_at = excluded.updated_at
+        """,
+            (key, value, clock.now()),
+        )
     conn.commit()
+    bump_data_version()
     conn.close()
 
+    if user_id == DEFAULT_USER_ID:
+        user_id = None
+    notify_settings_changed(key, user_id)
+
 
 # 提醒记录相关操作
-def add_reminder(course_id, remind_time):
-    """添加提醒记录"""
+# 提醒发件箱状态
+REMINDER_PENDING = "pending"
+REMINDER_CLAIMED = "claimed"
+REMINDER_SENDING = "sending"
+REMINDER_SENT = "sent"
+REMINDER_FAILED = "failed"
+
+
+def reminder_idempotency_key(course_id, remind_time):
+    """
+    生成提醒的幂等键：同一课程同一提醒时间只对应一条提醒
+
+    重复扫描不会产生重复提醒，推送时也作为消息标识传给渠道
+    """
+    if isinstance(remind_time, datetime):
+        remind_time = remind_time.strftime("%Y-%m-%d %H:%M")
+    return f"course-{course_id}@{str(remind_time)[:16]}"
+
+
+def add_reminder(course_id, remind_time, user_id=DEFAULT_USER_ID, exception_id=None):
+    """添加提醒记录（已存在相同提醒时忽略，返回None）"""
     conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute(
         """
-        INSERT INTO reminders (course_id, remind_time, sent)
-        VALUES (?, ?, FALSE)
+        INSERT OR IGNORE INTO reminders
+            (user_id, course_id, remind_time, sent, exception_id, idempotency_key)
+        VALUES (?, ?, ?, FALSE, ?, ?)
     """,
-        (course_id, remind_time),
+        (
+            user_id,
+            course_id,
+            remind_time,
+            exception_id,
+            reminder_idempotency_key(course_id, remind_time),
+        ),
     )
-    reminder_id = cursor.lastrowid
+    reminder_id = cursor.lastrowid if cursor.rowcount else None
     conn.commit()
     conn.close()
     return reminder_id
 
 
+def add_reminders(reminders):
+    """
+    批量添加提醒记录（单个事务，已存在的相同提醒忽略）
+
+    参数:
+        reminders: [(用户ID, 课程ID, 提醒时间, 课程例外ID或None)] 列表
+    """
+    if not reminders:
+        return
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.executemany(
+        """
+        INSERT OR IGNORE INTO reminders
+            (user_id, course_id, remind_time, exception_id, idempotency_key, sent)
+        VALUES (?, ?, ?, ?, ?, FALSE)
+    """,
+        [
+            (
+                user_id,
+                course_id,
+                remind_time,
+                exception_id,
+                reminder_idempotency_key(course_id, remind_time),
+            )
+            for user_id, course_id, remind_time, exception_id in reminders
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+
+# 提醒详情：调课的提醒使用调课后的时间、地点
+REMINDER_DETAIL_SQL = """
+    SELECT r.*, c.name, c.week_pattern,
+        COALESCE(e.new_location, c.location) AS location,
+        COALESCE(e.new_start_time, c.start_time) AS start_time,
+        COALESCE(e.new_end_time, c.end_time) AS end_time
+    FROM reminders r
+    JOIN courses c ON r.course_id = c.id
+    LEFT JOIN course_exceptions e ON r.exception_id = e.id
+"""
+
+
+def count_reminders_by_status():
+    """
+    按状态统计提醒数量
+
+    返回:
+        dict: {状态: 数量}
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT status, COUNT(*) FROM reminders GROUP BY status")
+    result = {row[0]: row[1] for row in cursor.fetchall()}
+    conn.close()
+    return result
+
+
 def get_pending_reminders():
     """获取待发送的提醒"""
     conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute(
-        """
-        SELECT r.*, c.name, c.location, c.start_time, c.end_time, c.week_pattern
-        FROM reminders r
-        JOIN courses c ON r.course_id = c.id
-        WHERE r.sent = FALSE AND r.remind_time <= ?
+        REMINDER_DETAIL_SQL
+        + """
+        WHERE r.status = ? AND r.remind_time <= ?
+        ORDER BY r.user_id, r.remind_time
     """,
-        (datetime.now(),),
+        (REMINDER_PENDING, clock.now()),
     )
     reminders = cursor.fetchall()
     conn.close()
     return [dict(r) for r in reminders]
 
 
-def mark_reminder_sent(reminder_id):
-    """标记提醒为已发送"""
+def claim_reminders(worker_id, limit=50, lease_seconds=120):
+    """
+    领取到期的提醒（单条UPDATE ... RETURNING，多个发送进程并发领取也不会重复）
+
+    待发送的提醒（失败重试需等待退避时间），以及租约已过期的已领取提醒（发送进程中途退出）都可以被领取；
+    发送中的提醒不会被重新领取（结果未知，见 fail_stale_sending_reminders）
+
+    参数:
+        worker_id: 发送进程标识
+        limit: 最多领取数量
+        lease_seconds: 租约时长（秒），超时未完成的提醒可被重新领取
+
+    返回:
+        list: 领取到的提醒详情（按用户、提醒时间排序）
+    """
+    now = clock.now()
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            """
+            UPDATE reminders
+            SET status = ?, claimed_by = ?, lease_until = ?, attempts = attempts + 1
+            WHERE id IN (
+                SELECT id FROM reminders
+                WHERE remind_time <= ?
+                    AND status IN (?, ?)
+                    AND (lease_until IS NULL OR lease_until < ?)
+                ORDER BY remind_time
+                LIMIT ?
+            )
+            RETURNING id
+        """,
+            (
+                REMINDER_CLAIMED,
+                worker_id,
+                now + timedelta(seconds=lease_seconds),
+                now,
+                REMINDER_PENDING,
+                REMINDER_CLAIMED,
+                now,
+                limit,
+            ),
+        )
+        claimed_ids = [row[0] for row in cursor.fetchall()]
+        conn.commit()
+
+        if not claimed_ids:
+            return []
+
+        placeholders = ", ".join("?" * len(claimed_ids))
+        cursor.execute(
+            REMINDER_DETAIL_SQL
+            + f"""
+            WHERE r.id IN ({placeholders}) AND r.claimed_by = ?
+            ORDER BY r.user_id, r.remind_time
+        """,
+            claimed_ids + [worker_id],
+        )
+        return [dict(r) for r in cursor.fetchall()]
+    finally:
+        conn.close()
+
+
+def delete_pending_reminders(course_id):
+    """删除课程尚未发送的提醒（课程例外变化后重新生成）"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        "DELETE FROM reminders WHERE course_id = ? AND status = ?",
+        (course_id, REMINDER_PENDING),
+    )
+    conn.commit()
+    conn.close()
+
+
+def mark_reminder_sending(reminder_id, worker_id, lease_seconds):
+    """
+    开始发送前把提醒标记为发送中，并把租约续期到覆盖整次发送
+
+    只有仍持有未过期租约的发送进程才能标记成功；标记失败说明租约已过期
+    （可能已被其他进程重新领取），此时不能发送
+
+    参数:
+        reminder_id: 提醒ID
+        worker_id: 领取该提醒的发送进程
+        lease_seconds: 发送租约时长（秒），应覆盖所有渠道依次超时的情况
+
+    返回:
+        bool: 是否仍持有租约并已标记为发送中
+    """
+    now = clock.now()
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        UPDATE reminders
+        SET status = ?, lease_until = ?
+        WHERE id = ? AND claimed_by = ? AND status = ? AND lease_until >= ?
+    """,
+        (
+            REMINDER_SENDING,
+            now + timedelta(seconds=lease_seconds),
+            reminder_id,
+            worker_id,
+            REMINDER_CLAIMED,
+            now,
+        ),
+    )
+    updated = cursor.rowcount > 0
+    conn.commit()
+    conn.close()
+    return updated
+
+
+def fail_stale_sending_reminders(error="发送中断，结果未知，不再重试"):
+    """
+    处理发送租约已过期的发送中提醒（发送进程在发送过程中退出）
+
+    这类提醒可能已经送达，重新发送会重复推送，因此直接标记为失败而不是重试
+
+    返回:
+        list: 被标记为失败的提醒ID
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        UPDATE reminders
+        SET status = ?, lease_until = NULL, claimed_by = NULL, last_error = ?
+        WHERE status = ? AND lease_until < ?
+        RETURNING id
+    """,
+        (REMINDER_FAILED, error, REMINDER_SENDING, clock.now()),
+    )
+    failed_ids = [row[0] for row in cursor.fetchall()]
+    conn.commit()
+    conn.close()
+    return failed_ids
+
+
+def mark_reminder_sent(reminder_id, worker_id=None):
+    """
+    标记提醒为已发送
+
+    参数:
+        reminder_id: 提醒ID
+        worker_id: 发送该提醒的进程；指定时只有仍持有发送中的提醒才更新
+
+    返回:
+        bool: 是否更新成功
+    """
+    conditions = ["id = ?"]
+    params = [REMINDER_SENT, clock.now(), reminder_id]
+    if worker_id is not None:
+        conditions.append("claimed_by = ? AND status = ?")
+        params.extend([worker_id, REMINDER_SENDING])
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        f"""
+        UPDATE reminders
+        SET status = ?, sent = TRUE, sent_at = ?, lease_until = NULL
+        WHERE {" AND ".join(conditions)}
+    """,
+        params,
+    )
+    updated = cursor.rowcount > 0
+    conn.commit()
+    conn.close()
+    return updated
+
+
+def mark_reminder_failed(
+    reminder_id, worker_id, error, max_attempts=3, retry_seconds=60
+):
+    """
+    发送失败：未超过最大尝试次数时放回待发送（等待retry_seconds后重试），否则标记为失败
+
+    返回:
+        str: 更新后的状态，不再持有租约时返回None
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        UPDATE reminders
+        SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END,
+            lease_until = CASE WHEN attempts >= ? THEN NULL ELSE ? END,
+            last_error = ?, claimed_by = NULL
+        WHERE id = ? AND claimed_by = ? AND status IN (?, ?)
+        RETURNING status
+    """,
+        (
+            max_attempts,
+            REMINDER_FAILED,
+            REMINDER_PENDING,
+            max_attempts,
+            clock.now() + timedelta(seconds=retry_seconds),
+            str(error),
+            reminder_id,
+            worker_id,
+            REMINDER_CLAIMED,
+            REMINDER_SENDING,
+        ),
+    )
+    row = cursor.fetchone()
+    conn.commit()
+    conn.close()
+    return row[0] if row else None
+
+
+def defer_reminder(reminder_id, worker_id, error, delay_seconds):
+    """
+    推迟发送：放回待发送并等待delay_seconds，不计入尝试次数（用于推送渠道熔断期间）
+
+    返回:
+        bool: 是否仍持有租约并已放回
+    """
     conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute(
         """
-        UPDATE reminders 
-        SET sent = TRUE, sent_at = ? 
-        WHERE id = ?
+        UPDATE reminders
+        SET status = ?, lease_until = ?, last_error = ?, claimed_by = NULL,
+            attempts = MAX(attempts - 1, 0)
+        WHERE id = ? AND claimed_by = ? AND status IN (?, ?)
     """,
-        (datetime.now(), reminder_id),
+        (
+            REMINDER_PENDING,
+            clock.now() + timedelta(seconds=delay_seconds),
+            str(error),
+            reminder_id,
+            worker_id,
+            REMINDER_CLAIMED,
+            REMINDER_SENDING,
+        ),
     )
+    deferred = cursor.rowcount > 0
     conn.commit()
     conn.close()
+    return deferred
 
 
 def clear_old_reminders(days=7):
@@ -276,8 +1789,189 @@ def clear_old_reminders(days=7):
     cursor.execute(
         """
         DELETE FROM reminders 
-        WHERE remind_time < datetime('now', '-{} days')
-    """.format(days)
+        WHERE remind_time < ?
+    """,
+        (clock.now() - timedelta(days=days),),
+    )
+    conn.commit()
+    conn.close()
+
+
+# 课程例外相关操作
+COURSE_EXCEPTION_FIELDS = [
+    "date",
+    "action",
+    "new_date",
+    "new_start_time",
+    "new_end_time",
+    "new_location",
+    "reason",
+]
+
+
+def add_course_exception(course_id, date, action, user_id=DEFAULT_USER_ID, **fields):
+    """
+    添加课程例外
+
+    参数:
+        course_id: 课程ID
+        date: 受影响的上课日期（YYYY-MM-DD）
+        action: cancel（停课）/ reschedule（调课）
+        user_id: 课程所属用户
+        fields: new_date、new_start_time、new_end_time、new_location、reason
+
+    返回:
+        int: 例外ID（同一课程同一天已有例外时抛出 sqlite3.IntegrityError）
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            """
+            INSERT INTO course_exceptions
+                (user_id, course_id, date, action, new_date, new_start_time, new_end_time, new_location, reason)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+            (
+                user_id,
+                course_id,
+                date,
+                action,
+                fields.get("new_date"),
+                fields.get("new_start_time"),
+                fields.get("new_end_time"),
+                fields.get("new_location"),
+                fields.get("reason") or "",
+            ),
+        )
+        exception_id = cursor.lastrowid
+        conn.commit()
+    finally:
+        conn.close()
+
+    bump_data_version()
+    return exception_id
+
+
+def get_course_exception(exception_id, user_id=None):
+    """按ID获取课程例外，不存在（或不属于指定用户）时返回None"""
+    conditions, params = _user_filter(user_id)
+    conditions.insert(0, "id = ?")
+    params.insert(0, exception_id)
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        f"SELECT * FROM course_exceptions WHERE {' AND '.join(conditions)}", params
+    )
+    exception = cursor.fetchone()
+    conn.close()
+    return dict(exception) if exception else None
+
+
+def get_course_exceptions(user_id=None, course_id=None, start_date=None, end_date=None):
+    """
+    查询课程例外
+
+    参数:
+        user_id: 按用户筛选
+        course_id: 按课程筛选
+        start_date: 起始日期（含），按原上课日期或调入日期筛选
+        end_date: 结束日期（含）
+
+    返回:
+        list: 例外列表（附带课程名称）
+    """
+    conditions, params = _user_filter(user_id, "e.user_id")
+    if course_id is not None:
+        conditions.append("e.course_id = ?")
+        params.append(course_id)
+    if start_date:
+        conditions.append("(e.date >= ? OR e.new_date >= ?)")
+        params.extend([start_date, start_date])
+    if end_date:
+        conditions.append("(e.date <= ? OR e.new_date <= ?)")
+        params.extend([end_date, end_date])
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        f"""
+        SELECT e.*, c.name AS course_name
+        FROM course_exceptions e
+        JOIN courses c ON c.id = e.course_id
+        {where}
+        ORDER BY e.date, e.id
+    """,
+        params,
+    )
+    exceptions = cursor.fetchall()
+    conn.close()
+    return [dict(e) for e in exceptions]
+
+
+def get_exceptions_for_date(date):
+    """
+    一次查询取出与指定日期有关的全部课程例外（所有用户）
+
+    包括原定在该日期上课的（停课、调走）和调课到该日期的，按 (date, course_id) 和 new_date 索引查询
+
+    参数:
+        date: 日期（YYYY-MM-DD）
+
+    返回:
+        list: 例外列表（附带课程信息，字段名以 course_ 开头）
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        SELECT e.*, c.name AS course_name, c.start_time AS course_start_time,
+            c.end_time AS course_end_time, c.location AS course_location,
+            c.remark AS course_remark, c.week_pattern AS course_week_pattern
+        FROM course_exceptions e
+        JOIN courses c ON c.id = e.course_id
+        WHERE e.date = ? OR e.new_date = ?
+    """,
+        (date, date),
+    )
+    exceptions = cursor.fetchall()
+    conn.close()
+    return [dict(e) for e in exceptions]
+
+
+def update_course_exception(exception_id, **kwargs):
+    """更新课程例外（日期与已有例外重复时抛出 sqlite3.IntegrityError）"""
+    updates = {k: v for k, v in kwargs.items() if k in COURSE_EXCEPTION_FIELDS}
+    if not updates:
+        return
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    set_clause = ", ".join([f"{k} = ?" for k in updates.keys()])
+    try:
+        cursor.execute(
+            f"UPDATE course_exceptions SET {set_clause} WHERE id = ?",
+            list(updates.values()) + [exception_id],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+    bump_data_version()
+
+
+def delete_course_exception(exception_id):
+    """删除课程例外（同时删除关联的提醒）"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        "DELETE FROM reminders WHERE exception_id = ? AND status = 'pending'",
+        (exception_id,),
     )
+    cursor.execute("DELETE FROM course_exceptions WHERE id = ?", (exception_id,))
     conn.commit()
+    bump_data_version()
     conn.close()
@@ -3,14 +3,26 @@
 Excel解析模块 - 使用openpyxl（不依赖pandas）
 """
 
+import csv
+import io
 from openpyxl import load_workbook
 from datetime import datetime
 
+from utils.week_utils import validate_week_pattern
 
-def parse_excel(file_path):
+
+# 进度回调的间隔行数
+PROGRESS_INTERVAL = 500
+
+
+def parse_excel(file_path, progress_callback=None):
     """
     解析Excel文件，提取课程信息
 
+    参数:
+        file_path: Excel文件路径
+        progress_callback: 进度回调函数 callback(已解析行数, 总行数)，可选
+
     支持的列名：
     - 课程名称/课程名/课程/科目/name
     - 星期/周几/星期几/day
@@ -18,6 +30,7 @@ def parse_excel(file_path):
     - 结束时间/下课时间/end_time
     - 地点/教室/位置/location
     - 备注/说明/备注信息/remark
+    - 周次/上课周次/week_pattern（可选，默认每周）
     """
     try:
         # 加载Excel文件
@@ -29,66 +42,128 @@ def parse_excel(file_path):
         for cell in ws[1]:
             headers.append(str(cell.value).strip() if cell.value else "")
 
-        # 标准化列名映射
-        column_mapping = {}
-        for idx, col in enumerate(headers, 1):
-            col_str = str(col).lower().strip()
-            if any(keyword in col_str for keyword in ["课程", "科目", "name"]):
-                column_mapping[idx] = "name"
-            elif any(keyword in col_str for keyword in ["星期", "周几", "day"]):
-                column_mapping[idx] = "day_of_week"
-            elif any(keyword in col_str for keyword in ["开始", "起始", "start"]):
-                column_mapping[idx] = "start_time"
-            elif any(keyword in col_str for keyword in ["结束", "下课", "end"]):
-                column_mapping[idx] = "end_time"
-            elif any(
-                keyword in col_str for keyword in ["地点", "教室", "位置", "location"]
-            ):
-                column_mapping[idx] = "location"
-            elif any(keyword in col_str for keyword in ["备注", "说明", "remark"]):
-                column_mapping[idx] = "remark"
-
-        # 检查必需列
-        required_fields = ["name", "day_of_week", "start_time", "end_time"]
-        found_fields = [v for v in column_mapping.values()]
-        missing_fields = [f for f in required_fields if f not in found_fields]
-
-        if missing_fields:
-            return {
-                "success": False,
-                "error": f"缺少必需列: {', '.join(missing_fields)}。请确保Excel包含：课程名称、星期、开始时间、结束时间",
-            }
-
-        courses = []
-        errors = []
-
-        # 解析每一行数据
-        for row_idx, row in enumerate(
-            ws.iter_rows(min_row=2, values_only=True), start=2
-        ):
-            try:
-                row_data = {}
-                for col_idx, value in enumerate(row, 1):
-                    if col_idx in column_mapping:
-                        row_data[column_mapping[col_idx]] = value
-
-                course = parse_course_row(row_data)
-                if course:
-                    courses.append(course)
-            except Exception as e:
-                errors.append(f"第{row_idx}行解析失败: {str(e)}")
+        result = parse_rows(
+            headers,
+            ws.iter_rows(min_row=2, values_only=True),
+            max(ws.max_row - 1, 0),
+            progress_callback,
+        )
 
         wb.close()
+        return result
+
+    except Exception as e:
+        return {"success": False, "error": f"Excel文件解析失败: {str(e)}"}
+
+
+def parse_csv(file_path, progress_callback=None):
+    """
+    解析CSV文件，提取课程信息（列名规则与Excel相同）
+
+    参数:
+        file_path: CSV文件路径
+        progress_callback: 进度回调函数 callback(已解析行数, 总行数)，可选
+    """
+    try:
+        # 先统计行数用于进度显示
+        with open(file_path, "r", encoding="utf-8-sig", newline="") as f:
+            total_rows = max(sum(1 for _ in csv.reader(f)) - 1, 0)
+
+        with open(file_path, "r", encoding="utf-8-sig", newline="") as f:
+            reader = csv.reader(f)
+            headers = [col.strip() for col in next(reader, [])]
+            return parse_rows(headers, reader, total_rows, progress_callback)
+
+    except Exception as e:
+        return {"success": False, "error": f"CSV文件解析失败: {str(e)}"}
+
+
+def map_columns(headers):
+    """
+    根据表头生成列映射
+
+    返回:
+        dict: {列序号(从1开始): 字段名}
+    """
+    column_mapping = {}
+    for idx, col in enumerate(headers, 1):
+        col_str = str(col).lower().strip()
+        if any(keyword in col_str for keyword in ["课程", "科目", "name"]):
+            column_mapping[idx] = "name"
+        elif any(keyword in col_str for keyword in ["星期", "周几", "day"]):
+            column_mapping[idx] = "day_of_week"
+        elif any(keyword in col_str for keyword in ["开始", "起始", "start"]):
+            column_mapping[idx] = "start_time"
+        elif any(keyword in col_str for keyword in ["结束", "下课", "end"]):
+            column_mapping[idx] = "end_time"
+        elif any(
+            keyword in col_str for keyword in ["地点", "教室", "位置", "location"]
+        ):
+            column_mapping[idx] = "location"
+        elif any(keyword in col_str for keyword in ["备注", "说明", "remark"]):
+            column_mapping[idx] = "remark"
+        elif any(keyword in col_str for keyword in ["周次", "week"]):
+            column_mapping[idx] = "week_pattern"
+
+    return column_mapping
+
+
+def parse_rows(headers, rows, total_rows, progress_callback=None):
+    """
+    按表头解析数据行
+
+    参数:
+        headers: 表头列表
+        rows: 数据行迭代器（不含表头）
+        total_rows: 数据总行数（用于进度回调）
+        progress_callback: 进度回调函数，可选
+
+    返回:
+        dict: 解析结果
+    """
+    # 标准化列名映射
+    column_mapping = map_columns(headers)
 
+    # 检查必需列
+    required_fields = ["name", "day_of_week", "start_time", "end_time"]
+    found_fields = [v for v in column_mapping.values()]
+    missing_fields = [f for f in required_fields if f not in found_fields]
+
+    if missing_fields:
         return {
-            "success": True,
-            "courses": courses,
-            "count": len(courses),
-            "errors": errors,
+            "success": False,
+            "error": f"缺少必需列: {', '.join(missing_fields)}。请确保Excel包含：课程名称、星期、开始时间、结束时间",
         }
 
-    except Exception as e:
-        return {"success": False, "error": f"Excel文件解析失败: {str(e)}"}
+    courses = []
+    errors = []
+
+    # 解析每一行数据
+    for row_idx, row in enumerate(rows, start=2):
+        try:
+            row_data = {}
+            for col_idx, value in enumerate(row, 1):
+                if col_idx in column_mapping:
+                    row_data[column_mapping[col_idx]] = value
+
+            course = parse_course_row(row_data)
+            if course:
+                courses.append(course)
+        except Exception as e:
+            errors.append(f"第{row_idx}行解析失败: {str(e)}")
+
+        if progress_callback and (row_idx - 1) % PROGRESS_INTERVAL == 0:
+            progress_callback(row_idx - 1, total_rows)
+
+    if progress_callback:
+        progress_callback(total_rows, total_rows)
+
+    return {
+        "success": True,
+        "courses": courses,
+        "count": len(courses),
+        "errors": errors,
+    }
 
 
 def parse_course_row(row_data):
@@ -115,6 +190,7 @@ def parse_course_row(row_data):
     # 可选字段
     location = str(row_data.get("location", "") or "").strip()
     remark = str(row_data.get("remark", "") or "").strip()
+    week_pattern = parse_week_pattern_cell(row_data.get("week_pattern"))
 
     return {
         "name": name,
@@ -123,9 +199,31 @@ def parse_course_row(row_data):
         "end_time": end_time,
         "location": location,
         "remark": remark,
+        "week_pattern": week_pattern,
     }
 
 
+def parse_week_pattern_cell(value):
+    """解析周次单元格，空值视为每周"""
+    if value is None:
+        return "all"
+
+    # Excel中的纯数字周次可能被读成浮点数
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+
+    pattern = str(value).strip().replace("，", ",").replace(" ", "")
+    pattern = {"": "all", "每周": "all", "单周": "odd", "双周": "even"}.get(
+        pattern, pattern.lower()
+    )
+
+    is_valid, error_msg = validate_week_pattern(pattern)
+    if not is_valid:
+        raise ValueError(error_msg)
+
+    return pattern
+
+
 def parse_day_of_week(value):
     """解析星期"""
     if value is None:
@@ -244,7 +342,7 @@ def generate_template():
     ws.title = "课程表"
 
     # 设置表头
-    headers = ["课程名称", "星期", "开始时间", "结束时间", "地点", "备注"]
+    headers = ["课程名称", "星期", "开始时间", "结束时间", "地点", "备注", "周次"]
     ws.append(headers)
 
     # 设置表头样式
@@ -260,9 +358,9 @@ def generate_template():
 
     # 添加示例数据
     examples = [
-        ["高等数学", "周一", "08:00", "09:40", "教学楼A101", "带教材"],
-        ["大学英语", "2", "14:00", "15:40", "教学楼B203", "准备演讲"],
-        ["计算机基础", "周三", "10:00", "11:40", "实验楼C305", "实验报告"],
+        ["高等数学", "周一", "08:00", "09:40", "教学楼A101", "带教材", "all"],
+        ["大学英语", "2", "14:00", "15:40", "教学楼B203", "准备演讲", "1-16"],
+        ["计算机基础", "周三", "10:00", "11:40", "实验楼C305", "实验报告", "单周"],
     ]
 
     for example in examples:
@@ -275,6 +373,7 @@ def generate_template():
     ws.column_dimensions["D"].width = 12
     ws.column_dimensions["E"].width = 18
     ws.column_dimensions["F"].width = 15
+    ws.column_dimensions["G"].width = 12
 
     # 添加边框
     thin_border = Border(
@@ -291,3 +390,12 @@ def generate_template():
             cell.border = thin_border
 
     return wb
+
+
+def build_template_bytes():
+    """生成Excel模板并序列化为xlsx字节内容"""
+    wb = generate_template()
+
+    output = io.BytesIO()
+    wb.save(output)
+    return output.getvalue()
@@ -4,10 +4,17 @@
 """
 
 import json
-from datetime import datetime
+import threading
+from datetime import datetime, timedelta
 from config import HOLIDAYS_PATH
+from utils import clock
 import os
 
+# 年度上课日表缓存 {年份: {日期: (实际按星期几上课 或 None, 指定教学周 或 None)}}
+_year_tables = {}
+_year_tables_mtime = None
+_year_tables_lock = threading.Lock()
+
 
 def load_holidays():
     """加载节假日数据"""
@@ -21,18 +28,19 @@ def load_holidays():
         return {}
 
 
-def is_holiday(date=None):
+def is_holiday(date=None, holidays_data=None):
     """
     检查指定日期是否为节假日
 
     参数:
         date: datetime对象或日期字符串(YYYY-MM-DD)，默认为今天
+        holidays_data: 已加载的节假日数据，批量检查时传入可避免重复读取文件
 
     返回:
         bool: 是否为节假日
     """
     if date is None:
-        date = datetime.now()
+        date = clock.now()
 
     # 统一转换为日期字符串
     if isinstance(date, datetime):
@@ -41,15 +49,16 @@ def is_holiday(date=None):
         date_str = str(date)
 
     year = date_str[:4]
-    holidays_data = load_holidays()
+    if holidays_data is None:
+        holidays_data = load_holidays()
 
     # 获取当年的节假日和调休工作日
     year_data = holidays_data.get(year, {})
     holidays = year_data.get("holidays", [])
     workdays = year_data.get("workdays", [])
 
-    # 如果是调休工作日，返回False（不是节假日）
-    if date_str in workdays:
+    # 如果是调休工作日（包括按其他星期上课的调休日），返回False（不是节假日）
+    if date_str in workdays or date_str in year_data.get("makeup", {}):
         return False
 
     # 如果是节假日，返回True
@@ -66,10 +75,109 @@ def is_holiday(date=None):
     return False
 
 
+def parse_makeup_entry(entry):
+    """
+    解析调休上课安排
+
+    支持两种写法：
+        "2025-09-28": 5                      按周五的课表上课
+        "2025-09-28": {"weekday": 5, "week": 3}  按第3周周五的课表上课
+
+    返回:
+        tuple: (星期 1-7, 教学周 或 None)，格式不正确时返回None
+    """
+    if isinstance(entry, dict):
+        weekday = entry.get("weekday")
+        week = entry.get("week")
+    else:
+        weekday, week = entry, None
+
+    try:
+        weekday = int(weekday)
+        week = int(week) if week is not None else None
+    except (TypeError, ValueError):
+        return None
+
+    if not 1 <= weekday <= 7 or (week is not None and week < 1):
+        return None
+    return weekday, week
+
+
+def build_year_table(year, holidays_data):
+    """
+    生成一年中每天实际按哪天的课表上课
+
+    返回:
+        dict: {日期: (星期 或 None, 教学周 或 None)}，星期为None表示放假
+    """
+    makeup = holidays_data.get(str(year), {}).get("makeup", {})
+
+    table = {}
+    date = datetime(year, 1, 1)
+    while date.year == year:
+        date_str = date.strftime("%Y-%m-%d")
+
+        mapping = parse_makeup_entry(makeup[date_str]) if date_str in makeup else None
+        if mapping:
+            table[date_str] = mapping
+        elif is_holiday(date_str, holidays_data):
+            table[date_str] = (None, None)
+        else:
+            table[date_str] = (date.isoweekday(), None)
+
+        date += timedelta(days=1)
+
+    return table
+
+
+def _get_year_table(year):
+    """获取年度上课日表（节假日文件修改后自动重建）"""
+    global _year_tables_mtime
+
+    try:
+        mtime = os.path.getmtime(HOLIDAYS_PATH)
+    except OSError:
+        mtime = None
+
+    with _year_tables_lock:
+        if mtime != _year_tables_mtime:
+            _year_tables.clear()
+            _year_tables_mtime = mtime
+
+        table = _year_tables.get(year)
+        if table is None:
+            table = build_year_table(year, load_holidays())
+            _year_tables[year] = table
+
+    return table
+
+
+def get_effective_weekday(date=None):
+    """
+    获取指定日期实际按星期几的课表上课（考虑调休）
+
+    参数:
+        date: datetime对象或日期字符串(YYYY-MM-DD)，默认为今天
+
+    返回:
+        tuple: (星期 1-7 或 None, 教学周 或 None)；星期为None表示放假，
+               教学周不为None表示按指定教学周的课表上课
+    """
+    if date is None:
+        date = clock.now()
+
+    if isinstance(date, datetime):
+        date_str = date.strftime("%Y-%m-%d")
+    else:
+        date_str = str(date)
+
+    return _get_year_table(int(date_str[:4]))[date_str]
+
+
 def get_holiday_name(date=None):
     """获取节假日名称（简化版）"""
     if date is None:
-        date = datetime.now()
+        date = clock.now()
 
     if isinstance(date, datetime):
         date_str = date.strftime("%Y-%m-%d")
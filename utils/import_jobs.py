@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+后台导入任务模块
+上传文件后立即返回任务ID，由后台线程执行解析和入库，前端轮询任务进度
+"""
+
+import os
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.database import (
+    DEFAULT_USER_ID,
+    add_courses,
+    compute_course_diff,
+    apply_course_diff,
+    get_all_courses,
+)
+from utils.conflicts import find_conflicts, format_conflict
+from utils.excel_parser import parse_excel, parse_csv
+
+logger = logging.getLogger(__name__)
+
+# 导入线程池（单线程串行执行，避免多个导入同时写数据库）
+executor = None
+
+# 任务记录 {job_id: job}
+jobs = {}
+jobs_lock = threading.Lock()
+
+# 最多保留的已结束任务数
+MAX_FINISHED_JOBS = 50
+
+
+def _get_executor():
+    """获取导入线程池"""
+    global executor
+
+    if executor is None:
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="import")
+
+    return executor
+
+
+def submit_import_job(
+    file_path, mode="append", dry_run=False, user_id=DEFAULT_USER_ID
+):
+    """
+    提交后台导入任务
+
+    参数:
+        file_path: 已保存的Excel/CSV临时文件路径（任务结束后删除）
+        mode: 导入模式 append/sync
+        dry_run: 同步模式下只计算差异，不写入数据库
+        user_id: 课程导入到该用户
+
+    返回:
+        str: 任务ID
+    """
+    job_id = uuid.uuid4().hex
+
+    with jobs_lock:
+        _prune_jobs()
+        jobs[job_id] = {
+            "id": job_id,
+            "user_id": user_id,
+            "mode": mode,
+            "dry_run": dry_run,
+            "status": "queued",
+            "stage": "queued",
+            "total": 0,
+            "parsed": 0,
+            "processed": 0,
+            "errors": [],
+            "warnings": [],
+            "result": None,
+            "error": None,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+        }
+
+    _get_executor().submit(
+        run_import_job, job_id, file_path, mode, dry_run, user_id
+    )
+    return job_id
+
+
+def get_job(job_id):
+    """
+    获取任务进度
+
+    返回:
+        dict: 任务信息副本，不存在时返回None
+    """
+    with jobs_lock:
+        job = jobs.get(job_id)
+        if job is None:
+            return None
+        job = dict(job, errors=list(job["errors"]), warnings=list(job["warnings"]))
+
+    # 计算耗时和吞吐量（行/秒）
+    started_at = job.pop("started_at")
+    finished_at = job.pop("finished_at")
+    job.pop("created_at")
+
+    elapsed = 0.0
+    if started_at:
+        elapsed = (finished_at or time.time()) - started_at
+
+    job["elapsed"] = round(elapsed, 3)
+    job["rows_per_second"] = round(job["parsed"] / elapsed, 1) if elapsed > 0 else 0.0
+    return job
+
+
+def _update_job(job_id, **fields):
+    """更新任务字段"""
+    with jobs_lock:
+        jobs[job_id].update(fields)
+
+
+def _prune_jobs():
+    """清理过多的已结束任务（调用方需持有锁）"""
+    finished = [
+        job for job in jobs.values() if job["status"] in ("succeeded", "failed")
+    ]
+    if len(finished) <= MAX_FINISHED_JOBS:
+        return
+
+    finished.sort(key=lambda job: job["finished_at"])
+    for job in finished[: len(finished) - MAX_FINISHED_JOBS]:
+        del jobs[job["id"]]
+
+
+def run_import_job(job_id, file_path, mode, dry_run, user_id=DEFAULT_USER_ID):
+    """执行导入任务：解析 -> 入库 -> 刷新今日提醒"""
+    from utils.scheduler import scan_daily_courses
+
+    _update_job(job_id, status="running", stage="parsing", started_at=time.time())
+
+    try:
+        parser = parse_csv if file_path.endswith(".csv") else parse_excel
+        result = parser(
+            file_path,
+            progress_callback=lambda parsed, total: _update_job(
+                job_id, parsed=parsed, total=total
+            ),
+        )
+
+        if not result["success"]:
+            _update_job(
+                job_id,
+                status="failed",
+                stage="failed",
+                error=result["error"],
+                result=result,
+                finished_at=time.time(),
+            )
+            return
+
+        errors = list(result["errors"])
+
+        # 冲突检测：同步模式检查导入后的课表本身，追加模式检查新课程与现有课程
+        if mode == "sync":
+            conflicts = find_conflicts(result["courses"])
+        else:
+            conflicts = find_conflicts(
+                get_all_courses(user_id), candidates=result["courses"]
+            )
+        warnings = [format_conflict(c) for c in conflicts]
+
+        _update_job(job_id, stage="importing", errors=errors, warnings=warnings)
+
+        if mode == "sync":
+            diff = compute_course_diff(result["courses"], user_id)
+            summary = {
+                "added": len(diff["added"]),
+                "changed": len(diff["changed"]),
+                "removed": len(diff["removed"]),
+                "unchanged": diff["unchanged"],
+            }
+
+            if dry_run:
+                job_result = {
+                    "success": True,
+                    "dry_run": True,
+                    "diff": diff,
+                    "summary": summary,
+                    "errors": errors,
+                    "conflicts": conflicts,
+                }
+            else:
+                added_ids = apply_course_diff(diff)
+                _update_job(job_id, processed=len(result["courses"]))
+
+                # 只为新增课程创建今日提醒
+                if added_ids:
+                    _update_job(job_id, stage="scanning")
+                    scan_daily_courses(course_ids=added_ids)
+
+                job_result = {
+                    "success": True,
+                    "mode": "sync",
+                    "summary": summary,
+                    "count": summary["added"] + summary["changed"],
+                    "errors": errors,
+                    "conflicts": conflicts,
+                }
+        else:
+            added_ids, insert_errors = add_courses(
+                result["courses"],
+                progress_callback=lambda processed: _update_job(
+                    job_id, processed=processed
+                ),
+                user_id=user_id,
+            )
+            errors.extend(insert_errors)
+
+            # 刷新今日课程提醒
+            _update_job(job_id, stage="scanning", errors=errors)
+            scan_daily_courses(course_ids=added_ids)
+
+            job_result = {
+                "success": True,
+                "mode": "append",
+                "count": len(added_ids),
+                "errors": errors,
+                "conflicts": conflicts,
+            }
+
+        _update_job(
+            job_id,
+            status="succeeded",
+            stage="done",
+            errors=errors,
+            result=job_result,
+            finished_at=time.time(),
+        )
+        logger.info(f"导入任务 {job_id} 完成，共处理 {len(result['courses'])} 门课程")
+
+    except Exception as e:
+        logger.error(f"导入任务 {job_id} 失败: {str(e)}")
+        _update_job(
+            job_id,
+            status="failed",
+            stage="failed",
+            error=f"处理文件失败: {str(e)}",
+            finished_at=time.time(),
+        )
+    finally:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+
+def shutdown_import_jobs():
+    """关闭导入线程池"""
+    global executor
+    if executor:
+        executor.shutdown(wait=False)
+        executor = None
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+提醒消息模板模块
+启动时编译HTML和Markdown两种模板，同一课程同一周次的提醒只渲染一次
+"""
+
+import os
+from functools import lru_cache
+
+from jinja2 import Environment, FileSystemLoader
+
+from config import BASE_DIR, MESSAGE_TEMPLATE_DIR, MESSAGE_CACHE_SIZE
+from utils.week_utils import get_week_description
+
+# 消息格式 -> (模板文件, 推送模板类型)
+MESSAGE_FORMATS = {
+    "html": ("reminder.html", "html"),
+    "markdown": ("reminder.md", "markdown"),
+}
+DEFAULT_MESSAGE_FORMAT = "html"
+
+_env = Environment(
+    loader=FileSystemLoader(
+        [MESSAGE_TEMPLATE_DIR, os.path.join(BASE_DIR, "templates", "messages")]
+    ),
+    autoescape=lambda name: bool(name) and name.endswith(".html"),
+    trim_blocks=True,
+    lstrip_blocks=True,
+)
+
+# 启动时编译全部模板
+_templates = {
+    fmt: _env.get_template(name) for fmt, (name, _) in MESSAGE_FORMATS.items()
+}
+
+
+def _urgency(minutes_before):
+    """提醒标题和紧急程度文字"""
+    if minutes_before == 15:
+        return "📚 课程提醒（15分钟后）", "还有15分钟上课"
+    if minutes_before == 5:
+        return "🚨 紧急提醒（5分钟后）", "还有5分钟上课！"
+    return "📚 课程提醒", f"还有{minutes_before}分钟上课"
+
+
+def parse_message_format(value):
+    """解析消息格式配置，无效时使用默认格式"""
+    return value if value in MESSAGE_FORMATS else DEFAULT_MESSAGE_FORMAT
+
+
+@lru_cache(maxsize=MESSAGE_CACHE_SIZE)
+def _render(fmt, minutes_before, current_week, course_id, course_items):
+    """
+    渲染提醒消息（按格式、提前分钟数、周次和课程内容缓存）
+
+    course_id 区分同名课程；课程内容（含调课后的时间地点）也作为缓存键，修改后自动重新渲染
+    """
+    course = dict(course_items)
+    title, urgency = _urgency(minutes_before)
+    week_info = f"第{current_week}周" if current_week else ""
+    if week_info:
+        title = f"{title} - {week_info}"
+
+    content = _templates[fmt].render(
+        course=course,
+        urgency=urgency,
+        week_info=week_info,
+        pattern_desc=get_week_description(course.get("week_pattern") or "all"),
+    )
+    return title, content
+
+
+def render_course_reminder(course, minutes_before, current_week, fmt=None):
+    """
+    生成课程提醒消息
+
+    参数:
+        course: 课程信息字典
+        minutes_before: 提前多少分钟
+        current_week: 当前教学周
+        fmt: 消息格式（html/markdown），默认html
+
+    返回:
+        dict: {"title", "content", "template"}
+    """
+    fmt = parse_message_format(fmt)
+    course_items = tuple(
+        (key, course.get(key))
+        for key in ("name", "start_time", "end_time", "location", "remark", "week_pattern")
+    )
+    title, content = _render(
+        fmt, minutes_before, current_week, course.get("id"), course_items
+    )
+    return {"title": title, "content": content, "template": MESSAGE_FORMATS[fmt][1]}
+
+
+def get_render_cache_info():
+    """渲染缓存命中情况"""
+    info = _render.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "size": info.currsize}
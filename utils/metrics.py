@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+运行指标模块
+记录定时任务耗时、提醒队列长度、送达延迟、推送渠道耗时和错误、数据库查询耗时，
+以Prometheus文本格式从 /metrics 输出（不依赖第三方库）
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+
+from utils.database import (
+    REMINDER_CLAIMED,
+    REMINDER_PENDING,
+    REMINDER_SENDING,
+    count_reminders_by_status,
+    register_query_listener,
+)
+
+# 指标定义 {名称: {type, help, buckets}}
+_metrics = {}
+# 计数器和直方图的取值 {名称: {标签元组: 值}}
+_values = {}
+# 采集时计算的指标 {名称: callback() -> {标签元组: 值}}
+_gauge_callbacks = {}
+_lock = threading.Lock()
+
+# 默认直方图区间（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def register_counter(name, help_text):
+    """注册计数器"""
+    _metrics[name] = {"type": "counter", "help": help_text}
+    _values.setdefault(name, {})
+
+
+def register_histogram(name, help_text, buckets=DEFAULT_BUCKETS):
+    """注册直方图"""
+    _metrics[name] = {"type": "histogram", "help": help_text, "buckets": tuple(buckets)}
+    _values.setdefault(name, {})
+
+
+def register_gauge(name, help_text, callback):
+    """
+    注册采集时计算的指标
+
+    参数:
+        callback: 返回 {标签元组: 值} 的函数，标签元组形如 (("status", "pending"),)
+    """
+    _metrics[name] = {"type": "gauge", "help": help_text}
+    _gauge_callbacks[name] = callback
+
+
+def _label_key(labels):
+    """标签字典转换为可哈希的元组"""
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def inc_counter(name, labels=None, value=1):
+    """计数器加value"""
+    key = _label_key(labels)
+    with _lock:
+        series = _values[name]
+        series[key] = series.get(key, 0) + value
+
+
+def observe(name, value, labels=None):
+    """直方图记录一次观测值"""
+    buckets = _metrics[name]["buckets"]
+    index = bisect_left(buckets, value)
+    key = _label_key(labels)
+    with _lock:
+        series = _values[name].get(key)
+        if series is None:
+            # [各区间计数（最后一项为+Inf）, 总和, 次数]
+            series = _values[name][key] = [[0] * (len(buckets) + 1), 0.0, 0]
+        series[0][index] += 1
+        series[1] += value
+        series[2] += 1
+
+
+def timed_job(job_id, func):
+    """包装定时任务，记录每次执行耗时和失败次数"""
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            inc_counter("scheduler_job_failures_total", {"job": job_id})
+            raise
+        finally:
+            observe(
+                "scheduler_job_duration_seconds",
+                time.perf_counter() - started,
+                {"job": job_id},
+            )
+
+    return wrapper
+
+
+def _escape(value):
+    """转义标签值中的反斜杠、引号和换行"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key, extra=None):
+    """格式化标签 {a="x",b="y"}"""
+    items = list(key) + (extra or [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in items) + "}"
+
+
+def _format_value(value):
+    """格式化数值"""
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+def render_metrics():
+    """
+    生成Prometheus文本格式的全部指标
+
+    返回:
+        str: 指标文本
+    """
+    with _lock:
+        snapshot = {
+            name: {
+                key: [list(value[0]), value[1], value[2]]
+                if isinstance(value, list)
+                else value
+                for key, value in series.items()
+            }
+            for name, series in _values.items()
+        }
+
+    lines = []
+    for name, metric in _metrics.items():
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+
+        if metric["type"] == "gauge":
+            try:
+                series = _gauge_callbacks[name]()
+            except Exception:
+                series = {}
+            for key, value in series.items():
+                lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+
+        elif metric["type"] == "counter":
+            for key, value in snapshot[name].items():
+                lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+
+        else:
+            bounds = [str(bound) for bound in metric["buckets"]] + ["+Inf"]
+            for key, (counts, total, count) in snapshot[name].items():
+                cumulative = 0
+                for bound, bucket_count in zip(bounds, counts):
+                    cumulative += bucket_count
+                    labels = _format_labels(key, [("le", bound)])
+                    lines.append(f"{name}_bucket{labels} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(key)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(key)} {count}")
+
+    return "\n".join(lines) + "\n"
+
+
+def _query_operation(sql):
+    """SQL语句的操作类型（SELECT/INSERT/UPDATE/DELETE等）"""
+    words = sql.split(None, 1)
+    return words[0].upper() if words else "OTHER"
+
+
+def record_query(sql, elapsed):
+    """数据库查询监听器：按操作类型记录耗时"""
+    observe("db_query_duration_seconds", elapsed, {"operation": _query_operation(sql)})
+
+
+# 指标定义
+register_histogram(
+    "scheduler_job_duration_seconds",
+    "定时任务执行耗时",
+    (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300),
+)
+register_counter("scheduler_job_failures_total", "定时任务执行失败次数")
+register_histogram(
+    "reminder_delivery_lag_seconds",
+    "提醒实际发送时间与计划提醒时间的差",
+    (1, 5, 15, 30, 60, 120, 300, 600, 1800),
+)
+register_counter("reminders_sent_total", "发送成功的提醒数")
+register_counter("reminders_failed_total", "发送失败的提醒数（按结果区分重试和放弃）")
+register_histogram("push_request_duration_seconds", "推送渠道请求耗时")
+register_counter("push_requests_total", "推送渠道请求次数（按结果区分）")
+register_histogram(
+    "db_query_duration_seconds",
+    "数据库查询耗时",
+    (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1),
+)
+register_gauge(
+    "reminder_queue_depth",
+    "各状态的提醒数量（pending为待发送队列长度）",
+    lambda: {
+        (("status", status),): count
+        for status, count in {
+            REMINDER_PENDING: 0,
+            REMINDER_CLAIMED: 0,
+            REMINDER_SENDING: 0,
+            **count_reminders_by_status(),
+        }.items()
+    },
+)
+
+register_query_listener(record_query)
@@ -0,0 +1,486 @@
+# -*- coding: utf-8 -*-
+"""
+推送渠道模块
+支持 PushPlus、Server酱、企业微信群机器人、SMTP邮件，每个用户按配置的顺序依次尝试（故障转移）
+根据各渠道最近的耗时和失败率，自动把变慢或故障的渠道排到后面
+渠道连续失败或超时后熔断，熔断期间直接跳过，等待探测成功后恢复
+"""
+
+import html
+import logging
+import re
+import smtplib
+import threading
+import time
+from collections import deque
+from email.header import Header
+from email.mime.text import MIMEText
+
+import requests
+
+from utils.database import get_settings, get_user_settings
+from utils.metrics import inc_counter, observe, register_gauge
+from config import (
+    PUSHPLUS_API,
+    SERVERCHAN_API,
+    WECOM_WEBHOOK_API,
+    SMTP_HOST,
+    SMTP_PORT,
+    SMTP_FROM,
+    CHANNEL_TIMEOUT,
+    CHANNEL_STATS_WINDOW,
+    CHANNEL_STATS_MAX_AGE,
+    CHANNEL_MIN_SAMPLES,
+    CHANNEL_P95_THRESHOLD,
+    CHANNEL_ERROR_RATE_THRESHOLD,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_TIMEOUT_THRESHOLD,
+    CIRCUIT_RESET_SECONDS,
+    CIRCUIT_PROBE_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+# 默认渠道顺序
+DEFAULT_CHANNELS = ["pushplus"]
+
+# 渠道 -> 需要的用户配置项
+CHANNEL_SETTING_KEYS = {
+    "pushplus": "pushplus_token",
+    "serverchan": "serverchan_key",
+    "wecom": "wecom_webhook_key",
+    "smtp": "smtp_to",
+}
+
+# 发送提醒时需要读取的全部用户配置
+DELIVERY_SETTING_KEYS = [
+    "notify_channels",
+    "message_format",
+    *CHANNEL_SETTING_KEYS.values(),
+]
+
+CHANNEL_NAMES = {
+    "pushplus": "PushPlus",
+    "serverchan": "Server酱",
+    "wecom": "企业微信机器人",
+    "smtp": "邮件",
+}
+
+# 各渠道最近的发送记录 {渠道: deque[(记录时间, 耗时秒, 是否成功)]}
+_channel_stats = {}
+_stats_lock = threading.Lock()
+
+# 熔断器状态
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+# 各渠道的熔断器 {渠道: {state, failures, timeouts, opened_at, probing}}
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def html_to_text(content):
+    """将HTML消息转换为纯文本（用于不支持HTML的渠道）"""
+    text = re.sub(r"<br\s*/?>|</p>|</h\d>|<hr[^>]*>", "\n", content)
+    text = re.sub(r"<[^>]+>", "", text)
+    lines = [html.unescape(line).strip() for line in text.splitlines()]
+    return "\n".join(line for line in lines if line)
+
+
+def send_pushplus(config, message):
+    """通过PushPlus发送"""
+    response = requests.post(
+        PUSHPLUS_API,
+        data={
+            "token": config["pushplus_token"],
+            "title": message["title"],
+            "content": message["content"],
+            "template": message.get("template", "html"),
+        },
+        timeout=CHANNEL_TIMEOUT,
+    )
+    response.raise_for_status()
+    result = response.json()
+
+    if result.get("code") == 200:
+        return {"success": True, "message": "发送成功", "data": result}
+    return {"success": False, "error": result.get("msg", "发送失败")}
+
+
+def send_serverchan(config, message):
+    """通过Server酱发送（desp为Markdown，这里发送纯文本）"""
+    response = requests.post(
+        SERVERCHAN_API.format(key=config["serverchan_key"]),
+        data={"title": message["title"], "desp": message_text(message)},
+        timeout=CHANNEL_TIMEOUT,
+    )
+    response.raise_for_status()
+    result = response.json()
+
+    if result.get("code") == 0:
+        return {"success": True, "message": "发送成功", "data": result}
+    return {"success": False, "error": result.get("message", "发送失败")}
+
+
+def send_wecom(config, message):
+    """通过企业微信群机器人Webhook发送"""
+    response = requests.post(
+        WECOM_WEBHOOK_API,
+        params={"key": config["wecom_webhook_key"]},
+        json={
+            "msgtype": "text",
+            "text": {"content": f"{message['title']}\n{message_text(message)}"},
+        },
+        timeout=CHANNEL_TIMEOUT,
+    )
+    response.raise_for_status()
+    result = response.json()
+
+    if result.get("errcode") == 0:
+        return {"success": True, "message": "发送成功", "data": result}
+    return {"success": False, "error": result.get("errmsg", "发送失败")}
+
+
+def send_smtp(config, message):
+    """通过本地SMTP中继发送邮件"""
+    subtype = "html" if message.get("template", "html") == "html" else "plain"
+    mail = MIMEText(message["content"], subtype, "utf-8")
+    mail["Subject"] = Header(message["title"], "utf-8")
+    mail["From"] = SMTP_FROM
+    mail["To"] = config["smtp_to"]
+    if message.get("idempotency_key"):
+        # 同一提醒固定Message-ID，邮件服务器和客户端据此识别重复投递
+        mail["Message-ID"] = f"<{message['idempotency_key']}@schedule-reminder>"
+
+    with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=CHANNEL_TIMEOUT) as smtp:
+        smtp.sendmail(SMTP_FROM, [config["smtp_to"]], mail.as_string())
+
+    return {"success": True, "message": "发送成功"}
+
+
+# 渠道 -> 发送函数 send(config, message)
+CHANNELS = {
+    "pushplus": send_pushplus,
+    "serverchan": send_serverchan,
+    "wecom": send_wecom,
+    "smtp": send_smtp,
+}
+
+
+def message_text(message):
+    """获取消息的纯文本内容（HTML消息转换为纯文本，不修改传入的消息）"""
+    if "text" in message:
+        return message["text"]
+    if message.get("template", "html") == "html":
+        return html_to_text(message["content"])
+    return message["content"]
+
+
+def parse_channels(value):
+    """解析渠道顺序配置（逗号分隔），忽略未知渠道"""
+    if not value:
+        return list(DEFAULT_CHANNELS)
+    if isinstance(value, str):
+        value = value.split(",")
+    channels = []
+    for name in value:
+        name = name.strip()
+        if name in CHANNELS and name not in channels:
+            channels.append(name)
+    return channels or list(DEFAULT_CHANNELS)
+
+
+def configured_channels(config):
+    """配置中已填写必要参数的渠道（按用户设置的顺序）"""
+    return [
+        name
+        for name in parse_channels(config.get("notify_channels"))
+        if config.get(CHANNEL_SETTING_KEYS[name])
+    ]
+
+
+def _probe_http(url):
+    """HTTP渠道探测：服务端能正常响应（非5xx）即认为可用"""
+    response = requests.get(url, timeout=CIRCUIT_PROBE_TIMEOUT)
+    return response.status_code < 500
+
+
+def probe_smtp():
+    """SMTP渠道探测：连接本地中继并发送NOOP"""
+    with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=CIRCUIT_PROBE_TIMEOUT) as smtp:
+        return smtp.noop()[0] == 250
+
+
+# 渠道 -> 探测函数（不发送消息，只检查服务是否可达）
+CHANNEL_PROBES = {
+    "pushplus": lambda: _probe_http(PUSHPLUS_API),
+    "serverchan": lambda: _probe_http(SERVERCHAN_API.split("{", 1)[0]),
+    "wecom": lambda: _probe_http(WECOM_WEBHOOK_API),
+    "smtp": probe_smtp,
+}
+
+
+def _get_breaker(channel):
+    """获取渠道的熔断器（调用方需持有 _breakers_lock）"""
+    return _breakers.setdefault(
+        channel,
+        {
+            "state": CIRCUIT_CLOSED,
+            "failures": 0,
+            "timeouts": 0,
+            "opened_at": None,
+            "probing": False,
+        },
+    )
+
+
+def allow_request(channel):
+    """
+    检查熔断器是否允许请求
+
+    熔断超过 CIRCUIT_RESET_SECONDS 后进入半开状态，只放行一个探测请求
+
+    返回:
+        bool: 是否可以发送
+    """
+    with _breakers_lock:
+        breaker = _get_breaker(channel)
+        if breaker["state"] == CIRCUIT_CLOSED:
+            return True
+
+        if (
+            breaker["state"] == CIRCUIT_OPEN
+            and time.monotonic() - breaker["opened_at"] >= CIRCUIT_RESET_SECONDS
+        ):
+            breaker["state"] = CIRCUIT_HALF_OPEN
+
+        if breaker["state"] == CIRCUIT_HALF_OPEN and not breaker["probing"]:
+            breaker["probing"] = True
+            return True
+        return False
+
+
+def record_breaker_result(channel, success, timeout=False):
+    """
+    记录一次请求结果，更新熔断器状态
+
+    参数:
+        channel: 渠道
+        success: 服务是否可达（服务端返回的业务错误也算可达）
+        timeout: 是否为超时
+    """
+    with _breakers_lock:
+        breaker = _get_breaker(channel)
+        breaker["probing"] = False
+
+        if success:
+            if breaker["state"] != CIRCUIT_CLOSED:
+                logger.info(f"推送渠道 {channel} 已恢复")
+            breaker.update(
+                state=CIRCUIT_CLOSED, failures=0, timeouts=0, opened_at=None
+            )
+            return
+
+        breaker["failures"] += 1
+        breaker["timeouts"] = breaker["timeouts"] + 1 if timeout else 0
+        if (
+            breaker["state"] == CIRCUIT_HALF_OPEN
+            or breaker["failures"] >= CIRCUIT_FAILURE_THRESHOLD
+            or breaker["timeouts"] >= CIRCUIT_TIMEOUT_THRESHOLD
+        ):
+            if breaker["state"] != CIRCUIT_OPEN:
+                logger.warning(f"推送渠道 {channel} 熔断")
+            breaker["state"] = CIRCUIT_OPEN
+            breaker["opened_at"] = time.monotonic()
+
+
+def get_breaker_states():
+    """
+    获取各渠道的熔断状态
+
+    返回:
+        dict: {渠道: closed/open/half_open}
+    """
+    with _breakers_lock:
+        return {
+            name: _breakers[name]["state"] if name in _breakers else CIRCUIT_CLOSED
+            for name in CHANNELS
+        }
+
+
+def probe_open_circuits():
+    """探测已到恢复时间的熔断渠道（定时任务调用），探测成功后关闭熔断器"""
+    for channel, state in get_breaker_states().items():
+        if state == CIRCUIT_CLOSED or not allow_request(channel):
+            continue
+
+        try:
+            available = CHANNEL_PROBES[channel]()
+            timeout = False
+        except requests.exceptions.Timeout:
+            available, timeout = False, True
+        except Exception:
+            available, timeout = False, False
+        record_breaker_result(channel, available, timeout)
+
+
+register_gauge(
+    "push_circuit_open",
+    "推送渠道是否熔断（1为熔断或半开）",
+    lambda: {
+        (("channel", channel),): int(state != CIRCUIT_CLOSED)
+        for channel, state in get_breaker_states().items()
+    },
+)
+
+
+def get_channel_config(user_id=None):
+    """读取用户的渠道配置（含消息格式）"""
+    return get_settings(DELIVERY_SETTING_KEYS, "", user_id=user_id)
+
+
+def get_all_channel_configs():
+    """
+    一次读取所有用户的渠道配置（每个配置项一次查询）
+
+    返回:
+        dict: {用户ID: 渠道配置}
+    """
+    configs = {}
+    for key in DELIVERY_SETTING_KEYS:
+        for user_id, value in get_user_settings(key, "").items():
+            configs.setdefault(user_id, {})[key] = value
+    return configs
+
+
+def record_channel_result(channel, elapsed, success):
+    """记录渠道的一次发送结果"""
+    with _stats_lock:
+        samples = _channel_stats.setdefault(
+            channel, deque(maxlen=CHANNEL_STATS_WINDOW)
+        )
+        samples.append((time.monotonic(), elapsed, success))
+
+
+def get_channel_stats(channel=None):
+    """
+    获取渠道健康度（只统计最近 CHANNEL_STATS_MAX_AGE 秒内的记录）
+
+    返回:
+        dict: {渠道: {samples, p95, error_rate, degraded}}，指定channel时只返回该渠道
+    """
+    since = time.monotonic() - CHANNEL_STATS_MAX_AGE
+    with _stats_lock:
+        snapshot = {
+            name: [(elapsed, success) for at, elapsed, success in samples if at >= since]
+            for name, samples in _channel_stats.items()
+        }
+
+    stats = {}
+    for name in [channel] if channel else CHANNELS:
+        samples = snapshot.get(name, [])
+        latencies = sorted(elapsed for elapsed, _ in samples)
+        p95 = latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0
+        error_rate = (
+            sum(1 for _, success in samples if not success) / len(samples)
+            if samples
+            else 0.0
+        )
+        stats[name] = {
+            "samples": len(samples),
+            "p95": round(p95, 3),
+            "error_rate": round(error_rate, 3),
+            "degraded": len(samples) >= CHANNEL_MIN_SAMPLES
+            and (
+                p95 > CHANNEL_P95_THRESHOLD
+                or error_rate > CHANNEL_ERROR_RATE_THRESHOLD
+            ),
+        }
+    return stats[channel] if channel else stats
+
+
+def order_channels(channels):
+    """健康的渠道保持用户设置的顺序排在前面，变慢或故障的渠道排到最后"""
+    stats = get_channel_stats()
+    healthy = [name for name in channels if not stats[name]["degraded"]]
+    degraded = [name for name in channels if stats[name]["degraded"]]
+    return healthy + degraded
+
+
+def send_via_channel(channel, config, message):
+    """
+    通过指定渠道发送并记录耗时
+
+    网络异常、超时、5xx和无法解析的响应计入熔断；服务端返回的业务错误（如Token无效）
+    说明服务可用，不计入熔断
+    """
+    started = time.perf_counter()
+    reachable, timeout = True, False
+    try:
+        result = CHANNELS[channel](config, message)
+    except requests.exceptions.Timeout:
+        result = {"success": False, "error": "请求超时，请检查网络连接"}
+        reachable, timeout = False, True
+    except Exception as e:
+        result = {"success": False, "error": f"发送失败: {str(e)}"}
+        reachable = False
+    elapsed = time.perf_counter() - started
+
+    record_channel_result(channel, elapsed, result["success"])
+    record_breaker_result(channel, reachable, timeout)
+
+    if result["success"]:
+        outcome = "success"
+    elif timeout:
+        outcome = "timeout"
+    else:
+        outcome = "error" if reachable else "unreachable"
+    observe("push_request_duration_seconds", elapsed, {"channel": channel})
+    inc_counter("push_requests_total", {"channel": channel, "result": outcome})
+    return result
+
+
+def deliver(message, config, idempotency_key=None):
+    """
+    按用户的渠道顺序发送消息，失败时依次尝试下一个渠道
+
+    参数:
+        message: {"title", "content"(HTML), "template"}，只渲染一次，各渠道共用
+        config: 用户的渠道配置 {notify_channels, pushplus_token, serverchan_key, ...}
+        idempotency_key: 幂等键，随消息传给渠道（支持的渠道用作消息标识）；
+                         是否已发送由提醒发件箱记录，这里不做去重
+
+    返回:
+        dict: 发送结果，成功时包含 channel，失败时 errors 为各渠道的错误；
+              所有渠道都处于熔断时 circuit_open 为True（未实际发送）
+    """
+    # 复制一份再附加字段，调用方的消息和渠道之间互不影响
+    message = dict(message)
+    if idempotency_key:
+        message["idempotency_key"] = idempotency_key
+
+    channels = configured_channels(config)
+    if not channels:
+        return {"success": False, "error": "未配置推送渠道，请在设置页面配置"}
+
+    errors = {}
+    attempted = False
+    for channel in order_channels(channels):
+        if not allow_request(channel):
+            errors[channel] = "渠道熔断中"
+            continue
+
+        attempted = True
+        result = send_via_channel(channel, config, message)
+        if result["success"]:
+            return dict(result, channel=channel)
+        errors[channel] = result.get("error")
+
+    return {
+        "success": False,
+        "error": "；".join(
+            f"{CHANNEL_NAMES[name]}: {error}" for name, error in errors.items()
+        ),
+        "errors": errors,
+        "circuit_open": not attempted,
+    }
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+教室占用索引模块
+按 (地点, 星期) 维护课程时间区间和周次掩码，用于查询教室空闲时段
+课程增删改时通过数据库监听器增量更新，不需要每次请求重新扫描全表
+"""
+
+import threading
+
+from config import ROOM_DAY_START, ROOM_DAY_END
+from utils.database import (
+    get_all_courses,
+    get_courses_by_ids,
+    register_course_listener,
+)
+from utils.conflicts import time_to_minutes
+from utils.week_utils import week_pattern_to_mask
+
+# 占用索引 {(地点, 星期): {课程ID: (开始分钟, 结束分钟, 周次掩码)}}
+_index = None
+# 课程所在索引位置 {课程ID: (地点, 星期)}
+_course_keys = {}
+_lock = threading.RLock()
+
+
+def _index_course(course):
+    """将课程加入索引（调用方需持有锁）"""
+    location = (course.get("location") or "").strip()
+    if not location:
+        return
+
+    try:
+        start = time_to_minutes(course["start_time"])
+        end = time_to_minutes(course["end_time"])
+    except (KeyError, ValueError):
+        return
+
+    mask = course.get("week_mask")
+    if mask is None:
+        mask = week_pattern_to_mask(course.get("week_pattern") or "all")
+
+    key = (location, course["day_of_week"])
+    _index.setdefault(key, {})[course["id"]] = (start, end, mask)
+    _course_keys[course["id"]] = key
+
+
+def _unindex_course(course_id):
+    """将课程移出索引（调用方需持有锁）"""
+    key = _course_keys.pop(course_id, None)
+    if key is None:
+        return
+
+    entries = _index.get(key)
+    if entries is not None:
+        entries.pop(course_id, None)
+        if not entries:
+            del _index[key]
+
+
+def _ensure_index():
+    """首次使用时全量构建索引（调用方需持有锁）"""
+    global _index
+
+    if _index is None:
+        _index = {}
+        _course_keys.clear()
+        for course in get_all_courses():
+            _index_course(course)
+
+
+def on_courses_changed(course_ids):
+    """课程变更时增量更新索引"""
+    global _index
+
+    with _lock:
+        # 尚未构建时无需维护，首次查询时再全量构建
+        if _index is None:
+            return
+
+        if course_ids is None:
+            _index = None
+            return
+
+        for course_id in course_ids:
+            _unindex_course(course_id)
+
+        # 已删除的课程查询不到，只重新加入仍存在的课程
+        for course in get_courses_by_ids(course_ids):
+            _index_course(course)
+
+
+register_course_listener(on_courses_changed)
+
+
+def _format_minutes(minutes):
+    """分钟数转换为 HH:MM"""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def _merge_busy(entries, week):
+    """合并指定周有课的时间区间"""
+    week_bit = 1 << week
+    intervals = sorted(
+        (start, end) for start, end, mask in entries.values() if mask & week_bit
+    )
+
+    merged = []
+    for start, end in intervals:
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def _free_gaps(busy, min_minutes):
+    """计算一天内的空闲时段"""
+    day_start = time_to_minutes(ROOM_DAY_START)
+    day_end = time_to_minutes(ROOM_DAY_END)
+
+    gaps = []
+    cursor = day_start
+    for start, end in busy + [[day_end, day_end]]:
+        start = min(max(start, day_start), day_end)
+        if start - cursor >= max(min_minutes, 1):
+            gaps.append(
+                {
+                    "start": _format_minutes(cursor),
+                    "end": _format_minutes(start),
+                    "minutes": start - cursor,
+                }
+            )
+        cursor = max(cursor, min(end, day_end))
+
+    return gaps
+
+
+def get_room_free_slots(location, day_of_week, week, min_minutes=0):
+    """
+    查询教室在指定周、星期的占用和空闲时段
+
+    返回:
+        dict: {location, day_of_week, week, busy: [...], free: [...]}
+    """
+    with _lock:
+        _ensure_index()
+        entries = dict(_index.get((location, day_of_week), {}))
+
+    busy = _merge_busy(entries, week)
+    return {
+        "location": location,
+        "day_of_week": day_of_week,
+        "week": week,
+        "busy": [
+            {"start": _format_minutes(start), "end": _format_minutes(end)}
+            for start, end in busy
+        ],
+        "free": _free_gaps(busy, min_minutes),
+    }
+
+
+def get_all_free_slots(day_of_week, week, min_minutes=0):
+    """
+    查询所有教室在指定周、星期的空闲时段
+
+    返回:
+        list: 每个教室的空闲时段，只包含有满足时长要求空闲时段的教室
+    """
+    with _lock:
+        _ensure_index()
+        locations = sorted({location for location, _ in _index})
+        snapshot = {
+            location: dict(_index.get((location, day_of_week), {}))
+            for location in locations
+        }
+
+    rooms = []
+    for location in locations:
+        free = _free_gaps(_merge_busy(snapshot[location], week), min_minutes)
+        if free:
+            rooms.append({"location": location, "free": free})
+    return rooms
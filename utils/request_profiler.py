@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""
+请求性能分析模块
+按配置 request_profiling 开启（默认关闭，修改后立即生效）：
+    timing     记录每个请求的耗时和SQL查询次数、耗时，慢请求记录完整查询列表
+    cprofile   在timing基础上按比例抽样，用cProfile分析请求
+    pyinstrument  同上，使用pyinstrument（需另行安装）
+"""
+
+import cProfile
+import io
+import logging
+import pstats
+import random
+import threading
+import time
+from collections import deque
+
+from config import (
+    SLOW_REQUEST_SECONDS,
+    PROFILE_SAMPLE_RATE,
+    PROFILE_KEEP,
+    SLOW_REQUEST_KEEP,
+)
+from utils.database import (
+    get_setting,
+    register_query_listener,
+    register_settings_listener,
+    unregister_query_listener,
+)
+
+try:
+    from pyinstrument import Profiler as PyinstrumentProfiler
+except ImportError:
+    PyinstrumentProfiler = None
+
+logger = logging.getLogger(__name__)
+
+PROFILING_MODES = {
+    "off": "关闭",
+    "timing": "记录耗时和SQL",
+    "cprofile": "cProfile抽样",
+    "pyinstrument": "pyinstrument抽样",
+}
+
+# 当前模式（None表示尚未从配置读取）
+_mode = None
+_mode_lock = threading.Lock()
+
+# 当前线程正在处理的请求 {started, queries, profiler}
+_local = threading.local()
+
+# 各接口的统计 {接口: {count, total, max, queries, sql_time}}
+_endpoint_stats = {}
+_slow_requests = deque(maxlen=SLOW_REQUEST_KEEP)
+_profiles = deque(maxlen=PROFILE_KEEP)
+_stats_lock = threading.Lock()
+
+
+def parse_profiling_mode(value):
+    """解析分析模式配置，无效或缺少pyinstrument时降级"""
+    if value not in PROFILING_MODES:
+        return "off"
+    if value == "pyinstrument" and PyinstrumentProfiler is None:
+        return "cprofile"
+    return value
+
+
+def _record_query(sql, elapsed):
+    """SQL监听器：记录到当前请求"""
+    queries = getattr(_local, "queries", None)
+    if queries is not None:
+        queries.append((" ".join(sql.split()), elapsed))
+
+
+def set_mode(mode):
+    """切换分析模式（开启时注册SQL监听器，关闭时移除）"""
+    global _mode
+    mode = parse_profiling_mode(mode)
+    with _mode_lock:
+        _mode = mode
+        if mode == "off":
+            unregister_query_listener(_record_query)
+        else:
+            register_query_listener(_record_query)
+    return mode
+
+
+def get_mode():
+    """当前分析模式（首次调用时读取配置）"""
+    if _mode is None:
+        set_mode(get_setting("request_profiling", "off"))
+    return _mode
+
+
+def on_settings_changed(key, user_id):
+    """分析模式为全局配置，修改后立即生效"""
+    if key == "request_profiling" and user_id is None:
+        set_mode(get_setting("request_profiling", "off"))
+
+
+register_settings_listener(on_settings_changed)
+
+
+def start_request():
+    """请求开始：关闭时不做任何记录"""
+    mode = get_mode()
+    if mode == "off":
+        _local.queries = None
+        return
+
+    _local.started = time.perf_counter()
+    _local.queries = []
+    _local.profiler = None
+
+    if mode != "timing" and random.random() < PROFILE_SAMPLE_RATE:
+        if mode == "pyinstrument":
+            _local.profiler = PyinstrumentProfiler()
+            _local.profiler.start()
+        else:
+            _local.profiler = cProfile.Profile()
+            _local.profiler.enable()
+
+
+def _profile_report(profiler):
+    """生成分析报告文本"""
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(30)
+        return output.getvalue()
+
+    profiler.stop()
+    return profiler.output_text()
+
+
+def finish_request(endpoint, status_code=None):
+    """
+    请求结束：更新接口统计，记录慢请求和抽样分析结果
+
+    参数:
+        endpoint: 接口名称（方法 + 路由）
+        status_code: 响应状态码
+    """
+    queries = getattr(_local, "queries", None)
+    if queries is None:
+        return
+
+    elapsed = time.perf_counter() - _local.started
+    profiler = _local.profiler
+    _local.queries = None
+    _local.profiler = None
+
+    report = _profile_report(profiler) if profiler is not None else None
+    sql_time = sum(query_time for _, query_time in queries)
+
+    with _stats_lock:
+        stats = _endpoint_stats.setdefault(
+            endpoint,
+            {"count": 0, "total": 0.0, "max": 0.0, "queries": 0, "sql_time": 0.0},
+        )
+        stats["count"] += 1
+        stats["total"] += elapsed
+        stats["max"] = max(stats["max"], elapsed)
+        stats["queries"] += len(queries)
+        stats["sql_time"] += sql_time
+
+        if report is not None:
+            _profiles.append(
+                {
+                    "endpoint": endpoint,
+                    "elapsed": round(elapsed, 4),
+                    "at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                    "report": report,
+                }
+            )
+
+        if elapsed >= SLOW_REQUEST_SECONDS:
+            _slow_requests.append(
+                {
+                    "endpoint": endpoint,
+                    "status": status_code,
+                    "elapsed": round(elapsed, 4),
+                    "sql_time": round(sql_time, 4),
+                    "at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                    "queries": [
+                        {"sql": sql, "elapsed": round(query_time, 5)}
+                        for sql, query_time in queries
+                    ],
+                }
+            )
+
+    if elapsed >= SLOW_REQUEST_SECONDS:
+        logger.warning(
+            f"慢请求 {endpoint} 耗时{elapsed:.3f}s，SQL {len(queries)}条/{sql_time:.3f}s:\n"
+            + "\n".join(f"  {query_time:.4f}s {sql}" for sql, query_time in queries)
+        )
+
+
+def get_slow_endpoints(limit=10):
+    """
+    平均耗时最长的接口
+
+    返回:
+        list: [{endpoint, count, avg, max, avg_queries, avg_sql_time}]
+    """
+    with _stats_lock:
+        items = [(endpoint, dict(stats)) for endpoint, stats in _endpoint_stats.items()]
+
+    summary = [
+        {
+            "endpoint": endpoint,
+            "count": stats["count"],
+            "avg": round(stats["total"] / stats["count"], 4),
+            "max": round(stats["max"], 4),
+            "avg_queries": round(stats["queries"] / stats["count"], 1),
+            "avg_sql_time": round(stats["sql_time"] / stats["count"], 4),
+        }
+        for endpoint, stats in items
+    ]
+    summary.sort(key=lambda item: item["avg"], reverse=True)
+    return summary[:limit]
+
+
+def get_slow_requests():
+    """最近的慢请求（含SQL列表），最新的在前"""
+    with _stats_lock:
+        return list(reversed(_slow_requests))
+
+
+def get_profiles():
+    """最近的抽样分析结果，最新的在前"""
+    with _stats_lock:
+        return list(reversed(_profiles))
+
+
+def reset_stats():
+    """清空统计"""
+    with _stats_lock:
+        _endpoint_stats.clear()
+        _slow_requests.clear()
+        _profiles.clear()
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+周课表模块
+按教学周生成7天课表网格，并标注每天是否为节假日
+"""
+
+from datetime import timedelta
+
+from utils.database import get_courses_by_week
+from utils.holiday_checker import is_holiday, load_holidays
+from utils.teaching_calendar import get_week_start_date
+
+WEEK_DAY_NAMES = {
+    1: "周一",
+    2: "周二",
+    3: "周三",
+    4: "周四",
+    5: "周五",
+    6: "周六",
+    7: "周日",
+}
+
+
+def build_week_schedule(week, user_id=None):
+    """
+    生成指定教学周的课表网格
+
+    参数:
+        week: 教学周
+        user_id: 只包含该用户的课程，为None时包含全部
+
+    返回:
+        dict: {week, days: [{day_of_week, name, date, is_holiday, courses}]}
+    """
+    week_start = get_week_start_date(week, user_id)
+    holidays_data = load_holidays()
+
+    days = []
+    for day_of_week, name in WEEK_DAY_NAMES.items():
+        date = week_start + timedelta(days=day_of_week - 1) if week_start else None
+        days.append(
+            {
+                "day_of_week": day_of_week,
+                "name": name,
+                "date": date.strftime("%Y-%m-%d") if date else None,
+                "is_holiday": is_holiday(date, holidays_data) if date else False,
+                "courses": [],
+            }
+        )
+
+    # 一次查询取出本周所有课程，再按星期分组
+    for course in get_courses_by_week(week, user_id):
+        if 1 <= course["day_of_week"] <= 7:
+            days[course["day_of_week"] - 1]["courses"].append(course)
+
+    return {"week": week, "days": days}
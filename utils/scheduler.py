@@ -6,21 +6,52 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 from datetime import datetime, timedelta
+from itertools import groupby
 import logging
+import os
+import socket
+import threading
 
+from utils import clock
 from utils.database import (
     get_courses_by_day,
-    get_active_courses_by_day,
-    add_reminder,
-    get_pending_reminders,
+    add_reminders,
+    claim_reminders,
+    mark_reminder_sending,
+    fail_stale_sending_reminders,
     mark_reminder_sent,
+    mark_reminder_failed,
+    defer_reminder,
     clear_old_reminders,
-    get_setting,
+    get_users,
+    get_exceptions_for_date,
+    DEFAULT_USER_ID,
 )
 from utils.wechat_push import send_course_reminder
-from utils.holiday_checker import should_send_reminder
+from utils.notify_channels import (
+    CHANNELS,
+    configured_channels,
+    get_all_channel_configs,
+    probe_open_circuits,
+)
+from utils.holiday_checker import should_send_reminder, get_effective_weekday
 from utils.week_utils import is_course_active
-from config import REMINDER_TIMES
+from utils.teaching_calendar import (
+    get_current_week,
+    is_in_semester,
+    refresh_calendars,
+)
+from utils.course_exceptions import apply_course_exceptions
+from utils.metrics import inc_counter, observe, timed_job
+from config import (
+    REMINDER_TIMES,
+    REMINDER_CLAIM_BATCH,
+    REMINDER_LEASE_SECONDS,
+    REMINDER_MAX_ATTEMPTS,
+    REMINDER_RETRY_SECONDS,
+    CIRCUIT_RESET_SECONDS,
+    CHANNEL_TIMEOUT,
+)
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -29,6 +60,9 @@ logger = logging.getLogger(__name__)
 # 全局调度器
 scheduler = None
 
+# 发送中的租约：覆盖所有渠道依次超时（连接和读取各一次超时）的最坏情况
+SENDING_LEASE_SECONDS = max(REMINDER_LEASE_SECONDS, 2 * len(CHANNELS) * CHANNEL_TIMEOUT)
+
 
 def init_scheduler():
     """初始化定时任务调度器"""
@@ -41,7 +75,7 @@ def init_scheduler():
 
         # 添加每日扫描任务
         scheduler.add_job(
-            scan_daily_courses,
+            timed_job("daily_scan", scan_daily_courses),
             trigger=CronTrigger(hour=0, minute=5),  # 每天00:05执行
             id="daily_scan",
             replace_existing=True,
@@ -49,53 +83,97 @@ def init_scheduler():
 
         # 添加提醒检查任务（每分钟检查一次）
         scheduler.add_job(
-            check_and_send_reminders,
+            timed_job("reminder_check", check_and_send_reminders),
             trigger="interval",
             minutes=1,
             id="reminder_check",
             replace_existing=True,
         )
 
+        # 探测熔断的推送渠道，服务恢复后关闭熔断器
+        scheduler.add_job(
+            probe_open_circuits,
+            trigger="interval",
+            seconds=CIRCUIT_RESET_SECONDS,
+            id="circuit_probe",
+            replace_existing=True,
+        )
+
         # 添加清理旧数据任务（每周一凌晨执行）
         scheduler.add_job(
-            cleanup_old_data,
+            timed_job("weekly_cleanup", cleanup_old_data),
             trigger=CronTrigger(day_of_week="mon", hour=2, minute=0),
             id="weekly_cleanup",
             replace_existing=True,
         )
 
         # 立即执行一次今日课程扫描
-        scan_daily_courses()
+        timed_job("daily_scan", scan_daily_courses)()
 
     return scheduler
 
 
-def scan_daily_courses():
+def scan_daily_courses(course_ids=None, user_id=None):
     """
-    扫描今日课程，创建提醒任务
+    扫描所有用户的今日课程，创建提醒任务
+
+    一次查询取出今日全部课程，按各用户的当前教学周过滤，
+    再一次查询合并今日的停课、调课后批量写入提醒
+
+    参数:
+        course_ids: 只为指定ID的课程创建提醒，默认为全部课程
+        user_id: 只扫描指定用户的课程，默认为全部用户
     """
-    now = datetime.now()
+    now = clock.now()
     logger.info(f"扫描今日课程: {now.strftime('%Y-%m-%d %H:%M:%S')}")
+    refresh_calendars()
 
     # 检查今天是否应该发送提醒
     if not should_send_reminder(now):
         logger.info("今天是节假日，跳过课程提醒")
         return
 
-    # 获取今天星期几（1-7，周一为1）
-    day_of_week = now.isoweekday()
-
-    # 获取当前教学周
-    current_week = int(get_setting("current_week", 1))
-    logger.info(f"当前教学周: 第{current_week}周")
-
-    # 获取今日课程（已过滤周次）
-    courses = get_active_courses_by_day(day_of_week, current_week)
+    # 获取今天按星期几的课表上课（1-7，周一为1；调休日可能按其他星期上课）
+    effective_day, effective_week = get_effective_weekday(now)
+    day_of_week = effective_day or now.isoweekday()
+    if day_of_week != now.isoweekday():
+        logger.info(f"今天是调休日，按星期{day_of_week}的课表上课")
+
+    # 获取各用户今天所在的教学周（由教学日历推算并缓存；调休指定了教学周时以其为准）
+    # 今天不在学期内（开学前、学期结束后的假期）的用户不生成提醒
+    week_by_user = {}
+    for user in get_users():
+        if effective_week is None and not is_in_semester(now, user["id"]):
+            logger.info(f"用户 {user['id']} 今天不在学期内，跳过课程提醒")
+            continue
+        week_by_user[user["id"]] = effective_week or get_current_week(now, user["id"])
+
+    # 获取所有用户的今日课程，按各自的教学周过滤
+    courses = []
+    for course in get_courses_by_day(day_of_week, user_id):
+        current_week = week_by_user.get(course["user_id"])
+        if current_week is not None and is_course_active(
+            course.get("week_pattern", "all"), current_week
+        ):
+            courses.append(course)
+
+    # 合并今日的课程例外（停课、调课）
+    today = now.strftime("%Y-%m-%d")
+    exceptions = get_exceptions_for_date(today)
+    if user_id is not None:
+        exceptions = [e for e in exceptions if e["user_id"] == user_id]
+    courses = apply_course_exceptions(courses, exceptions, today)
+
+    if course_ids is not None:
+        course_ids = set(course_ids)
+        courses = [c for c in courses if c["id"] in course_ids]
     logger.info(f"今日共有 {len(courses)} 门课程需要提醒")
 
-    # 为每门课程创建提醒
+    # 为每门课程生成提醒，一次写入
+    reminders = []
     for course in courses:
-        create_course_reminders(course, now)
+        reminders.extend(build_course_reminders(course, now))
+    add_reminders(reminders)
 
 
 def create_course_reminders(course, base_date):
@@ -106,6 +184,22 @@ def create_course_reminders(course, base_date):
         course: 课程信息
         base_date: 基准日期
     """
+    add_reminders(build_course_reminders(course, base_date))
+
+
+def build_course_reminders(course, base_date):
+    """
+    生成单门课程的提醒记录
+
+    参数:
+        course: 课程信息
+        base_date: 基准日期
+
+    返回:
+        list: [(用户ID, 课程ID, 提醒时间, 课程例外ID)]
+    """
+    reminders = []
+
     # 解析课程开始时间
     start_time_str = course["start_time"]
     hour, minute = map(int, start_time_str.split(":"))
@@ -114,39 +208,128 @@ def create_course_reminders(course, base_date):
     course_start = base_date.replace(hour=hour, minute=minute, second=0, microsecond=0)
 
     # 如果课程已经开始，跳过
-    if course_start <= datetime.now():
+    if course_start <= clock.now():
         logger.info(f"课程 {course['name']} 已开始或已结束，跳过")
-        return
+        return reminders
 
     # 为每个提醒时间点创建提醒
     for minutes_before in REMINDER_TIMES:
         remind_time = course_start - timedelta(minutes=minutes_before)
 
         # 如果提醒时间已过，跳过
-        if remind_time <= datetime.now():
+        if remind_time <= clock.now():
             logger.info(
                 f"课程 {course['name']} 的{minutes_before}分钟提醒时间已过，跳过"
             )
             continue
 
-        # 添加到数据库
-        reminder_id = add_reminder(course["id"], remind_time)
+        reminders.append(
+            (
+                course.get("user_id", DEFAULT_USER_ID),
+                course["id"],
+                remind_time,
+                course.get("exception_id"),
+            )
+        )
         logger.info(
             f"已为课程 {course['name']} 创建{minutes_before}分钟提醒，时间: {remind_time.strftime('%H:%M')}"
         )
 
+    return reminders
+
 
-def check_and_send_reminders():
+def get_worker_id():
+    """当前发送进程（线程）的标识，用于领取提醒"""
+    return f"{socket.gethostname()}-{os.getpid()}-{threading.get_ident()}"
+
+
+def check_and_send_reminders(worker_id=None):
     """
-    检查并发送待发送的提醒
+    领取并发送到期的提醒（按用户分组，使用各自的推送渠道和教学周）
+
+    每批提醒通过原子领取获得租约，多个进程同时运行也不会重复领取；每条提醒发送前
+    再确认租约仍然有效并标记为发送中（同时续期），租约已过期的提醒留给其他进程重新领取。
+    发送进程在发送过程中退出时结果未知，这类提醒标记为失败而不是重新发送
+
+    参数:
+        worker_id: 发送进程标识，默认根据主机名、进程和线程生成
     """
-    # 获取所有待发送的提醒
-    pending_reminders = get_pending_reminders()
+    worker_id = worker_id or get_worker_id()
+    configs = None
+    refresh_calendars()
+
+    for reminder_id in fail_stale_sending_reminders():
+        logger.error(f"提醒 {reminder_id} 发送中断，结果未知，不再重试")
+        inc_counter("reminders_failed_total", {"result": "failed"})
 
-    if pending_reminders:
-        logger.info(f"发现 {len(pending_reminders)} 条待发送提醒")
+    while True:
+        claimed = claim_reminders(
+            worker_id, REMINDER_CLAIM_BATCH, REMINDER_LEASE_SECONDS
+        )
+        if not claimed:
+            return
+
+        logger.info(f"领取 {len(claimed)} 条待发送提醒")
+        if configs is None:
+            configs = get_all_channel_configs()
+
+        for user_id, reminders in groupby(claimed, key=lambda r: r["user_id"]):
+            reminders = list(reminders)
+            config = configs.get(user_id, {})
+            if not configured_channels(config):
+                logger.error(f"用户 {user_id} 未配置推送渠道，稍后重试")
+                for reminder in reminders:
+                    release_failed_reminder(reminder, worker_id, "未配置推送渠道")
+                continue
+
+            send_user_reminders(
+                reminders,
+                config,
+                get_current_week(user_id=user_id),
+                user_id,
+                worker_id,
+            )
+
+        # 不足一批说明已领取完
+        if len(claimed) < REMINDER_CLAIM_BATCH:
+            return
+
+
+def release_failed_reminder(reminder, worker_id, error):
+    """发送失败的提醒放回队列等待重试，超过最大尝试次数后标记为失败"""
+    status = mark_reminder_failed(
+        reminder["id"],
+        worker_id,
+        error,
+        max_attempts=REMINDER_MAX_ATTEMPTS,
+        retry_seconds=REMINDER_RETRY_SECONDS,
+    )
+    if status:
+        inc_counter(
+            "reminders_failed_total",
+            {"result": "failed" if status == "failed" else "retry"},
+        )
+    if status == "failed":
+        logger.error(f"提醒 {reminder['id']} 已重试{reminder['attempts']}次，放弃发送")
+
+
+def send_user_reminders(reminders, config, current_week, user_id, worker_id):
+    """
+    发送单个用户已领取的提醒
+
+    参数:
+        reminders: 该用户的提醒列表
+        config: 该用户的推送渠道配置
+        current_week: 该用户的当前教学周
+        user_id: 用户ID
+        worker_id: 领取提醒的发送进程标识
+    """
+    for reminder in reminders:
+        # 租约已过期（可能已被其他进程重新领取）时不发送
+        if not mark_reminder_sending(reminder["id"], worker_id, SENDING_LEASE_SECONDS):
+            logger.warning(f"提醒 {reminder['id']} 的租约已过期，跳过发送")
+            continue
 
-    for reminder in pending_reminders:
         # 从提醒记录中获取课程信息（包括week_pattern）
         course = {
             "id": reminder["course_id"],
@@ -160,19 +343,44 @@ def check_and_send_reminders():
         # 计算提前分钟数
         remind_time = datetime.strptime(reminder["remind_time"], "%Y-%m-%d %H:%M:%S")
         start_time = datetime.strptime(
-            f"{datetime.now().strftime('%Y-%m-%d')} {course['start_time']}",
+            f"{clock.now().strftime('%Y-%m-%d')} {course['start_time']}",
             "%Y-%m-%d %H:%M",
         )
         minutes_before = int((start_time - remind_time).total_seconds() / 60)
 
         # 发送提醒
-        result = send_course_reminder(course, minutes_before)
+        result = send_course_reminder(
+            course,
+            minutes_before,
+            current_week=current_week,
+            user_id=user_id,
+            idempotency_key=reminder.get("idempotency_key"),
+            config=config,
+        )
 
         if result["success"]:
-            mark_reminder_sent(reminder["id"])
-            logger.info(f"成功发送提醒: {course['name']} ({minutes_before}分钟)")
+            if mark_reminder_sent(reminder["id"], worker_id):
+                inc_counter("reminders_sent_total")
+                observe(
+                    "reminder_delivery_lag_seconds",
+                    (clock.now() - remind_time).total_seconds(),
+                )
+            else:
+                logger.warning(f"提醒 {reminder['id']} 已不是发送中状态，未更新")
+            logger.info(
+                f"成功发送提醒: {course['name']} ({minutes_before}分钟, "
+                f"{result.get('channel', '-')})"
+            )
+        elif result.get("circuit_open"):
+            # 渠道熔断期间不发送，留在队列中等待恢复，不计入尝试次数
+            logger.warning(f"推送渠道熔断中，推迟发送: {course['name']}")
+            defer_reminder(
+                reminder["id"], worker_id, result.get("error"), CIRCUIT_RESET_SECONDS
+            )
+            inc_counter("reminders_failed_total", {"result": "deferred"})
         else:
             logger.error(f"发送提醒失败: {course['name']}, 错误: {result.get('error')}")
+            release_failed_reminder(reminder, worker_id, result.get("error"))
 
 
 def cleanup_old_data():
@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""
+教学日历模块
+根据开学日期和节假日数据推算每天所属的教学周，不再依赖手动维护的当前周设置
+每个用户的学期日历（日期 -> 教学周）首次使用时生成并缓存，相关配置变更时失效
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+
+from utils import clock
+from utils.database import (
+    DEFAULT_USER_ID,
+    bump_data_version,
+    get_setting,
+    get_settings_signature,
+    register_settings_listener,
+)
+from utils.holiday_checker import is_holiday, load_holidays
+from utils.week_utils import DEFAULT_TOTAL_WEEKS, MAX_WEEKS
+
+# 影响教学日历的配置项
+CALENDAR_SETTING_KEYS = {"semester_start", "total_weeks", "current_week", "week_override"}
+
+# 日历缓存 {用户ID: 日历}
+_calendars = {}
+_lock = threading.Lock()
+# 缓存对应的日历配置变更标识（发现其他进程修改配置）
+_signature = None
+# 上次检查配置变更的时间（time.monotonic）
+_checked_at = None
+
+
+def _parse_week(value):
+    """将配置值转换为有效周次，无效时返回None"""
+    try:
+        week = int(value)
+    except (TypeError, ValueError):
+        return None
+    return week if 1 <= week <= MAX_WEEKS else None
+
+
+def _build_calendar(user_id):
+    """
+    生成用户的学期日历
+
+    返回:
+        dict: {first_monday, total_weeks, override, stored_week, days: {日期: (周次, 是否节假日)}}
+    """
+    semester_start = get_setting("semester_start", "", user_id=user_id)
+    total_weeks = _parse_week(get_setting("total_weeks", "", user_id=user_id))
+
+    calendar = {
+        "semester_start": semester_start or "",
+        "first_monday": None,
+        "total_weeks": total_weeks or DEFAULT_TOTAL_WEEKS,
+        "override": _parse_week(get_setting("week_override", "", user_id=user_id)),
+        "stored_week": _parse_week(get_setting("current_week", "1", user_id=user_id))
+        or 1,
+        "days": {},
+    }
+
+    try:
+        start_date = datetime.strptime(semester_start, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return calendar
+
+    # 开学日期所在周的周一为第1周起点
+    first_monday = start_date - timedelta(days=start_date.weekday())
+    calendar["first_monday"] = first_monday
+
+    holidays_data = load_holidays()
+    for offset in range(calendar["total_weeks"] * 7):
+        date = first_monday + timedelta(days=offset)
+        calendar["days"][date] = (
+            offset // 7 + 1,
+            is_holiday(date.strftime("%Y-%m-%d"), holidays_data),
+        )
+
+    return calendar
+
+
+def get_calendar(user_id=None):
+    """获取用户的学期日历（带缓存）"""
+    user_id = user_id or DEFAULT_USER_ID
+
+    calendar = _calendars.get(user_id)
+    if calendar is not None:
+        return calendar
+
+    with _lock:
+        calendar = _calendars.get(user_id)
+        if calendar is None:
+            calendar = _build_calendar(user_id)
+            _calendars[user_id] = calendar
+
+    return calendar
+
+
+def on_settings_changed(key, user_id):
+    """配置变更时清除日历缓存（全局配置变更影响所有用户）"""
+    if key not in CALENDAR_SETTING_KEYS:
+        return
+
+    with _lock:
+        if user_id is None:
+            _calendars.clear()
+        else:
+            _calendars.pop(user_id, None)
+
+
+register_settings_listener(on_settings_changed)
+
+
+def refresh_calendars(min_interval=0):
+    """
+    检查日历配置是否被其他进程修改（如 set_week.py），修改过时清除日历缓存并更新数据版本
+
+    每次扫描、发送和请求开始时调用一次，本进程内的修改由配置监听器即时处理
+
+    参数:
+        min_interval: 距上次检查不足该秒数时跳过检查（请求时使用，避免每个请求都查询数据库）
+
+    返回:
+        bool: 缓存是否已清除
+    """
+    global _signature, _checked_at
+    now = time.monotonic()
+    if min_interval and _checked_at is not None and now - _checked_at < min_interval:
+        return False
+    _checked_at = now
+
+    signature = get_settings_signature(CALENDAR_SETTING_KEYS)
+    with _lock:
+        if signature == _signature:
+            return False
+        changed = _signature is not None
+        _signature = signature
+        _calendars.clear()
+
+    # 数据版本只在本进程内递增，其他进程的修改需要在这里更新，使接口缓存失效
+    if changed:
+        bump_data_version()
+    return changed
+
+
+def _to_date(date):
+    """统一转换为date对象，默认为今天"""
+    if date is None:
+        return clock.today()
+    if isinstance(date, datetime):
+        return date.date()
+    if isinstance(date, str):
+        return datetime.strptime(date, "%Y-%m-%d").date()
+    return date
+
+
+def get_derived_week(date=None, user_id=None):
+    """
+    根据开学日期推算指定日期所在的教学周（不考虑手动设置）
+
+    返回:
+        int 或 None: 教学周；未设置开学日期或日期不在学期内（开学前、学期结束后）时返回None
+    """
+    day = get_calendar(user_id)["days"].get(_to_date(date))
+    return day[0] if day is not None else None
+
+
+def is_in_semester(date=None, user_id=None):
+    """
+    检查指定日期是否在学期内
+
+    手动设置了周次或未设置开学日期时无法判断学期范围，视为在学期内
+
+    返回:
+        bool: 是否在学期内
+    """
+    calendar = get_calendar(user_id)
+    if calendar["override"] is not None or calendar["first_monday"] is None:
+        return True
+    return _to_date(date) in calendar["days"]
+
+
+def get_current_week(date=None, user_id=None):
+    """
+    获取指定日期的教学周
+
+    优先使用手动设置的周次，其次根据开学日期推算，都没有时使用保存的当前周；
+    日期不在学期内时取最近的教学周（开学前为1，学期结束后为最后一周），仅用于显示
+
+    参数:
+        date: 日期，默认为今天
+        user_id: 用户ID，默认为默认用户
+
+    返回:
+        int: 教学周
+    """
+    calendar = get_calendar(user_id)
+    if calendar["override"] is not None:
+        return calendar["override"]
+
+    if calendar["first_monday"] is None:
+        return calendar["stored_week"]
+
+    date = _to_date(date)
+    derived = get_derived_week(date, user_id)
+    if derived is not None:
+        return derived
+    return 1 if date < calendar["first_monday"] else calendar["total_weeks"]
+
+
+def get_week_mode(user_id=None):
+    """
+    获取当前周的来源
+
+    返回:
+        str: manual（手动设置）/ auto（按开学日期推算）/ stored（未设置开学日期，使用保存的周次）
+    """
+    calendar = get_calendar(user_id)
+    if calendar["override"] is not None:
+        return "manual"
+    if calendar["first_monday"] is not None:
+        return "auto"
+    return "stored"
+
+
+def get_week_start_date(week, user_id=None):
+    """
+    计算指定教学周的周一日期
+
+    返回:
+        date 或 None: 未设置开学日期或格式不正确时返回None
+    """
+    first_monday = get_calendar(user_id)["first_monday"]
+    if first_monday is None:
+        return None
+    return first_monday + timedelta(weeks=week - 1)
+
+
+def is_teaching_day(date=None, user_id=None):
+    """检查指定日期是否在学期内且不是节假日"""
+    day = get_calendar(user_id)["days"].get(_to_date(date))
+    return day is not None and not day[1]
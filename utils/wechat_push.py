@@ -1,15 +1,32 @@
 # -*- coding: utf-8 -*-
 """
-PushPlus微信推送模块
+微信推送模块
+负责生成提醒消息，实际发送交给推送渠道模块（按用户设置的渠道顺序故障转移）
 """
 
-import requests
-import json
-from config import PUSHPLUS_API
-from utils.database import get_setting
-
-
-def send_message(title, content, template="html"):
+from utils.message_templates import render_course_reminder
+from utils.notify_channels import deliver, get_channel_config
+from utils.teaching_calendar import get_current_week
+
+
+def _resolve_config(token=None, user_id=None, config=None):
+    """确定发送使用的渠道配置：显式传入的token只走PushPlus"""
+    if config is not None:
+        return config
+    if token is not None:
+        return {"notify_channels": "pushplus", "pushplus_token": token}
+    return get_channel_config(user_id)
+
+
+def send_message(
+    title,
+    content,
+    template="html",
+    token=None,
+    user_id=None,
+    idempotency_key=None,
+    config=None,
+):
     """
     发送微信推送消息
 
@@ -17,109 +34,61 @@ def send_message(title, content, template="html"):
         title: 消息标题
         content: 消息内容
         template: 模板类型 (html/json/markdown)
+        token: PushPlus Token，传入时只通过PushPlus发送
+        user_id: 用户ID，未传token和config时读取该用户的渠道配置
+        idempotency_key: 幂等键，随消息传给推送渠道作为消息标识
+        config: 渠道配置（见 notify_channels.get_channel_config）
 
     返回:
         dict: 发送结果
     """
-    token = get_setting("pushplus_token")
-    if not token:
-        return {"success": False, "error": "未配置PushPlus Token，请在设置页面配置"}
-
-    try:
-        data = {
-            "token": token,
-            "title": title,
-            "content": content,
-            "template": template,
-        }
-
-        response = requests.post(PUSHPLUS_API, data=data, timeout=10)
-
-        result = response.json()
-
-        if result.get("code") == 200:
-            return {"success": True, "message": "发送成功", "data": result}
-        else:
-            return {"success": False, "error": result.get("msg", "发送失败")}
-
-    except requests.exceptions.Timeout:
-        return {"success": False, "error": "请求超时，请检查网络连接"}
-    except Exception as e:
-        return {"success": False, "error": f"发送失败: {str(e)}"}
+    message = {"title": title, "content": content, "template": template}
+    return deliver(
+        message, _resolve_config(token, user_id, config), idempotency_key
+    )
 
 
-def send_course_reminder(course, minutes_before):
+def send_course_reminder(
+    course,
+    minutes_before,
+    token=None,
+    current_week=None,
+    user_id=None,
+    idempotency_key=None,
+    config=None,
+):
     """
-    发送课程提醒
+    发送课程提醒（使用预编译模板渲染并缓存，由渠道路由依次尝试）
 
     参数:
         course: 课程信息字典
         minutes_before: 提前多少分钟
+        token: PushPlus Token，传入时只通过PushPlus发送
+        current_week: 当前教学周，默认读取用户配置
+        user_id: 课程所属用户
+        idempotency_key: 提醒的幂等键
+        config: 用户的渠道配置（含消息格式），默认读取用户配置
     """
     # 获取当前教学周
-    current_week = get_setting("current_week", "")
-    from utils.week_utils import get_week_description
-
-    if minutes_before == 15:
-        title = f"📚 课程提醒（15分钟后）"
-        urgency = "还有15分钟上课"
-    elif minutes_before == 5:
-        title = f"🚨 紧急提醒（5分钟后）"
-        urgency = "还有5分钟上课！"
-    else:
-        title = f"📚 课程提醒"
-        urgency = f"还有{minutes_before}分钟上课"
-
-    # 构建周次信息
-    week_info = f"第{current_week}周" if current_week else ""
-    week_pattern = course.get("week_pattern", "all")
-    pattern_desc = get_week_description(week_pattern)
-
-    # 标题中加入周次信息
-    if week_info:
-        title = f"{title} - {week_info}"
-
-    content = f"""
-    <div style="font-family: Arial, sans-serif; max-width: 400px;">
-    <h3 style="color: #2563eb;">⏰ {urgency}</h3>
-    <hr style="border: none; border-top: 1px solid #e5e7eb;">
-    <p style="margin: 8px 0;"><strong>📖 课程名称：</strong>{course["name"]}</p>
-    """
-
-    if week_info:
-        content += f'<p style="margin: 8px 0;"><strong>📅 当前周次：</strong>{week_info}（{pattern_desc}）</p>'
-
-    content += f"""
-    <p style="margin: 8px 0;"><strong>🕐 上课时间：</strong>{course["start_time"]} - {course["end_time"]}</p>
-    <p style="margin: 8px 0;"><strong>📍 上课地点：</strong>{course.get("location", "未指定")}</p>
-    """
-
-    if course.get("remark"):
-        content += f'<p style="margin: 8px 0;"><strong>📝 备注：</strong>{course["remark"]}</p>'
-
-    content += """
-    <hr style="border: none; border-top: 1px solid #e5e7eb;">
-    <p style="color: #6b7280; font-size: 12px; text-align: center;">来自课程提醒助手</p>
-    </div>
-    """
-
-    return send_message(title, content)
+    if current_week is None:
+        current_week = get_current_week(user_id=user_id)
 
+    config = _resolve_config(token, user_id, config)
+    message = render_course_reminder(
+        course, minutes_before, current_week, config.get("message_format")
+    )
+    return deliver(message, config, idempotency_key)
 
-def test_connection():
-    """测试PushPlus连接"""
-    token = get_setting("pushplus_token")
-    if not token:
-        return {"success": False, "error": "未配置Token"}
 
-    result = send_message(
+def test_connection(user_id=None):
+    """测试推送连接（按用户的渠道顺序发送一条测试消息）"""
+    return send_message(
         "✅ 连接测试成功",
         "<p>您的课程提醒助手已成功配置！</p><p>现在您可以开始接收课程提醒了。</p>",
         "html",
+        user_id=user_id,
     )
 
-    return result
-
 
 def get_token_guide():
     """获取PushPlus注册指引"""
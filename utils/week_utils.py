@@ -89,6 +89,22 @@ def is_course_active(week_pattern: str, current_week: int) -> bool:
     return current_week in active_weeks
 
 
+def week_pattern_to_mask(pattern: str) -> int:
+    """
+    将周次规则转换为位掩码，第n周对应第n位
+
+    参数:
+        pattern: 周次规则字符串
+
+    返回:
+        int: 位掩码，如 'odd' -> 0b...101010
+    """
+    mask = 0
+    for week in parse_week_pattern(pattern):
+        mask |= 1 << week
+    return mask
+
+
 def get_week_description(pattern: str) -> str:
     """
     获取周次规则的中文描述